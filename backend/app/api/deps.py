@@ -0,0 +1,59 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException, UploadFile
+
+from app.core.config import settings
+
+from app.core.request_context import current_client_key
+from app.core.worker_pools import cpu_pool
+from app.services.upload_admission import AdmittedImage, UploadRejected, upload_admission
+from app.services.usage_service import QuotaExceeded, usage_tracker
+
+
+def quota_exceeded_response(e: QuotaExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"error": "quota_exceeded", "metric": e.metric, "limit": e.limit, "used": e.used},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def enforce_quota():
+    """
+    Rejects over-quota clients with 429 before the endpoint body runs,
+    i.e. before any image is decoded or an upstream call is queued.
+    """
+    try:
+        usage_tracker.check_quota(current_client_key())
+    except QuotaExceeded as e:
+        raise quota_exceeded_response(e)
+
+
+def admit_upload(file: UploadFile, upstream_calls: int = 1) -> AdmittedImage:
+    """Runs upload admission; rejections become structured 4xx responses. For sync handlers."""
+    try:
+        return upload_admission.admit(file.file, file.filename, upstream_calls=upstream_calls)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.to_detail())
+
+
+async def admit_upload_async(file: UploadFile, upstream_calls: int = 1) -> AdmittedImage:
+    """admit_upload for async handlers: Pillow's open / verify() runs on the CPU pool, not the event loop."""
+    try:
+        return await cpu_pool.run(
+            upload_admission.admit, file.file, file.filename, upstream_calls=upstream_calls, label="upload_admission"
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.to_detail())
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    X-Admin-Token must match ADMIN_TOKEN. With no ADMIN_TOKEN configured the
+    admin endpoints do not exist (404).
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -1,9 +1,22 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from app.api.deps import admit_upload_async, enforce_quota
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded, run_until, run_with_deadline
+from app.core.worker_pools import cpu_pool
 from app.services.gemini_client import client
+from app.services.gallery_index import gallery_index
+from app.services.local_recommender import local_recommender
+from app.services.quality_tiers import resolve_quality, resolve_seed
+from app.services.style_catalog import style_catalog
+from app.services.usage_service import QuotaExceeded
 from app.schemas import FaceAnalysisResult, RecommendationResponse
+import asyncio
+import json
 import shutil
 import os
-import json
+import time
 import uuid
 
 router = APIRouter()
@@ -17,22 +30,24 @@ DATA_DIR = os.path.join(BACKEND_ROOT, "app", "data")
 UPLOADS_DIR = os.path.join(BACKEND_ROOT, "uploads")
 RESULTS_DIR = os.path.join(BACKEND_ROOT, "results")
 
-with open(os.path.join(DATA_DIR, "styles.json"), "r", encoding="utf-8") as f:
-    STYLES_DB = json.load(f)
+@router.post("/analyze", response_model=FaceAnalysisResult, dependencies=[Depends(enforce_quota)])
+async def analyze_face(http_request: Request, file: UploadFile = File(...)):
+    # Reject bad uploads before saving / calling the model
+    admitted = await admit_upload_async(file, upstream_calls=1)
 
-@router.post("/analyze", response_model=FaceAnalysisResult)
-async def analyze_face(file: UploadFile = File(...)):
     # Save file
     file_id = str(uuid.uuid4())
-    file_ext = file.filename.split('.')[-1]
-    filename = f"{file_id}.{file_ext}"
+    filename = f"{file_id}.{admitted.extension}"
     file_path = os.path.join(UPLOADS_DIR, filename)
     
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
     # Analyze
-    result = await client.analyze_face(file_path)
+    result = await run_with_deadline(
+        http_request, settings.DEADLINE_ANALYZE_S, client.analyze_face(file_path),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
+    )
     
     # Add the relative path or ID so we can reuse it for fitting
     # We'll use the filename as the ID for simplicity
@@ -40,39 +55,66 @@ async def analyze_face(file: UploadFile = File(...)):
     
     return result
 
-@router.post("/recommend")
-async def recommend_style(analysis: FaceAnalysisResult, gender_filter: str = "all"):
-    # Filter styles by gender if specified
+def filter_styles_by_gender(styles_db: list, gender_filter: str) -> list:
     # Style IDs: m_XX = male, w_XX = female
     if gender_filter == "male":
-        filtered_styles = [s for s in STYLES_DB if s['id'].startswith('m_')]
-    elif gender_filter == "female":
-        filtered_styles = [s for s in STYLES_DB if s['id'].startswith('w_')]
-    else:
-        filtered_styles = STYLES_DB
+        return [s for s in styles_db if s['id'].startswith('m_')]
+    if gender_filter == "female":
+        return [s for s in styles_db if s['id'].startswith('w_')]
+    return styles_db
+
+def build_recommendations(rec_result: dict, filtered_styles: list) -> tuple[list, str]:
+    """LLM result -> (style dicts in recommended order, consultant comment)"""
+    by_id = {s['id']: s for s in filtered_styles}
+    recommendations = [by_id[pid] for pid in rec_result.get('recommended_style_ids', []) if pid in by_id]
+    comment = rec_result.get('consultant_comment', rec_result.get('comment', "Here are my top picks for you."))
+    return recommendations, comment
+
+RecommendMode = Literal["llm", "fast", "hybrid"]
+
+async def recommend_with_mode(analysis: dict, filtered_styles: list, mode: Optional[str]) -> dict:
+    """
+    llm: the model picks from every filtered style
+    fast: local scoring only, no upstream call
+    hybrid: the model picks from the local shortlist (smaller prompt, fewer tokens)
+    """
+    mode = mode or settings.RECOMMEND_MODE
+    if mode == "fast":
+        return client.recommend_styles_locally(analysis, filtered_styles)
+    if mode == "hybrid":
+        shortlist_ids = set(local_recommender.recommend_ids(
+            analysis, k=settings.RECOMMEND_SHORTLIST_SIZE, style_ids=[s['id'] for s in filtered_styles]
+        ))
+        filtered_styles = [s for s in filtered_styles if s['id'] in shortlist_ids]
+    return await client.recommend_styles_with_llm(analysis, filtered_styles)
+
+@router.post("/recommend", dependencies=[Depends(enforce_quota)])
+async def recommend_style(analysis: FaceAnalysisResult, http_request: Request, gender_filter: str = "all",
+                          mode: Optional[RecommendMode] = None):
+    # Filter styles by gender if specified
+    filtered_styles = filter_styles_by_gender(style_catalog.get_styles(), gender_filter)
     
-    # LLM Recommendation with filtered styles
-    rec_result = await client.recommend_styles_with_llm(analysis.model_dump(), filtered_styles)
+    # LLM (or local) Recommendation with filtered styles
+    rec_result = await run_with_deadline(
+        http_request, settings.DEADLINE_RECOMMEND_S,
+        recommend_with_mode(analysis.model_dump(), filtered_styles, mode),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
+    )
     
     try:
-        recommendations = []
-        for pid in rec_result.get('recommended_style_ids', []):
-            style = next((s for s in filtered_styles if s['id'] == pid), None)
-            if style:
-                recommendations.append(style)
-        
+        recommendations, comment = build_recommendations(rec_result, filtered_styles)
         return {
             "analysis": analysis,
             "recommendations": recommendations,
-            "consultant_comment": rec_result.get('consultant_comment', rec_result.get('comment', "Here are my top picks for you."))
+            "consultant_comment": comment
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 from app.schemas import FittingRequest
 
-@router.post("/fitting")
-async def virtual_fitting(request: FittingRequest):
+@router.post("/fitting", dependencies=[Depends(enforce_quota)])
+async def virtual_fitting(request: FittingRequest, http_request: Request):
     # 1. Find the user's original image
     # We assume 'user_image_path' passed from frontend is just the filename or ID we returned earlier
     original_filename = request.user_image_path
@@ -82,17 +124,130 @@ async def virtual_fitting(request: FittingRequest):
         raise HTTPException(status_code=404, detail="Original image not found. Please upload again.")
         
     # 2. Find the target style prompt
-    style = next((s for s in STYLES_DB if s['id'] == request.style_id), None)
+    style = style_catalog.get_by_id(request.style_id)
     if not style:
         raise HTTPException(status_code=404, detail="Style not found.")
         
-    # 3. Generate
-    generated_image_url = await client.generate_hairstyle(
-        original_image_path=original_path,
-        prompt_modifier=style.get('prompt_modifier', style['name'])
+    # 3. Generate (a draft's seed is returned so the final can reuse it)
+    quality = resolve_quality(request.quality)
+    seed = resolve_seed(request.seed, original_filename, request.style_id)
+    generated_image_url = await run_with_deadline(
+        http_request, settings.DEADLINE_FITTING_S,
+        client.generate_hairstyle(
+            original_image_path=original_path,
+            prompt_modifier=style.get('prompt_modifier', style['name']),
+            region_mode=request.region_mode,
+            head_box=request.head_box,
+            quality=quality,
+            seed=seed,
+        ),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
     )
+    await gallery_index.record(original_filename, "fitting", {None: generated_image_url},
+                               style=request.style_id, quality=quality)
     
-    return {"generated_image_url": generated_image_url}
+    return {"generated_image_url": generated_image_url, "quality": quality, "seed": seed}
+
+# === One-shot Consultation Pipeline ===
+
+def _pipeline_event(stage: str, **payload) -> str:
+    return json.dumps({"stage": stage, **payload}, ensure_ascii=False, default=str) + "\n"
+
+def _pipeline_error(error: str, e: Exception) -> str:
+    """Error event for a stage that failed after the stream started (no status code can be sent anymore)."""
+    if isinstance(e, QuotaExceeded):
+        return _pipeline_event("error", error="quota_exceeded", metric=e.metric, limit=e.limit, used=e.used,
+                               retry_after=e.retry_after)
+    if isinstance(e, DeadlineExceeded):
+        return _pipeline_event("error", error="deadline_exceeded", detail=str(e))
+    return _pipeline_event("error", error=error, detail=str(e))
+
+async def _run_pipeline(file_path: str, filename: str, gender_filter: str, max_fittings: int,
+                        region_mode: Optional[str], mode: Optional[str] = None):
+    started = time.monotonic()
+    # Every stage runs under this deadline via run_until (see core/deadlines)
+    deadline = started + settings.DEADLINE_PIPELINE_S
+    yield _pipeline_event("upload", file_id=filename)
+
+    # 1. Analyze (decoded once, EXIF-transposed, so every stage can share it)
+    try:
+        image = await run_until(deadline, cpu_pool.run(client._load_image, file_path, transpose=True, label="load_image"))
+        analysis = await run_until(deadline, client.analyze_face(file_path, image=image, fallback=False))
+        analysis = FaceAnalysisResult(**analysis, file_id=filename).model_dump()
+    except Exception as e:
+        yield _pipeline_error("analysis_failed", e)
+        return
+    yield _pipeline_event("analysis", analysis=analysis)
+
+    # 2. Recommend
+    try:
+        filtered_styles = filter_styles_by_gender(style_catalog.get_styles(), gender_filter)
+        rec_result = await run_until(deadline, recommend_with_mode(analysis, filtered_styles, mode))
+        recommendations, comment = build_recommendations(rec_result, filtered_styles)
+    except Exception as e:
+        yield _pipeline_error("recommendation_failed", e)
+        return
+    yield _pipeline_event("recommendations", recommendations=recommendations, consultant_comment=comment)
+
+    # 3. Fit every recommended style concurrently; stream each as it finishes
+    tasks = {
+        asyncio.ensure_future(run_until(deadline, client.generate_hairstyle(
+            original_image_path=file_path,
+            prompt_modifier=style.get('prompt_modifier', style['name']),
+            region_mode=region_mode,
+            image=image,
+        ))): style['id']
+        for style in recommendations[:max_fittings]
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    yield _pipeline_event("fitting", style_id=tasks[task], error=str(task.exception()))
+                else:
+                    await gallery_index.record(filename, "fitting", {None: task.result()},
+                                               style=tasks[task], quality="final")
+                    yield _pipeline_event("fitting", style_id=tasks[task], generated_image_url=task.result())
+    finally:
+        # Client went away or the deadline hit: stop paying for fittings nobody will see
+        for task in pending:
+            task.cancel()
+
+    yield _pipeline_event("done", elapsed_ms=round((time.monotonic() - started) * 1000))
+
+@router.post("/pipeline", dependencies=[Depends(enforce_quota)])
+async def consultation_pipeline(
+    file: UploadFile = File(...),
+    gender_filter: str = "all",
+    max_fittings: int = Query(3, ge=0, le=6),
+    region_mode: Optional[Literal["full", "head"]] = None,
+    mode: Optional[RecommendMode] = None,
+):
+    """
+    업로드 → 얼굴 분석 → 스타일 추천 → 가상 피팅을 한 번의 요청으로 실행
+    업로드 이미지는 한 번만 디코딩해서 모든 단계가 공유하고, 추천이 나오는 즉시 피팅을 병렬로 시작
+    mode: 추천 방식 (llm / fast: 로컬 점수만 / hybrid: 로컬 후보 중에서 LLM 선택), 기본값은 RECOMMEND_MODE
+    Returns: NDJSON 스트림, 한 줄에 하나의 이벤트
+        {"stage": "upload", "file_id"} → {"stage": "analysis", "analysis"}
+        → {"stage": "recommendations", "recommendations", "consultant_comment"}
+        → {"stage": "fitting", "style_id", "generated_image_url"} (완료 순서대로) → {"stage": "done", "elapsed_ms"}
+        분석/추천 단계가 실패하면 {"stage": "error", "error", ...} 이벤트로 스트림이 끝남
+        (error: analysis_failed / recommendation_failed / quota_exceeded / deadline_exceeded)
+    """
+    admitted = await admit_upload_async(file, upstream_calls=(1 if mode == "fast" else 2) + max_fittings)
+
+    # Saved before streaming starts: the upload is closed once the handler returns
+    filename = f"{uuid.uuid4()}.{admitted.extension}"
+    file_path = os.path.join(UPLOADS_DIR, filename)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    return StreamingResponse(
+        _run_pipeline(file_path, filename, gender_filter, max_fittings, region_mode, mode),
+        media_type="application/x-ndjson",
+    )
 
 # === Advanced Image Generation Endpoints ===
 
@@ -111,8 +266,20 @@ def resolve_image_path(url_path: str) -> str:
         # Fallback: try uploads dir
         return os.path.join(UPLOADS_DIR, url_path)
 
-@router.post("/time-change")
-async def generate_time_change(request: TimeChangeRequest):
+def resolve_local_image(url_path: str) -> Optional[str]:
+    """
+    /results/xxx or /uploads/xxx -> file path inside that directory.
+    None for anything else: remote URLs, bare names, paths escaping the directory.
+    """
+    for prefix, root in (('/results/', RESULTS_DIR), ('/uploads/', UPLOADS_DIR)):
+        if url_path.startswith(prefix):
+            root = os.path.realpath(root)
+            path = os.path.realpath(os.path.join(root, url_path[len(prefix):]))
+            return path if path.startswith(root + os.sep) else None
+    return None
+
+@router.post("/time-change", dependencies=[Depends(enforce_quota)])
+async def generate_time_change(request: TimeChangeRequest, http_request: Request):
     """
     시간 변화 (머리 자람) 이미지 생성
     Returns: {"1month": url, "3months": url, "1year": url}
@@ -122,16 +289,21 @@ async def generate_time_change(request: TimeChangeRequest):
     if not os.path.exists(original_path):
         raise HTTPException(status_code=404, detail=f"Original image not found: {original_path}")
     
-    result = await client.generate_time_change(
-        user_image_path=original_path,
-        style_name=request.style_name,
-        seed=request.seed
+    result = await run_with_deadline(
+        http_request, settings.DEADLINE_VARIANTS_S,
+        client.generate_time_change(
+            user_image_path=original_path,
+            style_name=request.style_name,
+            seed=request.seed
+        ),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
     )
+    await gallery_index.record(request.user_image_path, "time", result, style=request.style_name)
     
     return result
 
-@router.post("/multi-angle")
-async def generate_multi_angle(request: MultiAngleRequest):
+@router.post("/multi-angle", dependencies=[Depends(enforce_quota)])
+async def generate_multi_angle(request: MultiAngleRequest, http_request: Request):
     """
     다각도 (앞/옆/뒤) 이미지 생성
     Returns: {"front": url, "left": url, "right": url, "back": url}
@@ -141,16 +313,21 @@ async def generate_multi_angle(request: MultiAngleRequest):
     if not os.path.exists(original_path):
         raise HTTPException(status_code=404, detail=f"Original image not found: {original_path}")
     
-    result = await client.generate_multi_angle(
-        user_image_path=original_path,
-        style_name=request.style_name,
-        seed=request.seed
+    result = await run_with_deadline(
+        http_request, settings.DEADLINE_VARIANTS_S,
+        client.generate_multi_angle(
+            user_image_path=original_path,
+            style_name=request.style_name,
+            seed=request.seed
+        ),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
     )
+    await gallery_index.record(request.user_image_path, "angle", result, style=request.style_name)
     
     return result
 
-@router.post("/pose")
-async def generate_pose(request: PoseRequest):
+@router.post("/pose", dependencies=[Depends(enforce_quota)])
+async def generate_pose(request: PoseRequest, http_request: Request):
     """
     포즈 (화보 컷) 이미지 생성
     scene_type: "studio" | "outdoor" | "runway"
@@ -161,17 +338,26 @@ async def generate_pose(request: PoseRequest):
     if not os.path.exists(original_path):
         raise HTTPException(status_code=404, detail=f"Original image not found: {original_path}")
     
-    result = await client.generate_pose(
-        user_image_path=original_path,
-        style_name=request.style_name,
-        scene_type=request.scene_type,
-        seed=request.seed
+    result = await run_with_deadline(
+        http_request, settings.DEADLINE_VARIANTS_S,
+        client.generate_pose(
+            user_image_path=original_path,
+            style_name=request.style_name,
+            scene_type=request.scene_type,
+            seed=request.seed
+        ),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
+    )
+    await gallery_index.record(
+        request.user_image_path, "pose",
+        {f"{request.scene_type}_{i}": url for i, url in enumerate(result.get("images", []))},
+        style=request.style_name,
     )
     
     return result
 
 @router.post("/photo-booth")
-async def generate_photo_booth(request: PhotoBoothRequest):
+async def generate_photo_booth(request: PhotoBoothRequest, http_request: Request):
     """
     인생세컷 합성
     image_urls: 선택된 3개 이미지 URL 리스트
@@ -180,9 +366,46 @@ async def generate_photo_booth(request: PhotoBoothRequest):
     if len(request.image_urls) != 3:
         raise HTTPException(status_code=400, detail="Exactly 3 images are required.")
     
-    result_url = await client.generate_photo_booth(
-        image_urls=request.image_urls,
-        style_name=request.style_name
+    result_url = await run_with_deadline(
+        http_request, settings.DEADLINE_PHOTO_BOOTH_S,
+        client.generate_photo_booth(
+            image_urls=request.image_urls,
+            style_name=request.style_name
+        ),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
     )
+    await gallery_index.record_derived(request.image_urls, "photobooth", {None: result_url}, style=request.style_name)
     
     return {"photo_booth_url": result_url}
+
+from app.schemas import ComparisonGridRequest
+from app.services.comparison_grid import MEDIA_TYPES, comparison_grid
+
+@router.post("/compare-grid")
+async def generate_comparison_grid(request: ComparisonGridRequest, http_request: Request):
+    """
+    피팅 결과 비교 그리드 합성 (스타일 이름 라벨 포함, 이미지 한 장으로 응답)
+    타일은 원본 이미지/크기별로 캐시되어, 스타일 하나를 추가해 다시 그리면 새 이미지만 디코딩
+    image_url은 /results/ 또는 /uploads/ 경로만 허용 (외부 URL은 400)
+    Returns: JPEG / WebP 이미지
+    """
+    labels = []
+    for item in request.items:
+        style = style_catalog.get_by_id(item.style_id)
+        if not style:
+            raise HTTPException(status_code=404, detail=f"Style not found: {item.style_id}")
+        labels.append(style['name'])
+
+    # Local results / uploads only: the server never fetches client-supplied URLs
+    sources = []
+    for item in request.items:
+        source = resolve_local_image(item.image_url)
+        if source is None:
+            raise HTTPException(status_code=400, detail=f"Only /results/ and /uploads/ images can be compared: {item.image_url}")
+        sources.append(source)
+    image = await run_with_deadline(
+        http_request, settings.DEADLINE_PHOTO_BOOTH_S,
+        comparison_grid.render(sources, labels, request.width, request.columns, request.format),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
+    )
+    return Response(content=image, media_type=MEDIA_TYPES[request.format])
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from app.services.designer_service import designer_service
+
+router = APIRouter()
+
+@router.get("/nearby")
+def find_nearby_designers(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    style_id: Optional[str] = None,
+    style: Optional[str] = None,
+    k: int = Query(5, ge=1, le=50),
+    radius_km: Optional[float] = Query(None, gt=0),
+):
+    """
+    주변 디자이너 검색
+    style_id (styles.json id) 또는 style (스타일 이름/전문분야) 로 필터링.
+    Returns: {"matched_specialties": [...], "designers": [{..., "distance_km": float}]}
+    """
+    if style_id and style_id not in designer_service.index.styles_by_id:
+        raise HTTPException(status_code=404, detail="Style not found.")
+
+    return designer_service.find_nearby(lat, lon, k=k, style_id=style_id, style=style, radius_km=radius_km)
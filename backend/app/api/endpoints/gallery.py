@@ -0,0 +1,24 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.core.config import settings
+from app.core.worker_pools import io_pool
+from app.services.gallery_index import GalleryKind, InvalidCursor, gallery_index
+
+router = APIRouter()
+
+@router.get("/{upload_id}")
+async def list_gallery(upload_id: str, kind: Optional[GalleryKind] = None,
+                       limit: int = Query(settings.GALLERY_PAGE_SIZE, ge=1, le=settings.GALLERY_MAX_PAGE_SIZE),
+                       cursor: Optional[str] = None):
+    """
+    업로드 한 장에서 생성된 결과 목록 (피팅/시간 변화/다각도/포즈/인생세컷, 최신순)
+    다음 페이지는 응답의 next_cursor를 cursor로 전달
+    Returns: {upload_id, items: [{id, kind, url, style, variant, quality, width, height, bytes, created_at}], next_cursor}
+    """
+    try:
+        items, next_cursor = await io_pool.run(
+            gallery_index.page, upload_id, kind=kind, limit=limit, cursor=cursor, label="gallery_page"
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"upload_id": upload_id, "items": items, "next_cursor": next_cursor}
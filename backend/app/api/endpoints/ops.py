@@ -0,0 +1,175 @@
+import asyncio
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from app.api.deps import require_admin
+from app.core.config import settings
+from app.core.idempotency import idempotency_store
+from app.core.load_shedding import load_shedder
+from app.core.profiling import SamplerBusy, request_profiler, stack_sampler
+from app.core.shared_cache import shared_cache
+from app.core.worker_pools import cpu_pool, io_pool
+from app.services.comparison_grid import comparison_grid
+from app.services.generation_guard import hedge_policy
+from app.services.image_cache import image_cache
+from app.services.model_router import model_router
+from app.services.quality_tiers import tier_stats
+from app.services.upload_admission import upload_admission
+from app.services.upstream_scheduler import upstream_scheduler
+from app.services.usage_service import usage_tracker
+
+# Ops endpoints expose other clients' keys, addresses and sessions: admin only
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/scheduler")
+def scheduler_stats():
+    """
+    업스트림 스케줄러 상태
+    Returns: {capacity, in_flight, utilization, queued_by_class, queued_by_session, wait}
+    """
+    return upstream_scheduler.stats()
+
+@router.get("/usage")
+def usage_stats(client_key: Optional[str] = None, minutes: Optional[int] = None):
+    """
+    클라이언트/작업별 업스트림 사용량 (호출 수, 토큰, 이미지 수/바이트)
+    Returns: {window_minutes, clients: {client_key: {operation: counters, total: counters}}}
+    """
+    return usage_tracker.snapshot(client_key=client_key, minutes=minutes)
+
+@router.get("/admission")
+def admission_stats():
+    """
+    업로드 사전 검증 통계
+    Returns: {checked, admitted, rejected: {reason: count}, upstream_calls_saved, avg_check_ms}
+    """
+    return upload_admission.stats()
+
+@router.get("/generation")
+def generation_stats():
+    """
+    이미지 생성 검증/재시도/헤징 통계
+    Returns: {hedge_enabled, hedge_percentile, hedge_tokens, operations: {operation: counters + latency}}
+    """
+    return hedge_policy.stats()
+
+@router.get("/pools")
+def worker_pool_stats():
+    """
+    CPU(이미지 처리) / I/O 워커 풀 상태
+    Returns: {cpu: {workers, running, queued, utilization, queue_wait_p50_ms, ...}, io: {...}}
+    """
+    return {"cpu": cpu_pool.stats(), "io": io_pool.stats()}
+
+@router.get("/grid-tiles")
+def grid_tile_cache_stats():
+    """
+    비교 그리드 타일 캐시 상태
+    Returns: {tiles, bytes, max_bytes, hits, misses, hit_rate}
+    """
+    return comparison_grid.tiles.stats()
+
+@router.get("/image-cache")
+def image_cache_stats():
+    """
+    디코딩된 원본 이미지/업로드용 인코딩 캐시 상태 (메모리 사용량, 종류별 적중률)
+    Returns: {enabled, entries, bytes, max_bytes, kinds: {image|payload: {hits, misses, hit_rate, evictions, entries, bytes}}}
+    """
+    return image_cache.stats()
+
+@router.get("/routing")
+def model_routing_stats():
+    """
+    모델 라우팅 상태 (후보 모델별 지연/오류율, SLO 위반, 라우팅 결정 수)
+    Returns: {enabled, routes: {route: {candidates, slo_p95_s, decisions}}, models: {model: stats}, sticky_sessions, ...}
+    """
+    return model_router.stats()
+
+@router.get("/idempotency")
+def idempotency_stats():
+    """
+    Idempotency-Key 저장소 상태 (재전송 응답 재사용, 대기, 충돌 수)
+    Returns: {entries, running, stored_bytes, started, replayed, waited, conflicts, wait_timeouts, discarded, ...}
+    """
+    return idempotency_store.stats()
+
+@router.get("/load")
+def load_shedding_stats():
+    """
+    부하 제어 상태 (클래스별 진행 중 작업 단위, 허용/거절 수)
+    Returns: {max_units_total, in_flight_units_total, classes: {class: {max_units, in_flight_units, admitted, shed, ...}}}
+    """
+    return load_shedder.stats()
+
+@router.get("/tiers")
+def quality_tier_stats():
+    """
+    생성 품질 단계(draft/final)별 지연 시간과 입출력 크기 (캐시 적중 제외)
+    Returns: {default_quality, operations: {operation: {draft, final, final_to_draft_p50}}}
+    """
+    return tier_stats.stats()
+
+@router.get("/shared-cache")
+async def shared_cache_stats():
+    """
+    워커 공유 캐시 상태 (항목 수/용량, 보유 중인 락, 종류별 적중/대기/계산 수)
+    Returns: {enabled, path, entries, bytes, max_bytes, locks_held, in_flight_here, namespaces: {namespace: counters}}
+    """
+    return await io_pool.run(shared_cache.stats, label="shared_cache_stats")
+
+# === Profiling (admin only) ===
+
+@router.post("/profile/requests")
+def arm_request_profiler(
+    route: str = Query(..., min_length=1),
+    count: int = Query(1, ge=0, le=100),
+    sort: Literal["cumulative", "tottime", "calls"] = "cumulative",
+    limit: int = Query(40, ge=1, le=500),
+):
+    """
+    다음 N개의 route 요청을 cProfile로 프로파일링 (count=0이면 해제)
+    Returns: {route, remaining, sort, reports: [{id, method, path, elapsed_ms, finished_at}]}
+    """
+    if count:
+        request_profiler.arm(route, count, sort=sort, limit=limit)
+    else:
+        request_profiler.disarm()
+    return request_profiler.status()
+
+@router.get("/profile/requests")
+def request_profiler_status():
+    """
+    요청 프로파일러 상태와 완료된 리포트 목록
+    Returns: {route, remaining, sort, reports: [...]}
+    """
+    return request_profiler.status()
+
+@router.get("/profile/requests/{report_id}")
+def request_profile_report(report_id: int, raw: bool = False):
+    """
+    프로파일 리포트 (pstats 텍스트, raw=true면 pstats/snakeviz로 열 수 있는 원본 통계)
+    Returns: text/plain 또는 application/octet-stream
+    """
+    report = request_profiler.get_report(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile report not found")
+    if raw:
+        return Response(content=report["raw"], media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="request_{report_id}.prof"'})
+    return Response(content=report["report"], media_type="text/plain; charset=utf-8")
+
+@router.post("/profile/sample")
+async def sample_stacks(
+    seconds: float = Query(5.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1.0, le=1000.0),
+):
+    """
+    전체 스레드 스택 샘플링 (지정 시간 동안), flamegraph용 collapsed stack 형식
+    Returns: text/plain, 한 줄에 "thread;frame;...;frame count"
+    """
+    seconds = min(seconds, settings.PROFILE_MAX_SAMPLE_S)
+    try:
+        # Runs on the default executor: neither blocks the loop nor takes a cpu/io pool worker
+        collapsed = await asyncio.to_thread(stack_sampler.sample, seconds, interval_ms / 1000)
+    except SamplerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(content=collapsed, media_type="text/plain; charset=utf-8")
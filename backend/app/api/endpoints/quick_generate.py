@@ -1,15 +1,29 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Request
+from app.api.deps import enforce_quota
+from app.core.config import settings
+from app.core.deadlines import run_with_deadline
+from app.schemas import GenerationOptions
+from app.services.gallery_index import gallery_index
+from app.services.quality_tiers import resolve_quality, resolve_seed
 from app.services.quick_generate_service import quick_generate_service
 
 router = APIRouter()
 
-class GenerateRequest(BaseModel):
+class GenerateRequest(GenerationOptions):
     image_id: str
     style: str
     gender: str = "person" # Default to person if not provided
 
-@router.post("")
-def generate_hair(request: GenerateRequest):
-    result_url = quick_generate_service.generate(request.image_id, request.style, request.gender)
-    return {"result_image": result_url}
+@router.post("", dependencies=[Depends(enforce_quota)])
+async def generate_hair(request: GenerateRequest, http_request: Request):
+    quality = resolve_quality(request.quality)
+    seed = resolve_seed(request.seed, request.image_id, request.style, request.gender)
+    result_url = await run_with_deadline(
+        http_request, settings.DEADLINE_FITTING_S,
+        quick_generate_service.generate(request.image_id, request.style, request.gender,
+                                        region_mode=request.region_mode, head_box=request.head_box,
+                                        quality=quality, seed=seed),
+        poll_interval=settings.DISCONNECT_POLL_INTERVAL_S,
+    )
+    await gallery_index.record(request.image_id, "fitting", {None: result_url}, style=request.style, quality=quality)
+    return {"result_image": result_url, "quality": quality, "seed": seed}
@@ -1,10 +1,7 @@
-from fastapi import APIRouter
-import os
-import json
-
-BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BACKEND_ROOT, "data")
-STYLES_JSON_PATH = os.path.join(DATA_DIR, "styles.json")
+from fastapi import APIRouter, Query, Response
+from typing import Optional
+from app.services.sprite_atlas import sprite_atlas
+from app.services.style_search_service import style_search_service
 
 router = APIRouter()
 
@@ -12,23 +9,36 @@ router = APIRouter()
 def get_styles():
     """
     Returns the list of available hair styles for frontend selection.
-    Using unified styles.json database.
+    Using unified styles.json database; the body is prebuilt (see
+    services/catalog_compiler) and carries the preview sprite atlas map
+    (see services/sprite_atlas) once the atlases are built.
     """
     try:
-        if not os.path.exists(STYLES_JSON_PATH):
-            print(f"Error: {STYLES_JSON_PATH} not found.")
-            return {"male": [], "female": []}
-            
-        with open(STYLES_JSON_PATH, "r", encoding="utf-8") as f:
-            styles_db = json.load(f)
-            
-        male_styles = [{"name": s['name'], "image_url": s.get('image_url', '')} for s in styles_db if s.get('gender') == 'male']
-        female_styles = [{"name": s['name'], "image_url": s.get('image_url', '')} for s in styles_db if s.get('gender') == 'female']
-        
-        return {
-            "male": male_styles,
-            "female": female_styles
-        }
+        return Response(content=sprite_atlas.styles_payload(), media_type="application/json")
     except Exception as e:
         print(f"Error loading styles: {e}")
         return {"male": [], "female": []}
+
+@router.get("/search")
+def search_styles(
+    q: str = Query(..., min_length=1, max_length=100),
+    gender: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    스타일 검색 (이름/태그/설명/얼굴형, n-gram 인덱스)
+    Returns: {"query": q, "results": [{id, name, gender, image_url, score}]}
+    """
+    return {"query": q, "results": style_search_service.search(q, gender=gender, limit=limit)}
+
+@router.get("/autocomplete")
+def autocomplete_styles(
+    q: str = Query(..., min_length=1, max_length=50),
+    gender: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    스타일 이름/태그 자동완성 (prefix)
+    Returns: {"query": q, "suggestions": [{text, type, style_id}]}
+    """
+    return {"query": q, "suggestions": style_search_service.autocomplete(q, gender=gender, limit=limit)}
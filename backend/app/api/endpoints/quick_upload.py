@@ -1,4 +1,5 @@
 from fastapi import APIRouter, UploadFile, File
+from app.api.deps import admit_upload
 from app.services.quick_file_service import quick_file_service
 
 router = APIRouter()
@@ -7,8 +8,10 @@ router = APIRouter()
 @router.post("")
 def upload_image(file: UploadFile = File(...)):
     print(f"Debug: Received upload request. Filename: {file.filename}, Content-Type: {file.content_type}")
+    # Quick uploads are only ever used for one generation
+    admitted = admit_upload(file, upstream_calls=1)
     try:
-        file_id, file_url = quick_file_service.save_upload(file)
+        file_id, file_url = quick_file_service.save_upload(file, extension=admitted.extension)
         print(f"Debug: File saved successfully. ID: {file_id}")
         return {
             "message": "Image uploaded successfully",
@@ -0,0 +1,96 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: fall back to gzip only
+    brotli = None
+
+# Already-compressed or incrementally consumed payloads are passed through untouched
+EXCLUDED_CONTENT_TYPES = (
+    "text/event-stream",
+    "application/x-ndjson",
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+)
+
+
+class _ExcludeTypesMixin:
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            await super().send_with_compression(message)
+            self.content_type_is_excluded = self.content_type_is_excluded or content_type.startswith(EXCLUDED_CONTENT_TYPES)
+            return
+        await super().send_with_compression(message)
+
+
+class _IdentityResponder(_ExcludeTypesMixin, IdentityResponder):
+    pass
+
+
+class _GZipResponder(_ExcludeTypesMixin, GZipResponder):
+    pass
+
+
+class _BrotliResponder(_ExcludeTypesMixin, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        out = self.compressor.process(body)
+        return out + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when the `brotli` package is installed) or gzip response compression.
+    Bodies smaller than `minimum_size` and already-compressed content types
+    (images, archives, event streams) are sent unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        responder: ASGIApp
+        if brotli is not None and "br" in accepted:
+            responder = _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = _GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = _IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
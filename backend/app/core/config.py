@@ -1,11 +1,180 @@
+import os
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
+# backend/: data files the workers share live under it, whatever the working directory
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Hair Consulting AI"
     UPLOAD_DIR: str = "uploads"
     RESULT_DIR: str = "results"
+
+    # Response compression (bytes below this are sent as-is)
+    COMPRESSION_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+
+    # HTTP caching
+    RESULTS_CACHE_MAX_AGE: int = 31536000  # generated results are never overwritten
+    UPLOADS_CACHE_MAX_AGE: int = 3600      # style previews under /uploads can be replaced
+    CORS_MAX_AGE: int = 86400              # preflight cache
+
+    # Deadlines (seconds). Every upstream call is bounded by the remaining
+    # request deadline and by UPSTREAM_TIMEOUT_S.
+    UPSTREAM_TIMEOUT_S: float = 90.0
+    DEADLINE_ANALYZE_S: float = 30.0
+    DEADLINE_RECOMMEND_S: float = 30.0
+    DEADLINE_FITTING_S: float = 90.0
+    DEADLINE_VARIANTS_S: float = 150.0   # time-change / multi-angle / pose
+    DEADLINE_PHOTO_BOOTH_S: float = 30.0
+    DEADLINE_PIPELINE_S: float = 150.0   # upload -> analyze -> recommend -> fittings
+    DISCONNECT_POLL_INTERVAL_S: float = 0.5
+    VARIANT_CONCURRENCY: int = 3         # parallel upstream calls per variant pack
+
+    # Upstream scheduling: total concurrent model calls, shared by weighted
+    # fair queuing across sessions (interactive fittings outweigh variant packs)
+    UPSTREAM_MAX_CONCURRENCY: int = 8
+    SCHEDULER_INTERACTIVE_WEIGHT: float = 4.0
+    SCHEDULER_BULK_WEIGHT: float = 1.0
+
+    # Generated image validation: smaller / flatter outputs are retried
+    OUTPUT_MIN_BYTES: int = 1024
+    OUTPUT_MIN_SIDE: int = 256
+    OUTPUT_MIN_STDDEV: float = 2.0       # max channel stddev of a 64px thumbnail
+    GENERATION_MAX_RETRIES: int = 1
+
+    # Hedged image calls: after HEDGE_PERCENTILE of the operation's latency a
+    # duplicate is sent. Budget: HEDGE_BUDGET_RATIO hedges per call, BURST max.
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_BUDGET_RATIO: float = 0.05
+    HEDGE_BUDGET_BURST: int = 2
+
+    # Upload admission: rejected before saving and before any upstream call
+    UPLOAD_MAX_BYTES: int = 15 * 1024 * 1024
+    UPLOAD_MAX_PIXELS: int = 25_000_000
+    UPLOAD_MIN_SIDE: int = 128
+    UPLOAD_MAX_ASPECT_RATIO: float = 3.0
+
+    # Hair edits: "full" sends the whole photo, "head" sends a padded head crop
+    # and feathers the edit back into the original (see services/head_region)
+    FITTING_REGION_MODE: str = "full"
+    HEAD_REGION_DETECTOR: str = "heuristic"
+    HEAD_REGION_PADDING: float = 0.15    # fraction of the detected box, per side
+    HEAD_REGION_MAX_SIDE: int = 1024     # crop is downscaled to this before upload
+    HEAD_REGION_FEATHER: int = 24        # blend width in original pixels
+
+    # Model routing (see services/model_router): candidates per route, most
+    # preferred first. A model whose rolling p95 latency or error rate breaches
+    # the SLO is skipped for ROUTING_COOLDOWN_S; sessions stick to their model.
+    # Lists are JSON in the environment, e.g. IMAGE_MODELS='["a", "b"]'
+    ANALYSIS_MODELS: list[str] = ["gemini-3-flash-preview", "gemini-2.5-flash"]
+    RECOMMENDATION_MODELS: list[str] = ["gemini-3-flash-preview", "gemini-2.5-flash"]
+    IMAGE_MODELS: list[str] = ["gemini-2.5-flash-image", "gemini-3-pro-image-preview"]
+    ROUTING_ENABLED: bool = True
+    ROUTING_SLO_TEXT_P95_S: float = 15.0
+    ROUTING_SLO_IMAGE_P95_S: float = 45.0
+    ROUTING_SLO_ERROR_RATE: float = 0.25
+    ROUTING_WINDOW: int = 50             # most recent calls per model
+    ROUTING_MIN_SAMPLES: int = 10
+    ROUTING_COOLDOWN_S: float = 60.0
+
+    # Style recommendation: "llm" asks the model over the whole (gender-filtered)
+    # catalog, "fast" scores locally with no upstream call, "hybrid" sends the
+    # model only the local top RECOMMEND_SHORTLIST_SIZE (see services/local_recommender)
+    RECOMMEND_MODE: str = "llm"
+    RECOMMEND_SHORTLIST_SIZE: int = 12
+
+    # Comparison grid (/api/consultant/compare-grid)
+    GRID_TILE_CACHE_MB: int = 64         # decoded, scaled tiles kept in memory
+    GRID_QUALITY: int = 82               # JPEG / WebP quality of the grid
+
+    # Style picker sprite atlases (see services/sprite_atlas): square cell sizes in px
+    SPRITE_SIZES: list[int] = [96, 192]
+    SPRITE_QUALITY: int = 80
+
+    # Per-client quotas over a rolling minute (0 = unlimited). Usage is
+    # reported for USAGE_WINDOW_MINUTES under /api/ops/usage.
+    QUOTA_CALLS_PER_MINUTE: int = 0
+    QUOTA_TOKENS_PER_MINUTE: int = 0
+    QUOTA_IMAGES_PER_MINUTE: int = 0
+    USAGE_WINDOW_MINUTES: int = 60
+
+    # Load shedding (see core/load_shedding): units ~ upstream generations a
+    # request starts (pose = 6), held until the response finishes. Above the
+    # limits requests get 503 + Retry-After; bulk packs are shed first.
+    SHED_ENABLED: bool = True
+    SHED_MAX_UNITS_INTERACTIVE: int = 48
+    SHED_MAX_UNITS_BULK: int = 24
+    SHED_MAX_UNITS_TOTAL: int = 64
+    SHED_RETRY_AFTER_MAX_S: int = 60
+
+    # Idempotency-Key handling for the generation POSTs (see core/idempotency)
+    IDEMPOTENT_PATHS: list[str] = [
+        "/api/consultant/fitting",
+        "/api/consultant/time-change",
+        "/api/consultant/multi-angle",
+        "/api/consultant/pose",
+        "/api/consultant/photo-booth",
+        "/api/generate",
+    ]
+    IDEMPOTENCY_TTL_S: float = 3600.0
+    IDEMPOTENCY_MAX_ENTRIES: int = 5000
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 256 * 1024  # larger responses are not stored
+    IDEMPOTENCY_WAIT_S: float = 150.0    # how long a retry waits for a running original
+
+    # Generation quality tiers for fitting / quick generate (see services/quality_tiers):
+    # drafts send and return DRAFT_MAX_SIDE images and live in results/drafts/
+    GENERATION_QUALITY: str = "final"    # tier when the request does not say
+    DRAFT_MAX_SIDE: int = 512
+    DRAFT_QUALITY: int = 80              # JPEG quality of stored drafts
+    DRAFT_RETENTION_S: float = 86400.0   # drafts older than this are deleted
+    DRAFT_SWEEP_INTERVAL_S: float = 600.0
+    DRAFT_CACHE_TTL_S: float = 3600.0    # capped at DRAFT_RETENTION_S
+
+    # Decoded source images + encoded upstream payloads kept per process
+    # (see services/image_cache); bounded by pixel memory, not entry count
+    IMAGE_CACHE_ENABLED: bool = True
+    IMAGE_CACHE_MB: int = 256
+
+    # Cache + single-flight locks shared by all worker processes (see core/shared_cache).
+    # TTL 0 turns caching off for that kind of result.
+    SHARED_CACHE_ENABLED: bool = True
+    SHARED_CACHE_PATH: str = os.path.join(BACKEND_ROOT, "cache", "shared_cache.sqlite3")  # relative = under backend/
+    SHARED_CACHE_MAX_MB: int = 64
+    SHARED_LOCK_LEASE_S: float = 180.0   # a dead lock holder is taken over after this
+    SHARED_LOCK_POLL_S: float = 0.2      # how often waiters in other processes check for the value
+    ANALYSIS_CACHE_TTL_S: float = 86400.0
+    RECOMMEND_CACHE_TTL_S: float = 3600.0
+    FITTING_CACHE_TTL_S: float = 600.0   # same photo + style within this window reuses the image
+
+    # Gallery index of generated results per upload (see services/gallery_index)
+    GALLERY_DB_PATH: str = os.path.join(BACKEND_ROOT, "index", "gallery.sqlite3")  # relative = under backend/
+    GALLERY_PAGE_SIZE: int = 20
+    GALLERY_MAX_PAGE_SIZE: int = 100
+
+    # Worker pools (see core/worker_pools): Pillow work vs blocking I/O
+    CPU_POOL_WORKERS: int = os.cpu_count() or 2
+    IO_POOL_WORKERS: int = 16
+
+    # Admin-only endpoints (/api/ops/*: stats and profiling) require X-Admin-Token; empty = disabled
+    ADMIN_TOKEN: str = ""
+    PROFILE_MAX_REPORTS: int = 20        # cProfile reports kept in memory
+    PROFILE_MAX_SAMPLE_S: float = 60.0   # longest stack sampling window
+
+    # Run lazy initialization in the background at startup (readiness waits for it)
+    WARMUP_ON_STARTUP: bool = True
     
+    @field_validator("SHARED_CACHE_PATH", "GALLERY_DB_PATH")
+    @classmethod
+    def _under_backend_root(cls, path: str) -> str:
+        # Every worker must open the same file, however it was started
+        return os.path.join(BACKEND_ROOT, path)
+
     class Config:
         env_file = ".env"
+        extra = "ignore"  # .env also carries GOOGLE_API_KEY etc.
 
 settings = Settings()
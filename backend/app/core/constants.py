@@ -1,2 +1,13 @@
 # Constants
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
+
+# styles.json `face_shape_match` values and their Korean labels (as returned by analyze_face)
+FACE_SHAPE_LABELS = {
+    "oval": "계란형",
+    "round": "둥근형",
+    "square": "각진형",
+    "long": "긴형",
+    "diamond": "다이아몬드형",
+    "heart": "하트형",
+    "triangle": "삼각형",
+}
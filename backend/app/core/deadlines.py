@@ -0,0 +1,85 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() deadline of the current request (None = unbounded)
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Sets a deadline for everything awaited inside; a tighter outer deadline wins."""
+    if seconds is None:
+        yield
+        return
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new_deadline if current is None else min(current, new_deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def run_until(deadline: float, awaitable: Awaitable[T]) -> T:
+    """
+    Awaits `awaitable` under an absolute time.monotonic() deadline. For async
+    generators: a deadline_scope around `yield`s would be reset from whichever
+    task closes the generator, while this sets and resets it within one await.
+    """
+    with deadline_scope(deadline - time.monotonic()):
+        return await awaitable
+
+
+def remaining(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the current deadline, optionally capped. None if unbounded."""
+    deadline = _deadline.get()
+    left = None if deadline is None else max(0.0, deadline - time.monotonic())
+    if cap is None:
+        return left
+    return cap if left is None else min(cap, left)
+
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+async def cancel_on_disconnect(http_request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Awaits `awaitable` as a task, polling for a client disconnect in between.
+    On disconnect the task (and every upstream call it is awaiting) is cancelled.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print(f"Debug: Client disconnected, cancelling {http_request.url.path}")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                # Nobody is listening; the status is only visible in access logs
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def run_with_deadline(http_request: Request, seconds: Optional[float], awaitable: Awaitable[T],
+                            poll_interval: float = 0.5) -> T:
+    """Per-endpoint deadline + disconnect cancellation in one call."""
+    with deadline_scope(seconds):
+        return await cancel_on_disconnect(http_request, awaitable, poll_interval)
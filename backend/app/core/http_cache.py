@@ -0,0 +1,109 @@
+import hashlib
+import os
+import typing
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, PathLike, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Largest dynamic response hashed for an ETag
+MAX_ETAG_BODY_SIZE = 4 * 1024 * 1024
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with an explicit Cache-Control policy.
+    ETag / Last-Modified and If-None-Match / If-Modified-Since handling come
+    from StaticFiles itself; NotModifiedResponse keeps the Cache-Control header.
+    """
+
+    def __init__(self, *args, cache_control: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        if status_code == 200:
+            response.headers["Cache-Control"] = self.cache_control
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in if_none_match.split(","))
+
+
+class ConditionalGetMiddleware:
+    """
+    Adds a weak ETag to successful GET responses under `path_prefix` (the API)
+    that don't already carry one, and answers a matching If-None-Match with 304.
+    Only single-message bodies (JSON and other plain responses) are tagged:
+    streaming responses (more_body) and bodies over MAX_ETAG_BODY_SIZE are
+    passed through untouched, never buffered.
+    """
+
+    def __init__(self, app: ASGIApp, cache_control: str = "no-cache", path_prefix: str = "/api") -> None:
+        self.app = app
+        self.cache_control = cache_control
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or scope["method"] != "GET"
+                or not scope["path"].startswith(self.path_prefix)):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message: typing.Optional[Message] = None
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or "etag" in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            body = message.get("body", b"")
+            if (message["type"] != "http.response.body" or message.get("more_body", False)
+                    or len(body) > MAX_ETAG_BODY_SIZE):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["ETag"] = etag
+            if "cache-control" not in headers:
+                headers["Cache-Control"] = self.cache_control
+
+            if if_none_match and _etag_matches(etag, if_none_match):
+                not_modified = NotModifiedResponse(headers)
+                await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw_headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
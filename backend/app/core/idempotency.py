@@ -0,0 +1,241 @@
+"""
+Idempotency-Key support for the expensive generation POSTs.
+
+A request carrying `Idempotency-Key` is fingerprinted (method, path, query,
+body) and stored under (client key, key):
+- first request: runs normally; its response is kept for IDEMPOTENCY_TTL_S.
+  It also runs to completion if the caller disconnects, so the retry can
+  pick up the result instead of starting the generation again.
+- retry while the original is still running: waits for it (up to
+  IDEMPOTENCY_WAIT_S, then 409 + Retry-After).
+- retry after it finished: the stored response, with `Idempotent-Replayed: true`.
+- same key, different request: 422.
+Only 2xx responses are stored: a retry after a server error, a quota 429 or
+any other rejection runs again instead of replaying it for the whole TTL.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.request_context import current_client_key
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+
+@dataclass
+class IdempotencyEntry:
+    fingerprint: str
+    created: float = field(default_factory=time.monotonic)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    status: Optional[int] = None
+    headers: list = field(default_factory=list)
+    body: bytes = b""
+
+    @property
+    def completed(self) -> bool:
+        return self.status is not None
+
+
+class IdempotencyStore:
+    """Bounded (IDEMPOTENCY_MAX_ENTRIES) store with TTL, oldest entries evicted first."""
+
+    def __init__(self):
+        self._entries: OrderedDict[tuple, IdempotencyEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"started": 0, "replayed": 0, "waited": 0, "conflicts": 0, "wait_timeouts": 0, "discarded": 0}
+
+    def _prune(self, now: float):
+        # Entries are in creation order: expired ones are at the front.
+        # Running requests are never dropped.
+        stale = []
+        for key, entry in self._entries.items():
+            if now - entry.created <= settings.IDEMPOTENCY_TTL_S:
+                break
+            if entry.completed:
+                stale.append(key)
+        excess = len(self._entries) - len(stale) - settings.IDEMPOTENCY_MAX_ENTRIES
+        if excess > 0:
+            for key, entry in self._entries.items():
+                if excess <= 0:
+                    break
+                if entry.completed and key not in stale:
+                    stale.append(key)
+                    excess -= 1
+        for key in stale:
+            del self._entries[key]
+
+    def begin(self, key: tuple, fingerprint: str) -> tuple[str, IdempotencyEntry]:
+        """-> ("new" | "existing" | "conflict", entry)"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = IdempotencyEntry(fingerprint)
+                self.counters["started"] += 1
+                return "new", entry
+            if entry.fingerprint != fingerprint:
+                self.counters["conflicts"] += 1
+                return "conflict", entry
+            return "existing", entry
+
+    def complete(self, key: tuple, entry: IdempotencyEntry, status: int, headers: list, body: bytes):
+        entry.status, entry.headers, entry.body = status, headers, body
+        entry.done.set()
+
+    def discard(self, key: tuple, entry: IdempotencyEntry):
+        """Forgets a failed original; waiting retries then run it themselves."""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            self.counters["discarded"] += 1
+        entry.done.set()
+
+    def count(self, event: str):
+        with self._lock:
+            self.counters[event] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = sum(1 for e in self._entries.values() if not e.completed)
+            return {
+                "entries": len(self._entries),
+                "running": running,
+                "stored_bytes": sum(len(e.body) for e in self._entries.values()),
+                "max_entries": settings.IDEMPOTENCY_MAX_ENTRIES,
+                "ttl_s": settings.IDEMPOTENCY_TTL_S,
+                **self.counters,
+            }
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _json_error(status: int, detail: str, headers: Optional[dict] = None) -> list[Message]:
+    body = json.dumps({"detail": detail}).encode()
+    raw = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    raw += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return [
+        {"type": "http.response.start", "status": status, "headers": raw},
+        {"type": "http.response.body", "body": body},
+    ]
+
+
+class IdempotencyMiddleware:
+    """See module docstring. Only POSTs to IDEMPOTENT_PATHS are considered."""
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore = idempotency_store) -> None:
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        key = Headers(scope=scope).get(IDEMPOTENCY_HEADER) if scope["type"] == "http" else None
+        if (not key or scope["method"] != "POST"
+                or scope["path"].rstrip("/") not in settings.IDEMPOTENT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        if len(key) > MAX_KEY_LENGTH:
+            for message in _json_error(400, f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters"):
+                await send(message)
+            return
+
+        # The whole body is needed for the fingerprint; these endpoints take small JSON
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+        store_key = (current_client_key(), key)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_S
+        while True:
+            outcome, entry = self.store.begin(store_key, fingerprint)
+            if outcome == "new":
+                await self._run_original(scope, body, send, store_key, entry)
+                return
+            if outcome == "conflict":
+                for message in _json_error(422, "Idempotency-Key was already used with a different request"):
+                    await send(message)
+                return
+
+            if not entry.completed:
+                self.store.count("waited")
+                try:
+                    await asyncio.wait_for(entry.done.wait(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    self.store.count("wait_timeouts")
+                    for message in _json_error(409, "A request with this Idempotency-Key is still in progress",
+                                               {"Retry-After": "5"}):
+                        await send(message)
+                    return
+                if not entry.completed:
+                    continue  # the original failed and was discarded: run it ourselves
+
+            self.store.count("replayed")
+            await send({"type": "http.response.start", "status": entry.status,
+                        "headers": entry.headers + [(b"idempotent-replayed", b"true")]})
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+    async def _run_original(self, scope: Scope, body: bytes, send: Send, store_key: tuple, entry: IdempotencyEntry):
+        body_sent = False
+        never = asyncio.Event()
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # No disconnect is reported: the work finishes and is kept for the retry
+            await never.wait()
+            return {"type": "http.disconnect"}
+
+        status = None
+        headers: list = []
+        chunks: list[bytes] = []
+        storable = True
+        client_gone = False
+
+        async def capture_send(message: Message):
+            nonlocal status, headers, storable, client_gone
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if sum(len(c) for c in chunks) > settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    storable = False
+            if client_gone:
+                return
+            try:
+                await send(message)
+            except Exception:
+                client_gone = True
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            self.store.discard(store_key, entry)
+            raise
+        if status is None or not 200 <= status < 300 or not storable:
+            self.store.discard(store_key, entry)
+        else:
+            self.store.complete(store_key, entry, status, headers, b"".join(chunks))
@@ -0,0 +1,133 @@
+"""
+Admission control for the API: cheap 503s instead of unbounded pile-ups.
+
+Every costed endpoint holds `units` of capacity from the moment it is admitted
+until its response (or stream) finishes, including the time it spends queued
+for an upstream slot. A pose pack is six generations, so it costs six units
+where a fitting costs one. A request is refused with 503 + Retry-After when
+its class, or the service as a whole, would go over its unit limit.
+Bulk packs have the lower limit, so they are shed before interactive work.
+"""
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+# (method, path) -> (class, units). Units ~ upstream generations started.
+ROUTE_COSTS = {
+    ("POST", "/api/consultant/analyze"): ("interactive", 1),
+    ("POST", "/api/consultant/recommend"): ("interactive", 1),
+    ("POST", "/api/consultant/fitting"): ("interactive", 1),
+    ("POST", "/api/consultant/pipeline"): ("interactive", 5),
+    ("POST", "/api/upload"): ("interactive", 1),
+    ("POST", "/api/generate"): ("interactive", 1),
+    ("POST", "/api/consultant/photo-booth"): ("bulk", 1),
+    ("POST", "/api/consultant/compare-grid"): ("bulk", 1),
+    ("POST", "/api/consultant/time-change"): ("bulk", 3),
+    ("POST", "/api/consultant/multi-angle"): ("bulk", 4),
+    ("POST", "/api/consultant/pose"): ("bulk", 6),
+}
+
+
+class LoadShedder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight: dict[str, int] = defaultdict(int)   # class -> units
+        self.requests: dict[str, int] = defaultdict(int)    # class -> requests
+        self.admitted: dict[str, int] = defaultdict(int)
+        self.shed: dict[str, int] = defaultdict(int)
+        self._durations: dict[str, deque] = defaultdict(lambda: deque(maxlen=200))
+
+    @staticmethod
+    def limits() -> dict[str, int]:
+        return {"interactive": settings.SHED_MAX_UNITS_INTERACTIVE, "bulk": settings.SHED_MAX_UNITS_BULK}
+
+    def try_admit(self, op_class: str, units: int) -> bool:
+        with self._lock:
+            total = sum(self.in_flight.values())
+            limit = self.limits().get(op_class, settings.SHED_MAX_UNITS_TOTAL)
+            # An idle class always admits one request, however large, so a
+            # pack bigger than the limit is not refused forever
+            over_class = self.in_flight[op_class] > 0 and self.in_flight[op_class] + units > limit
+            over_total = total > 0 and total + units > settings.SHED_MAX_UNITS_TOTAL
+            if over_class or over_total:
+                self.shed[op_class] += 1
+                return False
+            self.in_flight[op_class] += units
+            self.requests[op_class] += 1
+            self.admitted[op_class] += 1
+            return True
+
+    def release(self, op_class: str, units: int, seconds: float):
+        with self._lock:
+            self.in_flight[op_class] -= units
+            self.requests[op_class] -= 1
+            self._durations[op_class].append(seconds)
+
+    def retry_after(self, op_class: str) -> int:
+        """Seconds until capacity is likely back: the class's median request time."""
+        with self._lock:
+            samples = sorted(self._durations.get(op_class) or ())
+        typical = samples[len(samples) // 2] if samples else 1.0
+        return max(1, min(settings.SHED_RETRY_AFTER_MAX_S, math.ceil(typical)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            limits = self.limits()
+            return {
+                "max_units_total": settings.SHED_MAX_UNITS_TOTAL,
+                "in_flight_units_total": sum(self.in_flight.values()),
+                "classes": {
+                    op_class: {
+                        "max_units": limits.get(op_class),
+                        "in_flight_units": self.in_flight.get(op_class, 0),
+                        "in_flight_requests": self.requests.get(op_class, 0),
+                        "admitted": self.admitted.get(op_class, 0),
+                        "shed": self.shed.get(op_class, 0),
+                    }
+                    for op_class in sorted(set(limits) | set(self.admitted) | set(self.shed))
+                },
+            }
+
+
+load_shedder = LoadShedder()
+
+
+def route_cost(method: str, path: str) -> Optional[tuple[str, int]]:
+    return ROUTE_COSTS.get((method, path.rstrip("/")))
+
+
+class LoadSheddingMiddleware:
+    def __init__(self, app: ASGIApp, shedder: LoadShedder = load_shedder) -> None:
+        self.app = app
+        self.shedder = shedder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cost = route_cost(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if cost is None or not settings.SHED_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        op_class, units = cost
+        if not self.shedder.try_admit(op_class, units):
+            retry_after = self.shedder.retry_after(op_class)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": {"error": "overloaded", "class": op_class,
+                                    "message": "Server is busy, please retry shortly", "retry_after": retry_after}},
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.release(op_class, units, time.monotonic() - started)
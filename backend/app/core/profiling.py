@@ -0,0 +1,160 @@
+"""
+Production-safe profiling hooks (admin only, see /api/ops/profile/*).
+
+- RequestProfiler: armed for the next N requests to one route, runs each of
+  them under cProfile and keeps the last PROFILE_MAX_REPORTS reports
+  (pstats text + raw stats loadable with pstats / snakeviz). cProfile sees
+  the event-loop thread only: work pushed to the CPU / I/O pools shows up as
+  time waiting on the future, and coroutines of other requests running
+  meanwhile are included. One request is profiled at a time.
+- StackSampler: samples sys._current_frames() of every thread at a fixed
+  interval for a fixed window and returns collapsed stacks
+  ("thread;frame;frame count" per line) for flamegraph.pl / speedscope.
+When disarmed, the middleware costs one attribute check per request.
+"""
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+
+class RequestProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.route: Optional[str] = None
+        self.remaining = 0
+        self.sort = "cumulative"
+        self.limit = 40
+        self._busy = False
+        self._ids = itertools.count(1)
+        self.reports: deque = deque(maxlen=settings.PROFILE_MAX_REPORTS)
+
+    @property
+    def armed(self) -> bool:
+        return self.remaining > 0
+
+    def arm(self, route: str, count: int, sort: str = "cumulative", limit: int = 40):
+        with self._lock:
+            self.route = route.rstrip("/") or "/"
+            self.remaining = count
+            self.sort = sort
+            self.limit = limit
+
+    def disarm(self):
+        with self._lock:
+            self.remaining = 0
+
+    def claim(self, path: str) -> bool:
+        """True if this request should be profiled (and takes one of the N slots)."""
+        with self._lock:
+            if self.remaining <= 0 or self._busy or (path.rstrip("/") or "/") != self.route:
+                return False
+            self.remaining -= 1
+            self._busy = True
+            return True
+
+    def finish(self, profile: cProfile.Profile, method: str, path: str, elapsed: float):
+        stats = pstats.Stats(profile)
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats(self.sort).print_stats(self.limit)
+        with self._lock:
+            self._busy = False
+            self.reports.append({
+                "id": next(self._ids),
+                "method": method,
+                "path": path,
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "finished_at": time.time(),
+                "report": text.getvalue(),
+                # What pstats.Stats.dump_stats() writes
+                "raw": marshal.dumps(stats.stats),
+            })
+
+    def get_report(self, report_id: int) -> Optional[dict]:
+        with self._lock:
+            return next((r for r in self.reports if r["id"] == report_id), None)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "route": self.route,
+                "remaining": self.remaining,
+                "sort": self.sort,
+                "reports": [{k: v for k, v in r.items() if k not in ("report", "raw")} for r in self.reports],
+            }
+
+
+request_profiler = RequestProfiler()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler = request_profiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.profiler.armed or scope["type"] != "http" or not self.profiler.claim(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.disable()
+            self.profiler.finish(profile, scope["method"], scope["path"], time.perf_counter() - started)
+
+
+class SamplerBusy(Exception):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float) -> str:
+        """Blocks for `seconds`; returns collapsed stacks, most frequent first."""
+        if not self._lock.acquire(blocking=False):
+            raise SamplerBusy("A sampling run is already in progress")
+        try:
+            me = threading.get_ident()
+            counts: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    counts[";".join(reversed(stack))] += 1
+                time.sleep(interval)
+            return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+        finally:
+            self._lock.release()
+
+
+stack_sampler = StackSampler()
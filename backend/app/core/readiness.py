@@ -0,0 +1,71 @@
+import threading
+import time
+
+from app.services.gemini_client import gemini_client
+from app.services.style_catalog import style_catalog
+
+
+class Readiness:
+    """
+    Readiness = the pod can actually serve: the Gemini client is constructed
+    and the style catalog is loaded. Liveness never depends on either.
+    """
+
+    def __init__(self):
+        self.warmup_state = "not_started"  # not_started | running | done
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+
+    def check(self) -> dict:
+        checks = {}
+
+        client_ok = gemini_client.initialize()
+        checks["gemini_client"] = {"ok": client_ok, "detail": None if client_ok else gemini_client.init_error}
+
+        try:
+            styles = style_catalog.get_styles()
+            checks["style_catalog"] = {"ok": bool(styles), "detail": f"{len(styles)} styles"}
+        except Exception as e:
+            checks["style_catalog"] = {"ok": False, "detail": str(e)}
+
+        return {
+            "ready": all(c["ok"] for c in checks.values()) and self.warmup_state != "running",
+            "warmup": self.warmup_state,
+            "checks": checks,
+        }
+
+    def warmup(self):
+        """Front-loads lazy initialization so the first real request doesn't pay for it."""
+        with self._lock:
+            if self.warmup_state != "not_started":
+                return
+            self.warmup_state = "running"
+
+        start = time.perf_counter()
+        try:
+            gemini_client.initialize()
+            style_catalog.get_styles()
+
+            from PIL import Image
+            Image.init()  # registers every codec plugin
+
+            from app.services.style_search_service import style_search_service
+            style_search_service.sync()
+
+            from app.services.designer_service import designer_service
+            designer_service.index
+
+            from app.services.sprite_atlas import sprite_atlas
+            sprite_atlas.sync(wait=True)
+        except Exception as e:
+            print(f"Warmup error: {e}")
+        finally:
+            self.warmup_seconds = round(time.perf_counter() - start, 3)
+            self.warmup_state = "done"
+            print(f"Warmup finished in {self.warmup_seconds}s")
+
+    def start_warmup(self):
+        threading.Thread(target=self.warmup, name="warmup", daemon=True).start()
+
+
+readiness = Readiness()
@@ -0,0 +1,49 @@
+from contextvars import ContextVar
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Who the current request belongs to. Session = one consultation (fair
+# scheduling, sticky routing); client key = the caller being accounted.
+session_id: ContextVar[str] = ContextVar("session_id", default="anonymous")
+client_key: ContextVar[str] = ContextVar("client_key", default="anonymous")
+
+SESSION_HEADER = "x-session-id"
+CLIENT_KEY_HEADER = "x-client-key"
+
+
+def current_session() -> str:
+    return session_id.get()
+
+
+def current_client_key() -> str:
+    return client_key.get()
+
+
+class RequestContextMiddleware:
+    """
+    Populates the session / client-key context variables from the
+    X-Session-Id and X-Client-Key headers, falling back to the client address.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        client = scope.get("client")
+        address = client[0] if client else "anonymous"
+        key = headers.get(CLIENT_KEY_HEADER) or address
+        session = headers.get(SESSION_HEADER) or key
+
+        key_token = client_key.set(key[:128])
+        session_token = session_id.set(session[:128])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session_id.reset(session_token)
+            client_key.reset(key_token)
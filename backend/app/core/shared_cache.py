@@ -0,0 +1,323 @@
+"""
+Cache and single-flight locks shared by every worker process.
+
+Backed by one SQLite file in WAL mode (SHARED_CACHE_PATH): readers never
+block each other or the writer, and all uvicorn workers on the host see the
+same entries. Values are JSON; entries carry a TTL and the file is kept under
+SHARED_CACHE_MAX_MB by evicting expired entries first, then the least
+recently used.
+
+get_or_compute() is the service-layer entry point: a hit is returned as-is;
+on a miss exactly one caller on the host computes the value while the others
+wait for it. Within a process waiters share an asyncio future; across
+processes the computing worker holds a lease row in the `locks` table and the
+others poll the cache until the value shows up. A lease whose holder died
+expires after SHARED_LOCK_LEASE_S (or the request deadline) and is taken
+over. Failures are not shared: if the holder finishes without a value, the
+next waiter computes it itself. Values of None are never cached.
+
+Every SQLite call runs on the I/O pool. If the store is unusable, callers
+compute directly, as if the cache were empty; if the file cannot be opened at
+all (missing / read-only directory), the store is switched off for the life
+of the process after the first failure.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core import deadlines
+from app.core.config import settings
+from app.core.worker_pools import io_pool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS locks (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Hits refresh accessed_at at most this often, so hot keys don't take the write lock on every read
+ACCESS_RESOLUTION_S = 5.0
+
+
+def connect_wal(path: str, schema: str) -> sqlite3.Connection:
+    """
+    Autocommit connection to a WAL-mode SQLite file that several worker
+    processes share; `schema` is created by whichever opens the file first.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable across process crashes
+    conn.executescript(schema)
+    return conn
+
+
+def make_key(namespace: str, *parts) -> str:
+    """namespace:sha256 of the JSON-encoded parts (dicts in any key order hash the same)."""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content (cache keys for uploads: same photo, same key)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SharedCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Lease owner id: unique per process (and per instance)
+        self.owner = f"{os.getpid()}-{os.urandom(4).hex()}"
+        self._local = threading.local()
+        # Set when the file cannot be opened: every caller then computes directly
+        self.unusable: Optional[str] = None
+        # (event loop, key) -> future of the computing request; one loop per worker under uvicorn
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._stats_lock = threading.Lock()
+        self.counters: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, namespace: str, event: str, n: int = 1):
+        with self._stats_lock:
+            self.counters[namespace][event] += n
+
+    # === SQLite (blocking; called on io_pool) ===
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = self._local.conn = connect_wal(self.path, SCHEMA)
+            except (sqlite3.Error, OSError) as e:
+                if self.unusable is None:
+                    print(f"Shared cache disabled: cannot open {self.path}: {e}")
+                self.unusable = str(e)
+                raise
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if now - row[2] > ACCESS_RESOLUTION_S:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> int:
+        """Stores `value` for `ttl` seconds; returns the number of entries evicted to make room."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(key) + len(value), now + ttl, now),
+            )
+            evicted = self._evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return evicted
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        evicted = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        return evicted + len(stale)
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def try_lock(self, name: str, lease: float) -> str:
+        """Takes the lease on `name`: "taken", "takeover" (the previous holder's lease expired) or "busy"."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT expires_at FROM locks WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] > now:
+                conn.execute("COMMIT")
+                return "busy"
+            conn.execute(
+                "INSERT OR REPLACE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, self.owner, now + lease),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return "taken" if row is None else "takeover"
+
+    def unlock(self, name: str):
+        self._connection().execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def lock_held(self, name: str) -> bool:
+        row = self._connection().execute("SELECT expires_at FROM locks WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM locks")
+
+    # === Async API ===
+
+    async def _run(self, fn, *args):
+        try:
+            return await io_pool.run(fn, *args, label="shared_cache")
+        except (sqlite3.Error, OSError) as e:
+            print(f"Shared cache error ({fn.__name__}): {e}")
+            self._count("store", "errors")
+            return None
+
+    async def get_json(self, key: str):
+        data = await self._run(self.get, key)
+        return None if data is None else json.loads(data)
+
+    async def set_json(self, key: str, value, ttl: float):
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        evicted = await self._run(self.set, key, data, ttl)
+        if evicted:
+            self._count("store", "evictions", evicted)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float):
+        """
+        Cached JSON value of `key`, or the result of `compute()` (computed by one caller
+        on the host at a time, cached for `ttl` seconds unless it is None).
+        """
+        namespace = key.split(":", 1)[0]
+        if not settings.SHARED_CACHE_ENABLED or ttl <= 0 or self.unusable is not None:
+            return await compute()
+
+        while True:
+            value = await self.get_json(key)
+            if value is not None:
+                self._count(namespace, "hits")
+                return value
+
+            # Same process: wait on the future of the request that is computing it
+            pending = self._inflight.get((asyncio.get_running_loop(), key))
+            if pending is None:
+                break
+            value = await asyncio.shield(pending)
+            if value is not None:
+                self._count(namespace, "coalesced")
+                return value
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[(loop, key)] = future
+        value = None
+        try:
+            value = await self._lead(key, namespace, compute, ttl)
+            return value
+        finally:
+            self._inflight.pop((loop, key), None)
+            future.set_result(value)
+
+    async def _lead(self, key: str, namespace: str, compute, ttl: float):
+        """This process's one caller for `key`: takes the host-wide lease, or waits for its holder."""
+        while True:
+            lease = max(1.0, deadlines.remaining(cap=settings.SHARED_LOCK_LEASE_S))
+            state = await self._run(self.try_lock, key, lease)
+            if state == "busy":
+                self._count(namespace, "lock_waits")
+                value = await self._wait_for(key)
+                if value is not None:
+                    self._count(namespace, "coalesced")
+                    return value
+                continue
+            if state == "takeover":
+                self._count(namespace, "lock_takeovers")
+            try:
+                # Published between our miss and taking the lease
+                value = await self.get_json(key)
+                if value is not None:
+                    self._count(namespace, "hits")
+                    return value
+                self._count(namespace, "misses")
+                value = await compute()
+                if value is not None:
+                    await self.set_json(key, value, ttl)
+                return value
+            finally:
+                if state is not None:  # None: the store failed, nothing to release
+                    await self._run(self.unlock, key)
+
+    async def _wait_for(self, key: str):
+        """Polls until the value appears or the lease is released / expires."""
+        while True:
+            await asyncio.sleep(settings.SHARED_LOCK_POLL_S)
+            deadlines.check_deadline()
+            value = await self.get_json(key)
+            if value is not None:
+                return value
+            if not await self._run(self.lock_held, key):
+                return await self.get_json(key)
+
+    def stats(self) -> dict:
+        try:
+            conn = self._connection()
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            locks = conn.execute("SELECT COUNT(*) FROM locks WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        except (sqlite3.Error, OSError) as e:
+            return {"enabled": settings.SHARED_CACHE_ENABLED, "path": self.path, "error": str(e)}
+        with self._stats_lock:
+            namespaces = {}
+            for namespace, counters in self.counters.items():
+                lookups = counters.get("hits", 0) + counters.get("coalesced", 0) + counters.get("misses", 0)
+                namespaces[namespace] = {
+                    **counters,
+                    "hit_rate": round((lookups - counters.get("misses", 0)) / lookups, 3) if lookups else None,
+                }
+        return {
+            "enabled": settings.SHARED_CACHE_ENABLED,
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "locks_held": locks,
+            "in_flight_here": len(self._inflight),
+            "namespaces": namespaces,
+        }
+
+
+shared_cache = SharedCache(settings.SHARED_CACHE_PATH, settings.SHARED_CACHE_MAX_MB * 1024 * 1024)
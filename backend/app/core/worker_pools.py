@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def percentile(samples, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of `samples` (None if empty); shared by the latency stats."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class WorkerPool:
+    """
+    A named, fixed-size thread pool with queue-time and utilization stats.
+
+    Two instances keep CPU and blocking I/O capacity apart:
+    - cpu_pool: Pillow decode / transpose / resize / composite / encode.
+      Threads (not processes) because Pillow releases the GIL in its C loops
+      and PIL images would otherwise have to be pickled across processes.
+    - io_pool: blocking I/O (remote image fetches, result file writes).
+    Upstream model calls are async and use neither.
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.running = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+        self._queue_waits: deque = deque(maxlen=1000)
+        self._by_label: dict[str, list] = defaultdict(lambda: [0, 0.0])  # label -> [count, run seconds]
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _instrumented(self, fn: Callable[..., T], label: str, enqueued_at: float) -> T:
+        started = time.monotonic()
+        with self._lock:
+            self.running += 1
+            self._queue_waits.append(started - enqueued_at)
+        try:
+            return fn()
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self._busy_seconds += elapsed
+                stats = self._by_label[label]
+                stats[0] += 1
+                stats[1] += elapsed
+
+    async def run(self, fn: Callable[..., T], *args, label: Optional[str] = None, **kwargs) -> T:
+        """Runs fn(*args, **kwargs) on the pool without blocking the event loop."""
+        call = functools.partial(fn, *args, **kwargs)
+        with self._lock:
+            self.submitted += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            self._instrumented, call, label or getattr(fn, "__name__", "call"), time.monotonic(),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = max(1e-9, time.monotonic() - self._started_at)
+            p50 = percentile(self._queue_waits, 50)
+            p95 = percentile(self._queue_waits, 95)
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": self.submitted - self.completed - self.running,
+                "completed": self.completed,
+                "utilization": round(self._busy_seconds / (elapsed * self.workers), 4),
+                "queue_wait_p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+                "queue_wait_p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+                "operations": {
+                    label: {"count": count, "avg_ms": round(seconds / count * 1000, 2)}
+                    for label, (count, seconds) in sorted(self._by_label.items())
+                },
+            }
+
+
+cpu_pool = WorkerPool("cpu", settings.CPU_POOL_WORKERS)
+io_pool = WorkerPool("io", settings.IO_POOL_WORKERS)
@@ -1,11 +1,58 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 import os
 
-from app.api.endpoints import consultant, quick_styles, quick_generate, quick_upload
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded
+from app.core.compression import CompressionMiddleware
+from app.core.http_cache import CachedStaticFiles, ConditionalGetMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.load_shedding import LoadSheddingMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.readiness import readiness
+from app.core.request_context import RequestContextMiddleware
+from app.api.deps import quota_exceeded_response
+from app.services.quality_tiers import draft_sweeper
+from app.services.usage_service import QuotaExceeded
+from app.api.endpoints import consultant, quick_styles, quick_generate, quick_upload, designers, gallery, ops
 
-app = FastAPI(title="Hair Omakase API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.WARMUP_ON_STARTUP:
+        readiness.start_warmup()
+    # Deletes expired drafts (results/drafts/) for as long as the app runs
+    sweeper = asyncio.create_task(draft_sweeper())
+    yield
+    sweeper.cancel()
+
+app = FastAPI(title="Hair Omakase API", version="1.0", lifespan=lifespan)
+
+# Quotas crossed in the middle of a request (e.g. inside a variant pack)
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    error = quota_exceeded_response(exc)
+    return JSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers=error.headers)
+
+# Request deadlines (see core/deadlines) that ran out before a response was ready
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+# Admin-armed cProfile of the next N requests to a route (innermost: times the app only)
+app.add_middleware(ProfilingMiddleware)
+
+# Fast 503 + Retry-After when too much work is in flight (per endpoint class).
+# This and the idempotency layer are added before CORS (= inside it), so their
+# error responses still carry CORS headers
+app.add_middleware(LoadSheddingMiddleware)
+
+# Retried generation POSTs with the same Idempotency-Key reuse the first response.
+# Inside RequestContextMiddleware: keys are scoped per client key. Outside the
+# load shedder: a retry that waits on / replays its original costs no capacity
+app.add_middleware(IdempotencyMiddleware)
 
 # CORS
 app.add_middleware(
@@ -14,6 +61,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.CORS_MAX_AGE,
+)
+
+# Session / client identification for scheduling and accounting
+app.add_middleware(RequestContextMiddleware)
+
+# Response optimization: ETag/304 for API GETs, then compression on the way out
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
 )
 
 # Directories
@@ -25,8 +85,15 @@ os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
 # Mount Static
-app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
-app.mount("/results", StaticFiles(directory=RESULTS_DIR), name="results")
+# Result filenames are random and never reused, so results are cached as immutable
+app.mount("/uploads", CachedStaticFiles(
+    directory=UPLOADS_DIR,
+    cache_control=f"public, max-age={settings.UPLOADS_CACHE_MAX_AGE}",
+), name="uploads")
+app.mount("/results", CachedStaticFiles(
+    directory=RESULTS_DIR,
+    cache_control=f"public, max-age={settings.RESULTS_CACHE_MAX_AGE}, immutable",
+), name="results")
 
 # Remote Static for placeholder images (Optional, can be used for mock data serving)
 # app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -36,11 +103,22 @@ app.include_router(consultant.router, prefix="/api/consultant", tags=["consultan
 app.include_router(quick_styles.router, prefix="/api/styles", tags=["quick_styles"])
 app.include_router(quick_generate.router, prefix="/api/generate", tags=["quick_generate"])
 app.include_router(quick_upload.router, prefix="/api/upload", tags=["quick_upload"])
+app.include_router(designers.router, prefix="/api/designers", tags=["designers"])
+app.include_router(gallery.router, prefix="/api/gallery", tags=["gallery"])
+app.include_router(ops.router, prefix="/api/ops", tags=["ops"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Hair Omakase API"}
 
 @app.get("/health")
+@app.get("/health/live")
 def health_check():
+    # Liveness: the process is up and serving requests
     return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness_check():
+    # Readiness: Gemini client constructed and style catalog loaded
+    report = readiness.check()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
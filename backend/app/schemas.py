@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 
 class FaceAnalysisResult(BaseModel):
     face_shape: str
@@ -21,7 +21,29 @@ class RecommendationResponse(BaseModel):
     recommendations: List[StyleDebug]
     consultant_comment: str
 
-class FittingRequest(BaseModel):
+class HeadRegionOptions(BaseModel):
+    """헤어 편집 영역 옵션 (head: 머리 영역만 잘라서 편집 후 원본에 합성)"""
+    region_mode: Optional[Literal["full", "head"]] = None  # None이면 서버 기본값
+    head_box: Optional[List[float]] = None  # [left, top, right, bottom], 0~1 정규화 좌표
+
+    @field_validator("head_box")
+    @classmethod
+    def _check_head_box(cls, box):
+        if box is None:
+            return box
+        if len(box) != 4:
+            raise ValueError("head_box must be [left, top, right, bottom]")
+        left, top, right, bottom = box
+        if not (0.0 <= left < right <= 1.0 and 0.0 <= top < bottom <= 1.0):
+            raise ValueError("head_box must be normalized with left < right and top < bottom")
+        return box
+
+class GenerationOptions(HeadRegionOptions):
+    """생성 품질 옵션 (draft: 축소 입력/작은 결과로 빠른 미리보기, final: 원본 해상도)"""
+    quality: Optional[Literal["draft", "final"]] = None  # None이면 서버 기본값
+    seed: Optional[int] = Field(None, ge=0, le=2**31 - 1)  # draft 응답의 seed를 final 요청에 그대로 전달
+
+class FittingRequest(GenerationOptions):
     style_id: str
     user_image_path: str # In real app, this might be an upload ID
 
@@ -50,3 +72,14 @@ class PhotoBoothRequest(BaseModel):
     """인생세컷 합성 요청"""
     image_urls: List[str]  # 선택된 3개 이미지 URL
     style_name: str
+
+class ComparisonGridItem(BaseModel):
+    image_url: str  # 피팅 결과 이미지 URL (/results/...)
+    style_id: str   # 라벨은 styles.json의 스타일 이름
+
+class ComparisonGridRequest(BaseModel):
+    """피팅 결과 비교 그리드 합성 요청"""
+    items: List[ComparisonGridItem] = Field(..., min_length=1, max_length=12)
+    width: int = Field(1024, ge=256, le=2048)  # 결과 이미지 가로 크기(px)
+    columns: Optional[int] = Field(None, ge=1, le=12)  # 기본: 4개 이하면 한 줄
+    format: Literal["jpeg", "webp"] = "jpeg"
@@ -0,0 +1,165 @@
+"""
+styles.json schema validation and the precompiled catalog artifact.
+
+`validate_json.py` (backend root) validates the catalog and writes
+app/data/styles.compiled.pickle: the parsed styles, the id/name indexes and
+the serialized /api/styles payload. StyleCatalog loads that artifact with a
+single unpickle instead of parsing JSON and rebuilding everything per style.
+The artifact records the size/mtime of the styles.json it was built from; a
+stale or missing artifact is ignored and styles.json is compiled in memory.
+"""
+import json
+import os
+import pickle
+import re
+from typing import Optional
+
+from app.core.constants import FACE_SHAPE_LABELS
+
+ARTIFACT_FORMAT = 1
+
+REQUIRED_FIELDS = {
+    "id": str,
+    "name": str,
+    "gender": str,
+    "tags": list,
+    "face_shape_match": list,
+    "description": str,
+    "prompt_modifier": str,
+    "image_url": str,
+}
+OPTIONAL_FIELDS = {"negative_prompt_modifier": str}
+
+ID_PATTERN = re.compile(r"^(m|w)_\d{2,}$")
+ID_PREFIX_GENDERS = {"m": "male", "w": "female"}
+
+
+def validate_styles(styles, uploads_dir: Optional[str] = None) -> tuple[list[str], list[str]]:
+    """
+    -> (errors, warnings). `uploads_dir` enables the image_url existence check
+    for /uploads/... images (a missing image is a warning).
+    """
+    errors: list[str] = []
+    warnings: list[str] = []
+    if not isinstance(styles, list):
+        return ["top level must be a list of styles"], warnings
+
+    seen_ids: dict[str, int] = {}
+    seen_names: dict[str, str] = {}
+    for index, style in enumerate(styles):
+        where = f"styles[{index}]"
+        if not isinstance(style, dict):
+            errors.append(f"{where}: must be an object")
+            continue
+        where = f"styles[{index}] ({style.get('id', '?')})"
+
+        for field, expected in REQUIRED_FIELDS.items():
+            if field not in style:
+                errors.append(f"{where}: missing '{field}'")
+            elif not isinstance(style[field], expected):
+                errors.append(f"{where}: '{field}' must be {expected.__name__}")
+        for field, expected in OPTIONAL_FIELDS.items():
+            if field in style and not isinstance(style[field], expected):
+                errors.append(f"{where}: '{field}' must be {expected.__name__}")
+        unknown = set(style) - set(REQUIRED_FIELDS) - set(OPTIONAL_FIELDS)
+        if unknown:
+            warnings.append(f"{where}: unknown fields {sorted(unknown)}")
+
+        style_id = style.get("id")
+        if isinstance(style_id, str):
+            if style_id in seen_ids:
+                errors.append(f"{where}: duplicate id (also styles[{seen_ids[style_id]}])")
+            seen_ids.setdefault(style_id, index)
+            match = ID_PATTERN.match(style_id)
+            if not match:
+                errors.append(f"{where}: id must look like m_01 / w_01")
+            elif style.get("gender") != ID_PREFIX_GENDERS[match.group(1)]:
+                errors.append(f"{where}: gender '{style.get('gender')}' does not match the "
+                              f"'{match.group(1)}_' id prefix")
+
+        if style.get("gender") not in ID_PREFIX_GENDERS.values():
+            errors.append(f"{where}: gender must be 'male' or 'female'")
+
+        for field in ("name", "prompt_modifier"):
+            if isinstance(style.get(field), str) and not style[field].strip():
+                errors.append(f"{where}: '{field}' is empty")
+        name = style.get("name")
+        if isinstance(name, str):
+            if name in seen_names:
+                warnings.append(f"{where}: duplicate name '{name}' (also {seen_names[name]}); "
+                                f"lookups by name return the first")
+            seen_names.setdefault(name, style_id)
+
+        if isinstance(style.get("tags"), list) and not all(isinstance(t, str) and t for t in style["tags"]):
+            errors.append(f"{where}: tags must be non-empty strings")
+
+        shapes = style.get("face_shape_match")
+        if isinstance(shapes, list):
+            if not shapes:
+                errors.append(f"{where}: face_shape_match is empty")
+            invalid = [s for s in shapes if s not in FACE_SHAPE_LABELS]
+            if invalid:
+                errors.append(f"{where}: unknown face shapes {invalid} (valid: {sorted(FACE_SHAPE_LABELS)})")
+
+        image_url = style.get("image_url")
+        if isinstance(image_url, str):
+            if image_url.startswith("/uploads/"):
+                if uploads_dir is not None:
+                    image_path = os.path.join(uploads_dir, image_url[len("/uploads/"):])
+                    if not os.path.isfile(image_path):
+                        warnings.append(f"{where}: image not found: {image_path}")
+            elif not image_url.startswith(("http://", "https://")):
+                errors.append(f"{where}: image_url must be /uploads/... or an http(s) URL")
+
+    return errors, warnings
+
+
+def styles_payload(styles: list[dict]) -> bytes:
+    """The /api/styles response body."""
+    payload = {
+        gender: [{"name": s["name"], "image_url": s.get("image_url", "")} for s in styles if s.get("gender") == gender]
+        for gender in ("male", "female")
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compile_catalog(styles: list[dict]) -> dict:
+    """Parsed catalog plus everything derived from it that the server needs."""
+    by_name: dict[str, dict] = {}
+    for s in styles:
+        by_name.setdefault(s.get("name"), s)
+    return {
+        "styles": styles,
+        "by_id": {s["id"]: s for s in styles},
+        "by_name": by_name,
+        "styles_payload": styles_payload(styles),
+    }
+
+
+def source_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_artifact(artifact_path: str, compiled: dict, signature: tuple[int, int]):
+    data = pickle.dumps({"format": ARTIFACT_FORMAT, "source_signature": signature, **compiled},
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path = f"{artifact_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, artifact_path)  # readers never see a half-written artifact
+
+
+def load_artifact(artifact_path: str, signature: tuple[int, int]) -> Optional[dict]:
+    """The compiled catalog if the artifact exists and was built from this exact source, else None."""
+    try:
+        with open(artifact_path, "rb") as f:
+            artifact = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable catalog artifact {artifact_path}: {e}")
+        return None
+    if artifact.get("format") != ARTIFACT_FORMAT or tuple(artifact.get("source_signature", ())) != tuple(signature):
+        return None
+    return artifact
@@ -0,0 +1,150 @@
+"""
+Side-by-side comparison grid of fitting results, returned as one compressed
+image (see photo_booth.render_comparison_grid for the layout).
+
+Decoding a full-size result is the expensive part, so decoded tiles are kept
+in an LRU bounded by GRID_TILE_CACHE_MB, keyed by source and a tile width
+bucket (and the file's mtime/size). Any cached bucket at least as
+wide as the cell is reused and only scaled down, so re-rendering a grid with
+one more style (more columns, smaller cells) decodes only the new image.
+"""
+import asyncio
+import io
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.worker_pools import cpu_pool
+from app.services.photo_booth import GRID_PADDING, fit_to_cell, render_comparison_grid
+
+TILE_ASPECT = 5 / 4  # height / width, same portrait cell as the photo booth
+TILE_WIDTH_BUCKETS = (128, 256, 384, 512, 768, 1024, 1536, 2048)
+MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+class TileCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._tiles: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, keys: list):
+        """First cached tile among `keys` (in order), or None."""
+        with self._lock:
+            for key in keys:
+                tile = self._tiles.get(key)
+                if tile is not None:
+                    self._tiles.move_to_end(key)
+                    self.hits += 1
+                    return tile
+            self.misses += 1
+            return None
+
+    def put(self, key, tile):
+        size = tile.width * tile.height * 3
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self._bytes -= old.width * old.height * 3
+            self._tiles[key] = tile
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self._bytes -= evicted.width * evicted.height * 3
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tiles": len(self._tiles),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+def grid_layout(count: int, width: int, columns: Optional[int] = None) -> tuple[int, int, int]:
+    """-> (columns, tile width, tile height) for `count` tiles in a grid `width` px wide."""
+    columns = columns or (count if count <= 4 else math.ceil(math.sqrt(count)))
+    columns = max(1, min(columns, count))
+    tile_width = max(32, (width - (columns + 1) * GRID_PADDING) // columns)
+    return columns, tile_width, round(tile_width * TILE_ASPECT)
+
+
+def tile_bucket(tile_width: int) -> int:
+    """Cached tile width for a cell: the smallest bucket at least as wide."""
+    return next((b for b in TILE_WIDTH_BUCKETS if b >= tile_width), TILE_WIDTH_BUCKETS[-1])
+
+
+def _decode_tile(source, tile_width: int, tile_height: int):
+    from PIL import Image
+    with Image.open(source) as img:
+        # JPEG sources can be decoded at a reduced scale straight away
+        img.draft("RGB", (tile_width, tile_height))
+        return fit_to_cell(img, tile_width, tile_height)
+
+
+def _encode(canvas, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        canvas.save(buffer, "WEBP", quality=settings.GRID_QUALITY, method=4)
+    else:
+        canvas.save(buffer, "JPEG", quality=settings.GRID_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+class ComparisonGridService:
+    def __init__(self):
+        self.tiles = TileCache(settings.GRID_TILE_CACHE_MB * 1024 * 1024)
+
+    async def _tile(self, source: str, tile_width: int, tile_height: int):
+        """
+        `source` is a local file path (results / uploads only: remote URLs are
+        rejected by the endpoint). Returns the source fitted to tile_width x tile_height.
+        """
+        bucket = tile_bucket(tile_width)
+        stat = os.stat(source)
+        source_key = (source, stat.st_mtime_ns, stat.st_size)
+
+        usable = [source_key + (b,) for b in TILE_WIDTH_BUCKETS if b >= bucket]
+        tile = self.tiles.get(usable)
+        if tile is None:
+            tile = await cpu_pool.run(_decode_tile, source, bucket, round(bucket * TILE_ASPECT), label="grid_tile")
+            self.tiles.put(usable[0], tile)
+        if tile.width <= tile_width and tile.height <= tile_height:
+            return tile
+        # Scaling a cached bucket tile is cheap next to decoding the source
+        return await cpu_pool.run(fit_to_cell, tile, tile_width, tile_height, label="grid_tile_fit")
+
+    async def render(self, sources: list[str], labels: list[str], width: int,
+                     columns: Optional[int] = None, image_format: str = "jpeg") -> bytes:
+        """Renders and encodes the grid. Sources that fail to load become placeholder tiles."""
+        columns, tile_width, tile_height = grid_layout(len(sources), width, columns)
+        loaded = await asyncio.gather(
+            *(self._tile(source, tile_width, tile_height) for source in sources), return_exceptions=True
+        )
+        tiles = []
+        for source, tile in zip(sources, loaded):
+            if isinstance(tile, Exception):
+                print(f"Error loading grid tile {source}: {tile}")
+                tile = None
+            tiles.append(tile)
+
+        def render_and_encode():
+            canvas = render_comparison_grid(tiles, labels, columns, tile_width, tile_height)
+            return _encode(canvas, image_format)
+
+        return await cpu_pool.run(render_and_encode, label="comparison_grid")
+
+
+comparison_grid = ComparisonGridService()
@@ -0,0 +1,224 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+
+from app.services.style_catalog import StyleCatalog, style_catalog
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(BACKEND_ROOT, "app", "data")
+DESIGNERS_JSON_PATH = os.path.join(DATA_DIR, "designers.json")
+
+EARTH_RADIUS_KM = 6371.0088
+
+_NON_WORD = re.compile(r"[^0-9a-z가-힣]+")
+
+
+def normalize_style_key(text: str) -> str:
+    """'See-Through Dandy Cut' / 'Korean See-through Dandy Cut.' -> 'seethroughdandycut'"""
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def _to_unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    # Points on the unit sphere: euclidean (chord) distance is monotonic with
+    # great-circle distance, so a plain 3-d k-d tree gives exact nearest neighbours.
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi)
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2.0))
+
+
+def _km_to_chord(km: float) -> float:
+    return 2.0 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2.0)
+
+
+class KDTree:
+    """
+    Static, implicit 3-d k-d tree over designer positions.
+    The tree is stored as flat coordinate lists in tree order; the node for
+    range [lo, hi) lives at (lo + hi) // 2, so there are no node objects.
+    """
+
+    def __init__(self, items: list[tuple[int, float, float, float]]):
+        order = list(items)
+        self._build(order, 0, len(order), 0)
+        self.ids = [item[0] for item in order]
+        self.coords = ([item[1] for item in order], [item[2] for item in order], [item[3] for item in order])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _build(self, order: list, lo: int, hi: int, depth: int):
+        if hi - lo <= 1:
+            return
+        axis = depth % 3 + 1
+        order[lo:hi] = sorted(order[lo:hi], key=lambda item: item[axis])
+        mid = (lo + hi) >> 1
+        self._build(order, lo, mid, depth + 1)
+        self._build(order, mid + 1, hi, depth + 1)
+
+    def nearest(self, point: tuple[float, float, float], k: int, max_dist_sq: float = math.inf) -> list[tuple[float, int]]:
+        """Returns up to k (squared chord distance, designer index) pairs, closest first."""
+        if k <= 0 or not self.ids:
+            return []
+        qx, qy, qz = point
+        xs, ys, zs = self.coords
+        ids = self.ids
+        heap: list[tuple[float, int]] = []  # max-heap via negated distance
+        bound = [max_dist_sq]
+
+        def search(lo: int, hi: int, depth: int):
+            if lo >= hi:
+                return
+            mid = (lo + hi) >> 1
+            dx = qx - xs[mid]
+            dy = qy - ys[mid]
+            dz = qz - zs[mid]
+            dist_sq = dx * dx + dy * dy + dz * dz
+            if dist_sq < bound[0]:
+                if len(heap) < k:
+                    heapq.heappush(heap, (-dist_sq, ids[mid]))
+                else:
+                    heapq.heapreplace(heap, (-dist_sq, ids[mid]))
+                if len(heap) == k:
+                    bound[0] = min(max_dist_sq, -heap[0][0])
+
+            axis = depth % 3
+            diff = dx if axis == 0 else dy if axis == 1 else dz
+            if diff < 0:
+                search(lo, mid, depth + 1)
+                if diff * diff < bound[0]:
+                    search(mid + 1, hi, depth + 1)
+            else:
+                search(mid + 1, hi, depth + 1)
+                if diff * diff < bound[0]:
+                    search(lo, mid, depth + 1)
+
+        search(0, len(ids), 0)
+        return sorted((-neg_dist, idx) for neg_dist, idx in heap)
+
+
+class DesignerIndex:
+    """
+    In-memory designer search index:
+    - one k-d tree over every designer
+    - an inverted index specialty -> k-d tree of the designers offering it
+    - a style id -> specialty keys mapping derived from styles.json
+    """
+
+    def __init__(self, designers: list[dict], styles: list[dict]):
+        self.designers = designers
+
+        points = []
+        by_specialty: dict[str, list] = {}
+        self.specialty_names: dict[str, str] = {}
+        for idx, designer in enumerate(designers):
+            location = designer.get("location") or {}
+            if location.get("lat") is None or location.get("lon") is None:
+                continue
+            point = (idx, *_to_unit_vector(float(location["lat"]), float(location["lon"])))
+            points.append(point)
+            for specialty in designer.get("specialty", []):
+                key = normalize_style_key(specialty)
+                if not key:
+                    continue
+                self.specialty_names.setdefault(key, specialty)
+                bucket = by_specialty.setdefault(key, [])
+                if not bucket or bucket[-1][0] != idx:
+                    bucket.append(point)
+
+        self.all_tree = KDTree(points)
+        self.specialty_trees = {key: KDTree(bucket) for key, bucket in by_specialty.items()}
+        self.update_styles(styles)
+
+    def update_styles(self, styles: list[dict]):
+        """Re-derives the style -> specialty mapping; the spatial trees are untouched."""
+        self.styles_by_id = {s["id"]: s for s in styles}
+        self.style_specialties = {s["id"]: self._match_specialties(s) for s in styles}
+
+    def _match_specialties(self, style: dict) -> list[str]:
+        # Designers list English specialty names ("Hush Cut") while the catalog is
+        # keyed by Korean names; the English name leads the prompt_modifier.
+        english_head = (style.get("prompt_modifier") or "").split(".")[0]
+        candidates = {normalize_style_key(english_head), normalize_style_key(style.get("name", ""))}
+        candidates.discard("")
+        return [
+            key for key in self.specialty_trees
+            if any(key == c or key in c for c in candidates)
+        ]
+
+    def resolve_specialties(self, style_id: str | None = None, style: str | None = None) -> list[str] | None:
+        """None means 'no style filter'; an empty list means nobody offers the style."""
+        if style_id:
+            return self.style_specialties.get(style_id, [])
+        if style:
+            key = normalize_style_key(style)
+            if key in self.specialty_trees:
+                return [key]
+            for s in self.styles_by_id.values():
+                if s.get("name") == style:
+                    return self.style_specialties.get(s["id"], [])
+            return []
+        return None
+
+    def nearest(self, lat: float, lon: float, k: int = 5, specialties: list[str] | None = None,
+                radius_km: float | None = None) -> list[tuple[float, dict]]:
+        point = _to_unit_vector(lat, lon)
+        max_dist_sq = _km_to_chord(radius_km) ** 2 if radius_km is not None else math.inf
+
+        if specialties is None:
+            hits = self.all_tree.nearest(point, k, max_dist_sq)
+        else:
+            merged: dict[int, float] = {}
+            for key in specialties:
+                tree = self.specialty_trees.get(key)
+                if tree is None:
+                    continue
+                for dist_sq, idx in tree.nearest(point, k, max_dist_sq):
+                    merged[idx] = dist_sq
+            hits = sorted((dist_sq, idx) for idx, dist_sq in merged.items())[:k]
+
+        return [(_chord_to_km(math.sqrt(dist_sq)), self.designers[idx]) for dist_sq, idx in hits]
+
+
+class DesignerService:
+    def __init__(self, designers_path: str = DESIGNERS_JSON_PATH, catalog: StyleCatalog = style_catalog):
+        self.designers_path = designers_path
+        self.catalog = catalog
+        self._index: DesignerIndex | None = None
+        self._catalog_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> DesignerIndex:
+        # Built on first use so importing the router stays cheap
+        styles = self.catalog.get_styles()
+        if self._index is None or self._catalog_version != self.catalog.version:
+            with self._lock:
+                if self._index is None:
+                    with open(self.designers_path, "r", encoding="utf-8") as f:
+                        designers = json.load(f)
+                    self._index = DesignerIndex(designers, styles)
+                elif self._catalog_version != self.catalog.version:
+                    self._index.update_styles(styles)
+                self._catalog_version = self.catalog.version
+        return self._index
+
+    def find_nearby(self, lat: float, lon: float, k: int = 5, style_id: str | None = None,
+                    style: str | None = None, radius_km: float | None = None) -> dict:
+        index = self.index
+        specialties = index.resolve_specialties(style_id=style_id, style=style)
+        hits = index.nearest(lat, lon, k=k, specialties=specialties, radius_km=radius_km)
+        return {
+            "matched_specialties": [index.specialty_names[key] for key in specialties or []],
+            "designers": [{**designer, "distance_km": round(dist_km, 3)} for dist_km, designer in hits],
+        }
+
+
+designer_service = DesignerService()
@@ -0,0 +1,177 @@
+"""
+Index of generated results per upload, for the gallery API (/api/gallery).
+
+Every generation endpoint records its results here when they are produced:
+upload id, kind (fitting / time / angle / pose / photobooth), URL, style,
+variant, quality tier, pixel size, file size and creation time. Listing is a
+range scan over (upload_id, id) in the index; no file under results/ is
+touched. Pages are newest first; the cursor is the opaque position of the
+last item returned.
+
+The index is a SQLite file in WAL mode (GALLERY_DB_PATH) shared by all worker
+processes. Recording never fails a generation: errors are only logged.
+Photo booth strips have no upload of their own and are filed under the
+upload of the results they were made from. Drafts deleted by the retention
+sweeper are removed from the index as well.
+"""
+import base64
+import os
+import sqlite3
+import threading
+import time
+from typing import Literal, Optional
+
+from app.core.config import settings
+from app.core.shared_cache import connect_wal
+from app.core.worker_pools import io_pool
+
+GalleryKind = Literal["fitting", "time", "angle", "pose", "photobooth"]
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RESULTS_DIR = os.path.join(BACKEND_ROOT, "results")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    upload_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    style TEXT,
+    variant TEXT,
+    quality TEXT,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER,
+    created_at REAL NOT NULL,
+    UNIQUE (upload_id, url)
+);
+CREATE INDEX IF NOT EXISTS results_upload ON results (upload_id, id);
+CREATE INDEX IF NOT EXISTS results_upload_kind ON results (upload_id, kind, id);
+CREATE INDEX IF NOT EXISTS results_url ON results (url);
+"""
+
+COLUMNS = ("id", "kind", "url", "style", "variant", "quality", "width", "height", "bytes", "created_at")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def upload_key(upload_ref: str) -> str:
+    """Upload id of "/uploads/<id>.jpg", "<id>.jpg" or "<id>" (all name the same upload)."""
+    return os.path.splitext(os.path.basename(upload_ref))[0]
+
+
+def encode_cursor(row_id: int) -> str:
+    return base64.urlsafe_b64encode(str(row_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def _describe(url: str) -> Optional[tuple[int, int, int]]:
+    """(width, height, bytes) of a local result, None for placeholders / missing files. Header only."""
+    if not url.startswith("/results/"):
+        return None
+    path = os.path.join(RESULTS_DIR, url[len("/results/"):])
+    from PIL import Image
+    try:
+        size = os.path.getsize(path)
+        with Image.open(path) as img:
+            return img.width, img.height, size
+    except (OSError, ValueError):
+        return None
+
+
+class GalleryIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_wal(self.path, SCHEMA)
+        return conn
+
+    # === Writes (blocking; called on io_pool) ===
+
+    def add(self, upload_ref: str, kind: str, results: dict, style: Optional[str] = None,
+            quality: Optional[str] = None) -> int:
+        """Indexes {variant: url}; placeholders are skipped, a URL already indexed for the upload is kept."""
+        now = time.time()
+        rows = []
+        for variant, url in results.items():
+            described = _describe(url) if isinstance(url, str) else None
+            if described is None:
+                continue
+            rows.append((upload_key(upload_ref), kind, url, style, variant, quality, *described, now))
+        if rows:
+            self._connection().executemany(
+                "INSERT OR IGNORE INTO results (upload_id, kind, url, style, variant, quality, width, height, bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def upload_for(self, urls: list[str]) -> Optional[str]:
+        """Upload id the first indexed URL among `urls` was generated from."""
+        conn = self._connection()
+        for url in urls:
+            row = conn.execute("SELECT upload_id FROM results WHERE url = ? LIMIT 1", (url,)).fetchone()
+            if row is not None:
+                return row[0]
+        return None
+
+    def remove_urls(self, urls: list[str]):
+        if urls:
+            self._connection().executemany("DELETE FROM results WHERE url = ?", [(url,) for url in urls])
+
+    # === Reads ===
+
+    def page(self, upload_ref: str, kind: Optional[str] = None, limit: int = 20,
+             cursor: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+        """-> (items newest first, cursor of the next page or None)"""
+        where = ["upload_id = ?"]
+        params: list = [upload_key(upload_ref)]
+        if kind is not None:
+            where.append("kind = ?")
+            params.append(kind)
+        if cursor is not None:
+            where.append("id < ?")
+            params.append(decode_cursor(cursor))
+        rows = self._connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM results WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        items = [dict(zip(COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]["id"]) if len(rows) > limit else None
+        return items, next_cursor
+
+    # === Async recording for the endpoints ===
+
+    async def record(self, upload_ref: str, kind: GalleryKind, results: dict, style: Optional[str] = None,
+                     quality: Optional[str] = None):
+        try:
+            await io_pool.run(self.add, upload_ref, kind, results, style, quality, label="gallery_index")
+        except Exception as e:
+            print(f"Gallery index error ({kind} for {upload_ref}): {e}")
+
+    async def record_derived(self, source_urls: list[str], kind: GalleryKind, results: dict,
+                             style: Optional[str] = None):
+        """Records results made from earlier results (photo booth) under those results' upload."""
+        def add_derived():
+            upload_id = self.upload_for(source_urls)
+            if upload_id is not None:
+                self.add(upload_id, kind, results, style)
+        try:
+            await io_pool.run(add_derived, label="gallery_index")
+        except Exception as e:
+            print(f"Gallery index error ({kind}): {e}")
+
+
+gallery_index = GalleryIndex(settings.GALLERY_DB_PATH)
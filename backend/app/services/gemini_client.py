@@ -1,12 +1,33 @@
-from google import genai
-from google.genai import types
+import asyncio
 import os
 import json
-from dotenv import load_dotenv
-from PIL import Image
+import threading
+import time
 import typing_extensions as typing
 
-load_dotenv()
+from app.core import deadlines
+from app.core.config import settings
+from app.core.shared_cache import file_digest, make_key, shared_cache
+from app.core.request_context import current_client_key, current_session
+from app.core.worker_pools import cpu_pool, io_pool
+from app.services.image_cache import image_cache
+from app.services.generation_guard import InvalidOutput, hedge_policy, validate_image_bytes
+from app.services.local_recommender import local_comment, local_recommender
+from app.services.model_router import model_router
+from app.services.quality_tiers import DRAFTS_SUBDIR, downscale, draft_cache_ttl, encode_draft, tier_stats
+from app.services.style_catalog import style_catalog
+from app.services.upstream_scheduler import upstream_scheduler
+from app.services.usage_service import QuotaExceeded, extract_usage, usage_tracker
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RESULTS_DIR = os.path.join(BACKEND_ROOT, "results")
+
+# google.genai (~1s) and Pillow are imported lazily so that importing the app
+# stays fast; see benchmarks/import_time.py for the budget.
+
+def _genai_types():
+    from google.genai import types
+    return types
 
 # Data Models
 class FaceAnalysisSchema(typing.TypedDict):
@@ -23,45 +44,351 @@ class RecommendationSchema(typing.TypedDict):
 
 class GeminiClient:
     def __init__(self):
-        try:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                print("Error: GOOGLE_API_KEY not found.")
-                return
+        # Preferred model IDs (first candidate of each route in Settings); the
+        # model router may swap in an alternate per call, see services/model_router
+        # Analysis/Rec: Gemini 3 flash (It works well)
+        self.analysis_model_id = settings.ANALYSIS_MODELS[0]
+        self.recommendation_model_id = settings.RECOMMENDATION_MODELS[0]
+        
+        # Image: Nano Banana (gemini-2.5-flash-image). Gemini 3 Pro Image used to
+        # return 206 byte files; it is only an alternate now that outputs are validated
+        self.imagen_model_id = settings.IMAGE_MODELS[0]
+
+        # The SDK client is created on first use (or by warmup), see `client`
+        self._client = None
+        self._init_error = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Thread-safe lazy construction of the unified genai client."""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
 
+    def _create_client(self):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            self._init_error = "GOOGLE_API_KEY not found."
+            raise RuntimeError("Google API Client not initialized: GOOGLE_API_KEY not found. Check API Key.")
+
+        try:
+            from google import genai
             # Initialize the unified client
-            self.client = genai.Client(api_key=api_key)
-            
-            # Model IDs - Updated to use available Gemini 2.5 models
-            # From check_models_v2.py output
-            # Analysis/Rec: Keep Gemini 3 (It works well)
-            self.analysis_model_id = 'gemini-3-flash-preview'
-            self.recommendation_model_id = 'gemini-3-flash-preview'
-            
-            # Image: Revert to Nano Banana (Gemini 3 Pro Image was failing with 206 byte files)
-            # User requested to use 2.5-flash-image
-            self.imagen_model_id = 'gemini-2.5-flash-image'
-            
+            client = genai.Client(api_key=api_key)
         except Exception as e:
-            print(f"Error initializing Gemini Client: {e}")
+            self._init_error = str(e)
+            raise RuntimeError(f"Error initializing Gemini Client: {e}") from e
+
+        self._init_error = None
+        return client
+
+    def initialize(self) -> bool:
+        """Creates the SDK client if needed. Returns False (and keeps the error) on failure."""
+        try:
+            self.client
+            return True
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return False
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._client is not None
+
+    @property
+    def init_error(self) -> typing.Optional[str]:
+        return self._init_error
+
+    # === Upstream plumbing ===
+
+    async def _generate_content(self, operation: str, model: str, contents, config=None):
+        """
+        Single entry point for every upstream model call.
+        Queued by the weighted fair scheduler, bounded by the request deadline
+        (see core/deadlines) and UPSTREAM_TIMEOUT_S; cancelling the awaiting
+        task cancels the in-flight HTTP request.
+        Usage (tokens, images) is accounted to the calling client key.
+        `model` is the preferred model; the model router may pick an alternate.
+        """
+        types = _genai_types()
+        client = self.client
+        if config is None:
+            config = types.GenerateContentConfig()
+
+        # Quotas are checked per call too: a variant pack may cross the limit midway
+        client_key = current_client_key()
+        usage_tracker.check_quota(client_key)
+
+        try:
+            # Wait for a fair-share upstream slot, then spend what is left of the deadline
+            async with upstream_scheduler.slot(operation, timeout=deadlines.remaining()):
+                timeout = deadlines.remaining(cap=settings.UPSTREAM_TIMEOUT_S)
+                if timeout <= 0:
+                    raise deadlines.DeadlineExceeded(f"No time left for {operation}")
+                config.http_options = types.HttpOptions(timeout=int(timeout * 1000))
+                model = model_router.route(operation, model, current_session())
+                started = time.monotonic()
+                try:
+                    response = await asyncio.wait_for(
+                        client.aio.models.generate_content(model=model, contents=contents, config=config),
+                        timeout=timeout,
+                    )
+                except Exception:
+                    usage_tracker.record(client_key, operation, error=True)
+                    elapsed = time.monotonic() - started
+                    # A call cut short by the caller's own (tighter) deadline says nothing about
+                    # the model: it is neither an error nor a latency sample for routing
+                    cut_by_deadline = timeout < settings.UPSTREAM_TIMEOUT_S and elapsed >= timeout * 0.98
+                    if not cut_by_deadline:
+                        model_router.record(operation, model, elapsed, ok=False)
+                    raise
+                model_router.record(operation, model, time.monotonic() - started, ok=True)
+        except asyncio.TimeoutError as e:
+            raise deadlines.DeadlineExceeded(f"{operation} ran out of time") from e
+
+        usage_tracker.record(client_key, operation, *extract_usage(response))
+        return response
+
+    @staticmethod
+    def _extract_image_bytes(response) -> typing.Optional[bytes]:
+        if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+            for part in response.candidates[0].content.parts:
+                if hasattr(part, 'inline_data') and part.inline_data:
+                    # NOTE: inline_data.data is ALREADY raw bytes (not base64!)
+                    return part.inline_data.data
+        return None
+
+    @staticmethod
+    def _save_result(image_data: bytes, filename: str) -> str:
+        """Writes a generated image under results/ and returns its web path."""
+        save_path = os.path.join(RESULTS_DIR, filename)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, 'wb') as f:
+            f.write(image_data)
+        # Results are often read back right away (photo booth, grid): skip re-hashing them
+        image_cache.remember_written(save_path, image_data)
+        return f"/results/{filename}"
+
+    async def _save_result_async(self, image_data: bytes, filename: str) -> str:
+        return await io_pool.run(self._save_result, image_data, filename, label="save_result")
+
+    # === Local image work (CPU-bound: always run on cpu_pool, never on the event loop) ===
+
+    @staticmethod
+    def _load_image(path: str, transpose: bool = True, rgb: bool = False):
+        """
+        Decoded image file, optionally EXIF-transposed and converted to RGB.
+        Served from the process-wide decoded image LRU (see services/image_cache):
+        the returned image is shared, never modify it in place.
+        """
+        return image_cache.load(path, transpose=transpose, rgb=rgb)
+
+    @staticmethod
+    def _encode_image_part(img):
+        """
+        PIL image -> upstream Part. The SDK would otherwise encode the image on the
+        event loop, again for every call (variant packs, retries, hedges).
+        Same format choice as the SDK: PNG for PNG files / RGBA, JPEG otherwise.
+        """
+        import io
+        types = _genai_types()
+        buffer = io.BytesIO()
+        if getattr(img, "format", None) == "PNG" or img.mode == "RGBA":
+            img.save(buffer, format="PNG")
+            mime_type = "image/png"
+        else:
+            (img if img.mode in ("RGB", "L") else img.convert("RGB")).save(buffer, format="JPEG")
+            mime_type = "image/jpeg"
+        return types.Part.from_bytes(data=buffer.getvalue(), mime_type=mime_type)
+
+    async def _load_image_part(self, path: str):
+        """Decode + transpose + RGB + encode of a variant source image, cached across packs of one upload."""
+        return await cpu_pool.run(
+            image_cache.load_payload, path, self._encode_image_part, transpose=True, rgb=True, label="load_image_part"
+        )
+
+    @classmethod
+    def _prepare_edit_region(cls, img, region_mode: typing.Optional[str], head_box=None):
+        """
+        Returns (encoded Part to send upstream, crop box or None).
+        In "head" mode only a padded head crop is sent; see services/head_region.
+        """
+        mode = region_mode or settings.FITTING_REGION_MODE
+        if mode == "full":
+            return cls._encode_image_part(img), None
+        if mode != "head":
+            raise ValueError(f"Unknown region mode: {mode}")
+        from app.services.head_region import crop_head_region, get_detector
+        region, crop_box = crop_head_region(img, get_detector(head_box))
+        print(f"Debug: Head region {crop_box} of {img.size}, sending {region.size}")
+        return cls._encode_image_part(region), crop_box
+
+    @staticmethod
+    def _composite_edit(original_img, image_data: bytes, crop_box) -> bytes:
+        """Feathers an edited head crop back into the full-resolution original (PNG bytes)."""
+        import io
+        from PIL import Image
+        from app.services.head_region import composite_region
+        edited = Image.open(io.BytesIO(image_data))
+        base = original_img if original_img.mode in ("RGB", "RGBA") else original_img.convert("RGB")
+        result = composite_region(base, edited, crop_box)
+        buffer = io.BytesIO()
+        result.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    async def _validated_image_call(self, operation: str, model: str, contents, config) -> bytes:
+        """One upstream call; raises InvalidOutput if the returned image is unusable."""
+        started = time.monotonic()
+        try:
+            # Each call gets its own config: _generate_content sets per-call http_options
+            response = await self._generate_content(operation, model=model, contents=contents, config=config.model_copy())
+        except asyncio.CancelledError:
+            hedge_policy.record_latency(operation, time.monotonic() - started, censored=True)
+            raise
+        hedge_policy.record_latency(operation, time.monotonic() - started)
+        image_data = self._extract_image_bytes(response)
+        await cpu_pool.run(validate_image_bytes, image_data, label="validate_output")
+        return image_data
+
+    async def _hedged_image_call(self, operation: str, model: str, contents, config) -> typing.Optional[bytes]:
+        """
+        Primary call plus, if it outlives the operation's latency percentile and the
+        hedge budget allows, one duplicate. First valid image wins; None if all were invalid.
+        """
+        hedge_policy.on_primary_call(operation)
+        tasks = [asyncio.ensure_future(self._validated_image_call(operation, model, contents, config))]
+        try:
+            delay = hedge_policy.hedge_delay(operation)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # Hedging into a queue only adds load, so only hedge when slots are free
+                if not done and upstream_scheduler.queue_depth == 0 and hedge_policy.try_spend_hedge(operation):
+                    print(f"Debug: {operation} slower than p{settings.HEDGE_PERCENTILE:g} ({delay:.1f}s), hedging")
+                    tasks.append(asyncio.ensure_future(self._validated_image_call(operation, model, contents, config)))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        winner = winner or task
+                    elif isinstance(exc, InvalidOutput):
+                        print(f"Debug: Invalid {operation} output: {exc}")
+                        hedge_policy.count(operation, f"invalid_{exc.reason}")
+                    else:
+                        error = exc
+                if winner is not None:
+                    if len(tasks) > 1:
+                        hedge_policy.count(operation, "hedge_wins" if winner is tasks[1] else "primary_wins")
+                    return winner.result()
+            if error is not None:
+                raise error
+            return None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _generate_image(self, operation: str, model: str, contents, config) -> typing.Optional[bytes]:
+        """
+        Image generation with output validation (see services/generation_guard):
+        invalid results are retried up to GENERATION_MAX_RETRIES times, slow calls
+        may be hedged. Returns validated image bytes, or None if every attempt was invalid.
+        """
+        for attempt in range(settings.GENERATION_MAX_RETRIES + 1):
+            if attempt:
+                deadlines.check_deadline()
+                hedge_policy.count(operation, "retries")
+                config = self._retry_config(config, attempt)
+            image_data = await self._hedged_image_call(operation, model, contents, config)
+            if image_data is not None:
+                return image_data
+        return None
+
+    @staticmethod
+    def _retry_config(config, attempt: int):
+        """
+        Config for a retry after an invalid image. A seeded temperature-0 request is
+        deterministic and would return the same invalid image, so retries shift the
+        seed and fall back to the model's default temperature.
+        """
+        update = {}
+        if config.seed is not None:
+            update["seed"] = (config.seed + attempt) & 0x7FFFFFFF
+        if config.temperature == 0:
+            update["temperature"] = None
+        return config.model_copy(update=update) if update else config
+
+    async def _generate_variant(self, operation: str, prompt: str, original_part, filename_prefix: str) -> typing.Optional[str]:
+        """One image of a variant pack (time-change / multi-angle / pose). None if no valid image came back."""
+        types = _genai_types()
+        image_data = await self._generate_image(
+            operation,
+            model=self.imagen_model_id,
+            contents=[prompt, original_part],
+            config=types.GenerateContentConfig(
+                response_modalities=["image", "text"],
+            )
+        )
+        if image_data is None:
+            return None
+        return await self._save_result_async(image_data, f"{filename_prefix}_{os.urandom(4).hex()}.png")
+
+    async def _run_variants(self, jobs: dict, label: str) -> dict:
+        """
+        Runs variant jobs concurrently (at most VARIANT_CONCURRENCY at a time) until
+        the request deadline. Returns {key: url}; failed, empty or unfinished
+        variants get a placeholder so partial results are still returned.
+        Pending jobs are cancelled on deadline or when the caller is cancelled.
+        """
+        semaphore = asyncio.Semaphore(settings.VARIANT_CONCURRENCY)
+
+        async def bounded(coro):
+            try:
+                async with semaphore:
+                    return await coro
+            finally:
+                coro.close()  # jobs cancelled while queued were never started
+
+        tasks = {key: asyncio.ensure_future(bounded(coro)) for key, coro in jobs.items()}
+        try:
+            await asyncio.wait(tasks.values(), timeout=deadlines.remaining())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+        results = {}
+        for key, task in tasks.items():
+            if not task.done() or task.cancelled():
+                print(f"Deadline reached before {label} {key} finished")
+                results[key] = "https://placehold.co/400x600?text=Timed+Out"
+            elif task.exception() is not None:
+                print(f"Error generating {label} {key}: {task.exception()}")
+                results[key] = "https://placehold.co/400x600?text=Error"
+            else:
+                results[key] = task.result() or "https://placehold.co/400x600?text=Generation+Failed"
+        return results
 
     def get_style_prompt(self, gender: str, style_name: str) -> str:
         """Retrieves the detailed prompt from unified styles.json."""
         try:
-            BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            DATA_DIR = os.path.join(BACKEND_ROOT, "app", "data")
-            STYLES_JSON_PATH = os.path.join(DATA_DIR, "styles.json")
-            
-            with open(STYLES_JSON_PATH, "r", encoding="utf-8") as f:
-                styles_db = json.load(f)
-            
             # Search for exact name match
-            for style in styles_db:
-                if style.get('name') == style_name:
-                    return style.get('prompt_modifier', style_name)
+            style = style_catalog.get_by_name(style_name)
+            if style:
+                return style.get('prompt_modifier', style_name)
             
             # Fallback: substring search
-            for style in styles_db:
+            for style in style_catalog.get_styles():
                 if style_name in style.get('name', ''):
                     return style.get('prompt_modifier', style_name)
                     
@@ -70,14 +397,18 @@ class GeminiClient:
             print(f"Error loading style prompt: {e}")
             return style_name
 
-    def generate_quick_fitting_hairstyle(self, original_image_path: str, style_description: str, gender: str = "female") -> tuple[str, str]:
+    async def generate_quick_fitting_hairstyle(self, original_image_path: str, style_description: str, gender: str = "female",
+                                               region_mode: typing.Optional[str] = None, head_box=None,
+                                               quality: str = "final", seed: typing.Optional[int] = None) -> tuple[str, str]:
         """
         Generate a new hairstyle using Google Gemini (Gemini 2.5 Flash / Nano Banana)
         using Multimodal Editing (Image + Text).
         Ported from Friend's Repo for Quick Fitting.
+        region_mode="head" edits only a head crop and composites it back.
+        quality="draft" renders a small preview under results/drafts/ (see services/quality_tiers).
         """
-        if not self.client:
-             raise ValueError("Google API Client not initialized. Check API Key.")
+        self.client  # raises if the API key is missing
+        types = _genai_types()
 
         try:
             print(f"Debug: Generating hairstyle '{style_description}' for {gender} (Quick Fitting)...")
@@ -103,7 +434,15 @@ class GeminiClient:
                  raise FileNotFoundError(f"Image not found: {img_path}")
             
             # Load Original Image for Prompting
-            original_img = Image.open(img_path)
+            # (in head mode the crop box must be in display orientation to composite back)
+            head_mode = (region_mode or settings.FITTING_REGION_MODE) == "head"
+            started = time.monotonic()
+            original_img = await cpu_pool.run(self._load_image, img_path, transpose=head_mode, label="load_image")
+            if quality == "draft":
+                original_img = await cpu_pool.run(downscale, original_img, settings.DRAFT_MAX_SIDE, label="draft_downscale")
+            upstream_img, crop_box = await cpu_pool.run(
+                self._prepare_edit_region, original_img, region_mode, head_box, label="prepare_edit"
+            )
             
             # 2. Construct Prompt for Editing
             # Retrieve detailed prompt from backend data
@@ -125,122 +464,70 @@ class GeminiClient:
             )
             
             # Use Gemini 2.5 Flash Image (or fallback to 2.0-flash-exp as configured)
-            contents = [prompt, original_img]
+            contents = [prompt, upstream_img]
             
-            response = self.client.models.generate_content(
+            img_bytes = await self._generate_image(
+                "generate_quick_fitting_hairstyle",
                 model=self.imagen_model_id,  # Use Nano Banana (gemini-2.5-flash-image)
                 contents=contents,
                 config=types.GenerateContentConfig(
                     response_modalities=["IMAGE", "TEXT"],
-                    temperature=0.0 # Strict adherence to prompt/image
+                    temperature=0.0, # Strict adherence to prompt/image
+                    seed=seed,
                 )
             )
 
-            if not response.candidates or not response.candidates[0].content.parts:
-                raise RuntimeError("No content generated by Gemini V2.")
-
-            # Debug: Print response structure
-            print(f"Debug: Response has {len(response.candidates[0].content.parts)} parts")
-            
-            # Search all parts for image data
-            img_bytes = None
-            for i, part in enumerate(response.candidates[0].content.parts):
-                print(f"Debug: Part {i} - has inline_data: {hasattr(part, 'inline_data') and part.inline_data is not None}")
-                if hasattr(part, 'inline_data') and part.inline_data:
-                    img_bytes = part.inline_data.data
-                    print(f"Debug: Found image data in part {i}, size: {len(img_bytes)} bytes")
-                    break
-                elif hasattr(part, 'text') and part.text:
-                    print(f"Debug: Part {i} contains text: {part.text[:100]}...")
-            
             if not img_bytes:
-                raise RuntimeError("No image data found in any response part.")
+                raise RuntimeError("No valid image generated by Gemini V2.")
+            print(f"Debug: Received image data, size: {len(img_bytes)} bytes")
 
             # 4. Save Result
             import uuid
             new_id = str(uuid.uuid4())
             new_filename = f"{new_id}.jpg"
+            if crop_box is not None:
+                img_bytes = await cpu_pool.run(self._composite_edit, original_img, img_bytes, crop_box, label="composite_edit")
+                new_filename = f"{new_id}.png"
+            if quality == "draft":
+                img_bytes = await cpu_pool.run(encode_draft, img_bytes, label="encode_draft")
+                new_filename = f"{DRAFTS_SUBDIR}/{new_id}.jpg"
             
-            BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            RESULTS_DIR = os.path.join(BACKEND_ROOT, "results")
-            os.makedirs(RESULTS_DIR, exist_ok=True)
-            save_path = os.path.join(RESULTS_DIR, new_filename)
-            
-            with open(save_path, "wb") as f:
-                f.write(img_bytes)
+            result_url = await self._save_result_async(img_bytes, new_filename)
+            tier_stats.record("generate_quick_fitting_hairstyle", quality, time.monotonic() - started,
+                              len(upstream_img.inline_data.data), len(img_bytes))
 
-            print(f"Debug: Saved generated image to {save_path} (Pure Output)")
+            print(f"Debug: Saved generated image to {result_url} (Pure Output)")
             
-            return new_id, f"/results/{new_filename}"
+            return new_id, result_url
 
         except Exception as e:
             print(f"Primary generation failed: {e}")
             raise e
 
-    async def analyze_face(self, image_path: str) -> FaceAnalysisSchema:
+    async def analyze_face(self, image_path: str, image=None, fallback: bool = True) -> FaceAnalysisSchema:
         """
         Analyzes the face using Gemini Vision to determine face shape and features.
+        `image` is an already decoded PIL image of `image_path`, if the caller has one.
+        Quota and deadline errors always propagate; other failures return an
+        "Unknown" placeholder analysis, or propagate too when `fallback` is False.
+        Results are shared by all workers, keyed by the photo's content (see core/shared_cache).
+        The key names the route's candidate models, not the one that served the call:
+        an answer from an alternate model is shared like one from the preferred model.
         """
         try:
             print(f"DEBUG: Analyzing face from {image_path}")
-            # The new SDK handles localized file paths or PIL images differently.
-            # For simplicity, we can pass the PIL image if supported, or uploads.
-            # v1 SDK supports PIL images directly in contents.
-            img = Image.open(image_path)
-            
-            prompt = """
-            이 사람의 얼굴과 헤어스타일을 분석해서 다음 정보를 JSON 형식으로 반환해줘.
-            모든 값은 한국어로 작성해야 해.
-
-            Identify:
-            1. Face Shape (얼굴형: 계란형, 둥근형, 각진형, 긴형, 다이아몬드형 등)
-            2. Skin Tone (피부톤: 웜톤, 쿨톤, 밝음, 어두움 등)
-            3. Current Hair Length (기장: 숏, 미디엄, 롱)
-            4. Current Hair Texture (모질: 직모, 반곱슬, 곱슬)
-            5. Current Hair Color (색상)
-            6. Feature Summary (특징 요약: 헤어스타일 추천에 필요한 얼굴 특징을 1-2문장으로 요약)
-            
-            Return the result in JSON format matching this schema:
-            {
-                "face_shape": "...",
-                "skin_tone": "...",
-                "hair_length": "...",
-                "hair_texture": "...",
-                "hair_color": "...",
-                "feature_summary": "..."
-            }
-            """
-            
-            response = self.client.models.generate_content(
-                model=self.analysis_model_id,
-                contents=[prompt, img],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    safety_settings=[
-                        types.SafetySetting(
-                            category="HARM_CATEGORY_HARASSMENT",
-                            threshold="BLOCK_NONE",
-                        ),
-                        types.SafetySetting(
-                            category="HARM_CATEGORY_HATE_SPEECH",
-                            threshold="BLOCK_NONE",
-                        ),
-                        types.SafetySetting(
-                            category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                            threshold="BLOCK_NONE",
-                        ),
-                        types.SafetySetting(
-                            category="HARM_CATEGORY_DANGEROUS_CONTENT",
-                            threshold="BLOCK_NONE",
-                        ),
-                    ]
-                )
+            digest = await io_pool.run(file_digest, image_path, label="file_digest")
+            return await shared_cache.get_or_compute(
+                make_key("analysis", settings.ANALYSIS_MODELS, digest),
+                lambda: self._analyze_face_upstream(image_path, image),
+                ttl=settings.ANALYSIS_CACHE_TTL_S,
             )
-
-            print(f"DEBUG: Gemini Raw Response: {response.text}") 
-            return json.loads(response.text)
+        except (QuotaExceeded, deadlines.DeadlineExceeded):
+            raise
         except Exception as e:
             print(f"CRITICAL ERROR in analysis: {e}")
+            if not fallback:
+                raise
             import traceback
             traceback.print_exc()
             return {
@@ -252,141 +539,188 @@ class GeminiClient:
                 "feature_summary": "Could not analyze image due to an error."
             }
 
+    async def _analyze_face_upstream(self, image_path: str, image=None) -> FaceAnalysisSchema:
+        """The analysis call itself; raises on any failure."""
+        types = _genai_types()
+        # Decoded and encoded on the CPU pool; the SDK takes the encoded Part as-is
+        if image is None:
+            img = await cpu_pool.run(
+                image_cache.load_payload, image_path, self._encode_image_part, transpose=False, label="load_image_part"
+            )
+        else:
+            img = await cpu_pool.run(self._encode_image_part, image, label="encode_image")
+
+        prompt = """
+        이 사람의 얼굴과 헤어스타일을 분석해서 다음 정보를 JSON 형식으로 반환해줘.
+        모든 값은 한국어로 작성해야 해.
+
+        Identify:
+        1. Face Shape (얼굴형: 계란형, 둥근형, 각진형, 긴형, 다이아몬드형 등)
+        2. Skin Tone (피부톤: 웜톤, 쿨톤, 밝음, 어두움 등)
+        3. Current Hair Length (기장: 숏, 미디엄, 롱)
+        4. Current Hair Texture (모질: 직모, 반곱슬, 곱슬)
+        5. Current Hair Color (색상)
+        6. Feature Summary (특징 요약: 헤어스타일 추천에 필요한 얼굴 특징을 1-2문장으로 요약)
+        
+        Return the result in JSON format matching this schema:
+        {
+            "face_shape": "...",
+            "skin_tone": "...",
+            "hair_length": "...",
+            "hair_texture": "...",
+            "hair_color": "...",
+            "feature_summary": "..."
+        }
+        """
+        
+        response = await self._generate_content(
+            "analyze_face",
+            model=self.analysis_model_id,
+            contents=[prompt, img],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                safety_settings=[
+                    types.SafetySetting(
+                        category="HARM_CATEGORY_HARASSMENT",
+                        threshold="BLOCK_NONE",
+                    ),
+                    types.SafetySetting(
+                        category="HARM_CATEGORY_HATE_SPEECH",
+                        threshold="BLOCK_NONE",
+                    ),
+                    types.SafetySetting(
+                        category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                        threshold="BLOCK_NONE",
+                    ),
+                    types.SafetySetting(
+                        category="HARM_CATEGORY_DANGEROUS_CONTENT",
+                        threshold="BLOCK_NONE",
+                    ),
+                ]
+            )
+        )
+
+        print(f"DEBUG: Gemini Raw Response: {response.text}") 
+        return json.loads(response.text)
+
     async def recommend_styles_with_llm(self, analysis_result: dict, styles_db: list) -> RecommendationSchema:
         """
         Uses Gemini Pro to select best styles from the curated DB based on analysis.
+        Shared by all workers, keyed by the analysis and the styles offered (see core/shared_cache);
+        as for analysis, one cached answer serves every candidate model of the route.
+        Falls back to local scoring if the call fails.
         """
         try:
-            # Prepare context
-            analysis_context = json.dumps(analysis_result, indent=2)
-            
             # Simple styles dump using the passed styles_db
-            styles_context = json.dumps([{
+            style_fields = [{
                 "id": s["id"], 
                 "name": s["name"], 
                 "tags": s["tags"], 
                 "face_shape_match": s["face_shape_match"]
-            } for s in styles_db], ensure_ascii=False)
-            
-            prompt = f"""
-            You are a world-class celebrity hair consultant AI. You provide personalized, high-end styling advice.
-            
-            User Analysis:
-            {analysis_context}
-            
-            Style Database:
-            {styles_context}
-            
-            Task:
-            1. Select exactly 3 styles from the database that PERFECTLY match the user's face shape and features.
-            2. Write a warm, professional, and HIGHLY PERSONALIZED comment in Korean.
-               - Do NOT use generic phrases like "잘 어울립니다".
-               - Explain specifically WHY based on their features (e.g., "Since you have a round jawline, this cut adds volume to the top...").
-               - Tone: Encouraging, sophisticated, expert.
-            
-            Return JSON:
-            {{
-                "recommended_style_ids": ["id1", "id2", "id3"],
-                "comment": "..."
-            }}
-            """
-            
-            response = self.client.models.generate_content(
-                model=self.recommendation_model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
+            } for s in styles_db]
+            # file_id differs per upload of the same photo and is not part of the answer
+            analysis = {k: v for k, v in analysis_result.items() if k != "file_id"}
+            return await shared_cache.get_or_compute(
+                make_key("recommend", settings.RECOMMENDATION_MODELS, analysis, style_fields),
+                lambda: self._recommend_upstream(analysis_result, style_fields),
+                ttl=settings.RECOMMEND_CACHE_TTL_S,
             )
-            return json.loads(response.text)
+        except QuotaExceeded:
+            raise
         except Exception as e:
             print(f"Error in recommendation: {e}")
-            return {
-                "recommended_style_ids": ["m_01", "m_02", "m_03"],
-                "comment": "기본 추천 스타일입니다."
-            }
+            return self.recommend_styles_locally(analysis_result, styles_db)
+
+    async def _recommend_upstream(self, analysis_result: dict, style_fields: list[dict]) -> RecommendationSchema:
+        """The recommendation call itself; raises on any failure or if no known style id comes back."""
+        types = _genai_types()
+
+        # Prepare context
+        analysis_context = json.dumps(analysis_result, indent=2)
+        styles_context = json.dumps(style_fields, ensure_ascii=False)
+
+        prompt = f"""
+        You are a world-class celebrity hair consultant AI. You provide personalized, high-end styling advice.
+        
+        User Analysis:
+        {analysis_context}
+        
+        Style Database:
+        {styles_context}
+        
+        Task:
+        1. Select exactly 3 styles from the database that PERFECTLY match the user's face shape and features.
+        2. Write a warm, professional, and HIGHLY PERSONALIZED comment in Korean.
+           - Do NOT use generic phrases like "잘 어울립니다".
+           - Explain specifically WHY based on their features (e.g., "Since you have a round jawline, this cut adds volume to the top...").
+           - Tone: Encouraging, sophisticated, expert.
+        
+        Return JSON:
+        {{
+            "recommended_style_ids": ["id1", "id2", "id3"],
+            "comment": "..."
+        }}
+        """
+        
+        response = await self._generate_content(
+            "recommend_styles_with_llm",
+            model=self.recommendation_model_id,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json"
+            )
+        )
+        result = json.loads(response.text)
+        valid_ids = {s["id"] for s in style_fields}
+        if not any(pid in valid_ids for pid in result.get("recommended_style_ids", [])):
+            raise ValueError(f"No known style ids in LLM result: {result.get('recommended_style_ids')}")
+        return result
 
-    async def generate_hairstyle(self, original_image_path: str, prompt_modifier: str) -> str:
+    @staticmethod
+    def recommend_styles_locally(analysis_result: dict, styles_db: list, k: int = 3) -> RecommendationSchema:
+        """
+        Scores the styles locally (no upstream call). Used for the "fast" mode and
+        as the fallback when the LLM recommendation fails.
+        """
+        ranked = local_recommender.recommend(analysis_result, k=k, style_ids=[s["id"] for s in styles_db])
+        styles = [style for style, _ in ranked]
+        return {
+            "recommended_style_ids": [s["id"] for s in styles],
+            "comment": local_comment(analysis_result, styles),
+        }
+
+    async def generate_hairstyle(self, original_image_path: str, prompt_modifier: str,
+                                 region_mode: typing.Optional[str] = None, head_box=None, image=None,
+                                 quality: str = "final", seed: typing.Optional[int] = None) -> str:
         """
         Generates a virtual fitting image using Nano Banana Pro (gemini-3-pro-image-preview).
         Preserves the original face and only changes the hairstyle.
+        quality="draft" renders a small preview (see services/quality_tiers).
+        The same photo + style + seed is generated once across workers and reused for
+        FITTING_CACHE_TTL_S / DRAFT_CACHE_TTL_S (see core/shared_cache), whichever
+        candidate model of the image route rendered it.
         """
         try:
             print(f"DEBUG: Generating hairstyle with modifier: {prompt_modifier}")
             print(f"DEBUG: Original image path: {original_image_path}")
-            
-            # Load the original user image and fix EXIF orientation (prevents 90 degree rotation)
-            from PIL import ImageOps
-            original_img = Image.open(original_image_path)
-            original_img = ImageOps.exif_transpose(original_img)  # Fix rotation based on EXIF
-            
-            # Enhanced prompt for better results:
-            # - Keep original hair COLOR (no dyeing)
-            # - Hair length must be SAME or SHORTER (no extensions/wigs)
-            # - Preserve face and orientation
-            edit_prompt = f"""
-            Apply this hairstyle to the person: {prompt_modifier}.
-            
-            CRITICAL RULES:
-            1. Keep the ORIGINAL HAIR COLOR - do NOT change the hair color at all.
-            2. Hair length must be the SAME or SHORTER than the original - never longer.
-            3. Preserve the face, skin tone, and facial features exactly.
-            4. Keep the same image orientation and angle as the input.
-            5. PRESERVE ALL ACCESSORIES: Keep hats, caps, glasses, and earrings EXACTLY as they are. Do not remove or alter them.
-            6. Photorealistic, high quality output.
-            """
-            
-            # Send both the image and the editing prompt
-            response = self.client.models.generate_content(
-                model=self.imagen_model_id,
-                contents=[edit_prompt, original_img],
-                config=types.GenerateContentConfig(
-                    response_modalities=["image", "text"],
-                )
+
+            digest = await io_pool.run(file_digest, original_image_path, label="file_digest")
+            draft = quality == "draft"
+            web_path = await shared_cache.get_or_compute(
+                make_key("fitting_draft" if draft else "fitting", settings.IMAGE_MODELS, digest, prompt_modifier,
+                         region_mode or settings.FITTING_REGION_MODE, head_box, seed),
+                lambda: self._generate_hairstyle_upstream(
+                    original_image_path, prompt_modifier, region_mode, head_box, image, quality, seed
+                ),
+                ttl=draft_cache_ttl() if draft else settings.FITTING_CACHE_TTL_S,
             )
-            
-            # VERBOSE DEBUG: Print the entire response structure
-            print(f"DEBUG: Full response object: {response}")
-            if response.candidates:
-                for idx, candidate in enumerate(response.candidates):
-                    print(f"DEBUG: Candidate {idx}: finish_reason={getattr(candidate, 'finish_reason', 'N/A')}")
-                    if candidate.content and candidate.content.parts:
-                        for pidx, part in enumerate(candidate.content.parts):
-                            print(f"DEBUG: Part {pidx}: type={type(part).__name__}")
-                            if hasattr(part, 'text') and part.text:
-                                print(f"DEBUG: Part {pidx} TEXT: {part.text[:500]}")
-                            if hasattr(part, 'inline_data') and part.inline_data:
-                                print(f"DEBUG: Part {pidx} INLINE_DATA: mime={part.inline_data.mime_type}, data_len={len(part.inline_data.data) if part.inline_data.data else 0}")
-            else:
-                print(f"DEBUG: No candidates! prompt_feedback={getattr(response, 'prompt_feedback', 'N/A')}")
-            
-            # Handle response - Nano Banana returns image in parts
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        # Save the generated image
-                        # NOTE: inline_data.data is ALREADY raw bytes (not base64!)
-                        filename = f"generated_{os.urandom(4).hex()}.png"
-                        save_path = os.path.join("results", filename)
-                        os.makedirs("results", exist_ok=True)
-                        
-                        # Write raw bytes directly (no decoding needed!)
-                        image_data = part.inline_data.data
-                        with open(save_path, 'wb') as f:
-                            f.write(image_data)
-                        
-                        abs_path = os.path.abspath(save_path)
-                        print(f"DEBUG: Generated image saved to {abs_path}")
-                        print(f"DEBUG: File size: {os.path.getsize(abs_path)} bytes")
-                        
-                        # Return web-friendly path (forward slashes)
-                        web_path = f"/results/{filename}"
-                        print(f"DEBUG: Returning URL path: {web_path}")
-                        return web_path
-                        
-            print("DEBUG: No image generated in response")
-            return "https://placehold.co/400x600?text=Generation+Failed"
-            
+            if web_path is None:
+                print("DEBUG: No valid image generated in response")
+                return "https://placehold.co/400x600?text=Generation+Failed"
+            return web_path
+
+        except QuotaExceeded:
+            raise
         except Exception as e:
             print(f"Error in image generation: {e}")
             import traceback
@@ -394,6 +728,69 @@ class GeminiClient:
             # Fallback
             return "https://placehold.co/400x600?text=Fitting+Service+Unavailable"
 
+    async def _generate_hairstyle_upstream(self, original_image_path: str, prompt_modifier: str,
+                                           region_mode, head_box, image, quality: str,
+                                           seed: typing.Optional[int]) -> typing.Optional[str]:
+        """The fitting generation itself: web path of the saved result, None if no valid image came back."""
+        types = _genai_types()
+        started = time.monotonic()
+
+        # Load the original user image and fix EXIF orientation (prevents 90 degree rotation)
+        if image is not None:
+            original_img = image  # already decoded and transposed by the caller (pipeline)
+        else:
+            # Fix rotation based on EXIF
+            original_img = await cpu_pool.run(self._load_image, original_image_path, transpose=True, label="load_image")
+        if quality == "draft":
+            # The whole edit (crop, upstream input, composite) runs on a downscaled copy
+            original_img = await cpu_pool.run(downscale, original_img, settings.DRAFT_MAX_SIDE, label="draft_downscale")
+        upstream_img, crop_box = await cpu_pool.run(
+            self._prepare_edit_region, original_img, region_mode, head_box, label="prepare_edit"
+        )
+        
+        # Enhanced prompt for better results:
+        # - Keep original hair COLOR (no dyeing)
+        # - Hair length must be SAME or SHORTER (no extensions/wigs)
+        # - Preserve face and orientation
+        edit_prompt = f"""
+        Apply this hairstyle to the person: {prompt_modifier}.
+        
+        CRITICAL RULES:
+        1. Keep the ORIGINAL HAIR COLOR - do NOT change the hair color at all.
+        2. Hair length must be the SAME or SHORTER than the original - never longer.
+        3. Preserve the face, skin tone, and facial features exactly.
+        4. Keep the same image orientation and angle as the input.
+        5. PRESERVE ALL ACCESSORIES: Keep hats, caps, glasses, and earrings EXACTLY as they are. Do not remove or alter them.
+        6. Photorealistic, high quality output.
+        """
+        
+        # Send both the image and the editing prompt; invalid outputs are retried
+        image_data = await self._generate_image(
+            "generate_hairstyle",
+            model=self.imagen_model_id,
+            contents=[edit_prompt, upstream_img],
+            config=types.GenerateContentConfig(
+                response_modalities=["image", "text"],
+                seed=seed,
+            )
+        )
+
+        if image_data is None:
+            return None
+
+        if crop_box is not None:
+            image_data = await cpu_pool.run(self._composite_edit, original_img, image_data, crop_box, label="composite_edit")
+        if quality == "draft":
+            image_data = await cpu_pool.run(encode_draft, image_data, label="encode_draft")
+            filename = f"{DRAFTS_SUBDIR}/generated_{os.urandom(4).hex()}.jpg"
+        else:
+            filename = f"generated_{os.urandom(4).hex()}.png"
+        web_path = await self._save_result_async(image_data, filename)
+        tier_stats.record("generate_hairstyle", quality, time.monotonic() - started,
+                          len(upstream_img.inline_data.data), len(image_data))
+        print(f"DEBUG: Generated image saved to {web_path} ({len(image_data)} bytes)")
+        return web_path
+
     async def generate_time_change(self, user_image_path: str, style_name: str, seed: int = None) -> dict:
         """
         Generates hair growth simulation images for 1month, 3months, 1year.
@@ -407,55 +804,32 @@ class GeminiClient:
         ]
         
         try:
-            from PIL import ImageOps
-            original_img = Image.open(user_image_path)
-            original_img = ImageOps.exif_transpose(original_img)
-            # Ensure RGB to avoid 500 errors with RGBA PNGs
-            original_img = original_img.convert('RGB')
+            # Decoded, transposed, RGB-converted and encoded once for the whole pack
+            original_part = await self._load_image_part(user_image_path)
             
+            jobs = {}
             for key, korean_label, growth_desc in time_periods:
-                try:
-                    prompt = f"""
-                    Show how this hairstyle "{style_name}" would look after hair growth.
-                    Time passed: {korean_label} ({growth_desc})
-                    
-                    RULES:
-                    1. Keep the same face, skin tone, and facial features EXACTLY.
-                    2. The hairstyle should be the same style but with natural hair growth.
-                    3. **BANGS/FRINGE GROWTH**: If there are bangs/fringe, they MUST grow longer naturally down the forehead/eyes. Do NOT keep them short or curled unnaturally.
-                    4. Avoid unnatural "comma" shapes or perfect geometric curls. Hair should fall naturally with gravity.
-                    5. Keep the original hair color - do NOT change it.
-                    6. Photorealistic, high quality output.
-                    7. Same image orientation and angle as input.
-                    """
-                    
-                    if seed is not None:
-                        prompt += f"\n<!-- Variation Seed: {seed} -->"
-                    
-                    response = self.client.models.generate_content(
-                        model=self.imagen_model_id,
-                        contents=[prompt, original_img],
-                        config=types.GenerateContentConfig(
-                            response_modalities=["image", "text"],
-                        )
-                    )
-                    
-                    if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                        for part in response.candidates[0].content.parts:
-                            if hasattr(part, 'inline_data') and part.inline_data:
-                                filename = f"time_{key}_{os.urandom(4).hex()}.png"
-                                save_path = os.path.join("results", filename)
-                                os.makedirs("results", exist_ok=True)
-                                with open(save_path, 'wb') as f:
-                                    f.write(part.inline_data.data)
-                                results[key] = f"/results/{filename}"
-                                break
-                    
-                    if key not in results:
-                        results[key] = "https://placehold.co/400x600?text=Generation+Failed"
-                except Exception as e:
-                    print(f"Error generating time change for {key}: {e}")
-                    results[key] = "https://placehold.co/400x600?text=Error"
+                prompt = f"""
+                Show how this hairstyle "{style_name}" would look after hair growth.
+                Time passed: {korean_label} ({growth_desc})
+                
+                RULES:
+                1. Keep the same face, skin tone, and facial features EXACTLY.
+                2. The hairstyle should be the same style but with natural hair growth.
+                3. **BANGS/FRINGE GROWTH**: If there are bangs/fringe, they MUST grow longer naturally down the forehead/eyes. Do NOT keep them short or curled unnaturally.
+                4. Avoid unnatural "comma" shapes or perfect geometric curls. Hair should fall naturally with gravity.
+                5. Keep the original hair color - do NOT change it.
+                6. Photorealistic, high quality output.
+                7. Same image orientation and angle as input.
+                """
+                
+                if seed is not None:
+                    prompt += f"\n<!-- Variation Seed: {seed} -->"
+                
+                jobs[key] = self._generate_variant("generate_time_change", prompt, original_part, f"time_{key}")
+            
+            # Periods are generated concurrently; unfinished ones get placeholders at the deadline
+            results = await self._run_variants(jobs, "time change")
                     
         except Exception as e:
             print(f"Error in time change generation: {e}")
@@ -481,60 +855,36 @@ class GeminiClient:
         ]
         
         try:
-            from PIL import ImageOps
-            original_img = Image.open(user_image_path)
-            original_img = ImageOps.exif_transpose(original_img)
-            # Ensure RGB
-            original_img = original_img.convert('RGB')
+            # Decoded, transposed, RGB-converted and encoded once for the whole pack
+            original_part = await self._load_image_part(user_image_path)
             
+            jobs = {}
             for key, korean_label, angle_desc in angles:
-                try:
-                    prompt = f"""
-                    Show this EXACT person with the EXACT same hairstyle from a different viewing angle.
-                    Requested Angle: {korean_label} ({angle_desc})
-                    
-                    CRITICAL HAIR CONSISTENCY RULES:
-                    1. The hairstyle MUST be EXACTLY the same as shown in the input image.
-                    2. If the hair is down/loose in the input, it MUST remain down/loose from all angles.
-                    3. DO NOT add ponytails, buns, braids, or any hair accessories that are not in the input.
-                    4. DO NOT change the hair length, volume, or texture.
-                    5. Hair color must remain EXACTLY the same.
-                    6. The hairstyle "{style_name}" characteristics must be consistent from all angles.
-                    
-                    OTHER RULES:
-                    7. Keep the same person's face, skin tone, and body EXACTLY.
-                    8. Only change the viewing angle to: {angle_desc}.
-                    9. Photorealistic, high quality output with consistent lighting.
-                    10. Same clothing and background style.
-                    """
-                    
-                    if seed is not None:
-                        prompt += f"\n<!-- Variation Seed: {seed} -->"
-    
-                    response = self.client.models.generate_content(
-                        model=self.imagen_model_id,
-                        contents=[prompt, original_img],
-                        config=types.GenerateContentConfig(
-                            response_modalities=["image", "text"],
-                        )
-                    )
-                    
-                    if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                        for part in response.candidates[0].content.parts:
-                            if hasattr(part, 'inline_data') and part.inline_data:
-                                filename = f"angle_{key}_{os.urandom(4).hex()}.png"
-                                save_path = os.path.join("results", filename)
-                                os.makedirs("results", exist_ok=True)
-                                with open(save_path, 'wb') as f:
-                                    f.write(part.inline_data.data)
-                                results[key] = f"/results/{filename}"
-                                break
-                    
-                    if key not in results:
-                        results[key] = "https://placehold.co/400x600?text=Generation+Failed"
-                except Exception as e:
-                    print(f"Error generating angle {key}: {e}")
-                    results[key] = "https://placehold.co/400x600?text=Error"
+                prompt = f"""
+                Show this EXACT person with the EXACT same hairstyle from a different viewing angle.
+                Requested Angle: {korean_label} ({angle_desc})
+                
+                CRITICAL HAIR CONSISTENCY RULES:
+                1. The hairstyle MUST be EXACTLY the same as shown in the input image.
+                2. If the hair is down/loose in the input, it MUST remain down/loose from all angles.
+                3. DO NOT add ponytails, buns, braids, or any hair accessories that are not in the input.
+                4. DO NOT change the hair length, volume, or texture.
+                5. Hair color must remain EXACTLY the same.
+                6. The hairstyle "{style_name}" characteristics must be consistent from all angles.
+                
+                OTHER RULES:
+                7. Keep the same person's face, skin tone, and body EXACTLY.
+                8. Only change the viewing angle to: {angle_desc}.
+                9. Photorealistic, high quality output with consistent lighting.
+                10. Same clothing and background style.
+                """
+                
+                if seed is not None:
+                    prompt += f"\n<!-- Variation Seed: {seed} -->"
+
+                jobs[key] = self._generate_variant("generate_multi_angle", prompt, original_part, f"angle_{key}")
+            
+            results = await self._run_variants(jobs, "angle")
                     
         except Exception as e:
             print(f"Error in multi-angle generation: {e}")
@@ -593,52 +943,29 @@ class GeminiClient:
         results = {"images": []}
         
         try:
-            from PIL import ImageOps
-            original_img = Image.open(user_image_path)
-            original_img = ImageOps.exif_transpose(original_img)
-            # Ensure RGB
-            original_img = original_img.convert('RGB')
+            # Decoded, transposed, RGB-converted and encoded once for the whole pack
+            original_part = await self._load_image_part(user_image_path)
             
+            jobs = {}
             for i, scene_prompt in enumerate(config["prompts"]):
-                try:
-                    prompt = f"""
-                    Create a stunning photoshoot image of this person with hairstyle "{style_name}".
-                    Scene: {scene_prompt}
-                    
-                    RULES:
-                    1. Keep the same face, skin tone, and body structure EXACTLY.
-                    2. The hairstyle MUST be "{style_name}" as shown in input.
-                    3. High fashion, editorial quality.
-                    4. Consistent lighting and mood matching the description.
-                    """
-                    
-                    if seed is not None:
-                         prompt += f"\n<!-- Variation Seed: {seed + i} -->"
-
-                    response = self.client.models.generate_content(
-                        model=self.imagen_model_id,
-                        contents=[prompt, original_img],
-                        config=types.GenerateContentConfig(
-                            response_modalities=["image", "text"],
-                        )
-                    )
-                    
-                    img_url = "https://placehold.co/400x600?text=Generation+Failed"
-                    if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                        for part in response.candidates[0].content.parts:
-                            if hasattr(part, 'inline_data') and part.inline_data:
-                                filename = f"pose_{scene_type}_{i}_{os.urandom(4).hex()}.png"
-                                save_path = os.path.join("results", filename)
-                                os.makedirs("results", exist_ok=True)
-                                with open(save_path, 'wb') as f:
-                                    f.write(part.inline_data.data)
-                                img_url = f"/results/{filename}"
-                                break
-                    
-                    results["images"].append(img_url)
-                except Exception as e:
-                    print(f"Error generating pose {i}: {e}")
-                    results["images"].append("https://placehold.co/400x600?text=Error")
+                prompt = f"""
+                Create a stunning photoshoot image of this person with hairstyle "{style_name}".
+                Scene: {scene_prompt}
+                
+                RULES:
+                1. Keep the same face, skin tone, and body structure EXACTLY.
+                2. The hairstyle MUST be "{style_name}" as shown in input.
+                3. High fashion, editorial quality.
+                4. Consistent lighting and mood matching the description.
+                """
+                
+                if seed is not None:
+                     prompt += f"\n<!-- Variation Seed: {seed + i} -->"
+
+                jobs[i] = self._generate_variant("generate_pose", prompt, original_part, f"pose_{scene_type}_{i}")
+            
+            variants = await self._run_variants(jobs, "pose")
+            results["images"] = [variants[i] for i in range(len(config["prompts"]))]
                     
         except Exception as e:
             print(f"Error in pose generation: {e}")
@@ -655,103 +982,44 @@ class GeminiClient:
         Uses Pillow for image composition.
         Returns: URL of the composed image
         """
-        from PIL import Image as PILImage, ImageDraw, ImageFont
-        from datetime import datetime
+        from PIL import Image as PILImage
+        from app.services.photo_booth import render_photo_booth
         import io
         import requests as req
+
+        def decode(source):
+            img = PILImage.open(source)
+            img.load()
+            return img
+
+        async def load(img_url: str):
+            # Handle local file paths (decoded through the image cache: usually just generated)
+            if img_url.startswith('/results/'):
+                img_path = os.path.join(RESULTS_DIR, img_url.replace('/results/', ''))
+                return await cpu_pool.run(self._load_image, img_path, transpose=False, label="load_image")
+            # Remote URL: blocking fetch on the I/O pool, decode on the CPU pool
+            response = await io_pool.run(req.get, img_url, timeout=deadlines.remaining(cap=10.0), label="fetch_image")
+            return await cpu_pool.run(decode, io.BytesIO(response.content), label="load_image")
         
         try:
-            # Configuration
-            cell_width = 400
-            cell_height = 500
-            padding = 20
-            footer_height = 80
-            
-            # Total dimensions
-            total_width = cell_width + padding * 2
-            total_height = cell_height * 3 + padding * 4 + footer_height
-            
-            # Create canvas with white background
-            canvas = PILImage.new('RGB', (total_width, total_height), '#FFFFFF')
-            draw = ImageDraw.Draw(canvas)
+            # Load all images concurrently; failures become placeholder cells
+            loaded = await asyncio.gather(*(load(url) for url in image_urls[:3]), return_exceptions=True)
+            images = []
+            for i, img in enumerate(loaded):
+                if isinstance(img, Exception):
+                    print(f"Error loading image {i}: {img}")
+                    img = None
+                images.append(img)
             
-            # Load and place each image
-            y_offset = padding
-            for i, img_url in enumerate(image_urls[:3]):
-                try:
-                    # Handle local file paths
-                    if img_url.startswith('/results/'):
-                        img_path = os.path.join("results", img_url.replace('/results/', ''))
-                        img = PILImage.open(img_path)
-                    else:
-                        # Remote URL
-                        response = req.get(img_url)
-                        img = PILImage.open(io.BytesIO(response.content))
-                    
-                    # Resize to fit cell
-                    img = img.convert('RGB')
-                    img.thumbnail((cell_width, cell_height), PILImage.Resampling.LANCZOS)
-                    
-                    # Center in cell
-                    x_pos = padding + (cell_width - img.width) // 2
-                    y_pos = y_offset + (cell_height - img.height) // 2
-                    
-                    canvas.paste(img, (x_pos, y_pos))
-                    
-                except Exception as e:
-                    print(f"Error loading image {i}: {e}")
-                    # Draw placeholder
-                    draw.rectangle([padding, y_offset, padding + cell_width, y_offset + cell_height], 
-                                   fill='#F0F0F0', outline='#CCCCCC')
-                
-                y_offset += cell_height + padding
-            
-            # Footer with branding
-            footer_y = y_offset
-            draw.rectangle([0, footer_y, total_width, total_height], fill='#1a1a2e')
-            
-            # Try to use Korean-compatible fonts on Windows
-            title_font = None
-            date_font = None
-            font_candidates = [
-                "malgun.ttf",      # Windows 맑은 고딕
-                "malgunbd.ttf",    # Windows 맑은 고딕 Bold
-                "NanumGothic.ttf", # Nanum Gothic
-                "gulim.ttc",       # Windows 굴림
-                "batang.ttc",      # Windows 바탕
-                "C:/Windows/Fonts/malgun.ttf",
-                "C:/Windows/Fonts/NanumGothic.ttf",
-            ]
-            
-            for font_path in font_candidates:
-                try:
-                    title_font = ImageFont.truetype(font_path, 24)
-                    date_font = ImageFont.truetype(font_path, 16)
-                    break
-                except:
-                    continue
-            
-            if title_font is None:
-                title_font = ImageFont.load_default()
-                date_font = ImageFont.load_default()
-            
-            # Title (without emojis for font compatibility)
-            title_text = f"- {style_name} -"
-            title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
-            title_x = (total_width - (title_bbox[2] - title_bbox[0])) // 2
-            draw.text((title_x, footer_y + 15), title_text, fill='white', font=title_font)
-            
-            # Date
-            date_text = datetime.now().strftime("%Y.%m.%d")
-            date_bbox = draw.textbbox((0, 0), date_text, font=date_font)
-            date_x = (total_width - (date_bbox[2] - date_bbox[0])) // 2
-            draw.text((date_x, footer_y + 48), date_text, fill='#888888', font=date_font)
-            
-            # Save
             filename = f"photobooth_{os.urandom(4).hex()}.png"
-            save_path = os.path.join("results", filename)
-            os.makedirs("results", exist_ok=True)
-            canvas.save(save_path, 'PNG', quality=95)
+            save_path = os.path.join(RESULTS_DIR, filename)
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+
+            def render_and_save():
+                canvas = render_photo_booth(images, style_name)
+                canvas.save(save_path, 'PNG', quality=95)
+
+            await cpu_pool.run(render_and_save, label="photo_booth")
             
             return f"/results/{filename}"
             
@@ -0,0 +1,119 @@
+"""
+Output validation and hedged requests for image generations.
+
+- validate_image_bytes(): decodable, large enough, not blank. The model
+  sometimes returns tiny (~200 byte) or flat images with a success status.
+- HedgePolicy: per-operation latency history. Once a call has been running
+  longer than the configured percentile, a duplicate call may be issued; the
+  first valid result wins. Hedges are paid from a token bucket refilled by
+  HEDGE_BUDGET_RATIO per primary call, so they stay a bounded fraction of traffic.
+"""
+import io
+import threading
+from collections import defaultdict, deque
+from typing import Optional
+
+from app.core.config import settings
+from app.core.worker_pools import percentile
+
+BLANK_CHECK_SIDE = 64
+
+
+class InvalidOutput(Exception):
+    def __init__(self, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+def validate_image_bytes(data: Optional[bytes]):
+    """Raises InvalidOutput(reason) unless `data` is a usable generated image."""
+    if not data:
+        raise InvalidOutput("no_image", "No image in response")
+    if len(data) < settings.OUTPUT_MIN_BYTES:
+        raise InvalidOutput("too_small_bytes", f"Image is only {len(data)} bytes")
+
+    from PIL import Image, ImageStat
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            if min(width, height) < settings.OUTPUT_MIN_SIDE:
+                raise InvalidOutput("too_small_dimensions", f"Image is {width}x{height}")
+            # JPEG can decode straight to a reduced size; others are decoded then shrunk
+            img.draft("RGB", (BLANK_CHECK_SIDE, BLANK_CHECK_SIDE))
+            thumb = img.convert("RGB")
+            thumb.thumbnail((BLANK_CHECK_SIDE, BLANK_CHECK_SIDE))
+    except InvalidOutput:
+        raise
+    except Exception as e:
+        raise InvalidOutput("undecodable", f"Image could not be decoded: {e}")
+
+    if max(ImageStat.Stat(thumb).stddev) < settings.OUTPUT_MIN_STDDEV:
+        raise InvalidOutput("blank", "Image is blank (flat color)")
+
+
+class HedgePolicy:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=200))
+        self._tokens = float(settings.HEDGE_BUDGET_BURST)
+        self.counters: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record_latency(self, operation: str, seconds: float, censored: bool = False):
+        """
+        `censored`: the call was cancelled (lost a hedge race, client left) after
+        `seconds`, so its latency is at least that. Kept as a sample anyway: dropping
+        the slow calls that get cancelled would pull the hedge percentile down.
+        """
+        with self._lock:
+            self._latencies[operation].append(seconds)
+            if censored:
+                self.counters[operation]["censored_samples"] += 1
+
+    def count(self, operation: str, event: str, n: int = 1):
+        with self._lock:
+            self.counters[operation][event] += n
+
+    def on_primary_call(self, operation: str):
+        with self._lock:
+            self.counters[operation]["calls"] += 1
+            self._tokens = min(float(settings.HEDGE_BUDGET_BURST), self._tokens + settings.HEDGE_BUDGET_RATIO)
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off / not enough history."""
+        if not settings.HEDGE_ENABLED:
+            return None
+        samples = self._latencies.get(operation)
+        if not samples or len(samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(samples, settings.HEDGE_PERCENTILE)
+
+    def try_spend_hedge(self, operation: str) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                self.counters[operation]["hedges_denied_budget"] += 1
+                return False
+            self._tokens -= 1.0
+            self.counters[operation]["hedges"] += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            operations = {}
+            for operation in set(self.counters) | set(self._latencies):
+                samples = self._latencies.get(operation) or ()
+                p50 = percentile(samples, 50)
+                p95 = percentile(samples, 95)
+                operations[operation] = {
+                    **self.counters.get(operation, {}),
+                    "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                    "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                }
+            return {
+                "hedge_enabled": settings.HEDGE_ENABLED,
+                "hedge_percentile": settings.HEDGE_PERCENTILE,
+                "hedge_tokens": round(self._tokens, 3),
+                "operations": operations,
+            }
+
+
+hedge_policy = HedgePolicy()
@@ -0,0 +1,196 @@
+"""
+Head-region crop & composite for hair edits.
+
+Instead of sending the whole photo upstream, a padded box around the head is
+cropped (and downscaled to HEAD_REGION_MAX_SIDE), edited by the model, then
+resized back and feather-blended into the original at full resolution.
+Pixels outside the box are copied from the original unchanged.
+
+Detectors are pluggable: register a class with `detect(img) -> box | None`
+in DETECTORS. Boxes are pixel (left, top, right, bottom) tuples.
+"""
+from typing import Optional, Sequence
+
+from app.core.config import settings
+
+Box = tuple[int, int, int, int]
+
+REGION_MODES = ("full", "head")
+
+
+class ClientBoxDetector:
+    """
+    Uses a box supplied by the client, normalized to [0, 1] (left, top, right, bottom).
+    The box is validated where it enters the API (schemas.HeadRegionOptions).
+    """
+
+    def __init__(self, box: Sequence[float]):
+        left, top, right, bottom = (float(v) for v in box)
+        self.box = (left, top, right, bottom)
+
+    def detect(self, img) -> Optional[Box]:
+        width, height = img.size
+        left, top, right, bottom = self.box
+        return round(left * width), round(top * height), round(right * width), round(bottom * height)
+
+
+class HeuristicHeadDetector:
+    """
+    Local, dependency-free detector for portrait photos: finds the skin-coloured
+    blob in the upper part of a small thumbnail (YCbCr skin range) and grows it
+    upwards for the hair. Falls back to the upper-centre of the frame.
+    """
+
+    THUMB_SIDE = 96
+    # Classic Cb/Cr skin ranges; luma is ignored so lighting matters less
+    CB_RANGE = (77, 127)
+    CR_RANGE = (133, 173)
+    MIN_SKIN_FRACTION = 0.01
+
+    def detect(self, img) -> Optional[Box]:
+        width, height = img.size
+        thumb = img.convert("YCbCr")
+        thumb.thumbnail((self.THUMB_SIDE, self.THUMB_SIDE))
+        tw, th = thumb.size
+        _, cb, cr = thumb.split()
+        cb_data = cb.tobytes()
+        cr_data = cr.tobytes()
+
+        # Faces in portraits sit in the upper 70% of the frame
+        search_rows = max(1, int(th * 0.7))
+        row_counts = [0] * search_rows
+        col_counts = [0] * tw
+        for y in range(search_rows):
+            offset = y * tw
+            for x in range(tw):
+                if (self.CB_RANGE[0] <= cb_data[offset + x] <= self.CB_RANGE[1]
+                        and self.CR_RANGE[0] <= cr_data[offset + x] <= self.CR_RANGE[1]):
+                    row_counts[y] += 1
+                    col_counts[x] += 1
+
+        total = sum(row_counts)
+        if total < self.MIN_SKIN_FRACTION * tw * search_rows:
+            return self.fallback(width, height)
+
+        # Trim 10% of skin mass from each side so hands / necks / noise don't dominate
+        cols = self._core_span(col_counts, total)
+        rows = self._core_span(row_counts, total)
+        scale_x = width / tw
+        scale_y = height / th
+        face_left, face_right = cols[0] * scale_x, (cols[1] + 1) * scale_x
+        face_top, face_bottom = rows[0] * scale_y, (rows[1] + 1) * scale_y
+
+        # Hair: extend upwards by ~60% of the face height and a bit sideways
+        face_w = face_right - face_left
+        face_h = face_bottom - face_top
+        box = (
+            face_left - 0.25 * face_w,
+            face_top - 0.6 * face_h,
+            face_right + 0.25 * face_w,
+            face_bottom + 0.1 * face_h,
+        )
+        return clamp_box(tuple(round(v) for v in box), width, height)
+
+    @staticmethod
+    def _core_span(counts: list[int], total: int, trim: float = 0.1) -> tuple[int, int]:
+        limit = total * trim
+        acc = 0
+        lo = 0
+        for i, c in enumerate(counts):
+            acc += c
+            if acc > limit:
+                lo = i
+                break
+        acc = 0
+        hi = len(counts) - 1
+        for i in range(len(counts) - 1, -1, -1):
+            acc += counts[i]
+            if acc > limit:
+                hi = i
+                break
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def fallback(width: int, height: int) -> Box:
+        return round(width * 0.2), 0, round(width * 0.8), round(height * 0.6)
+
+
+DETECTORS = {
+    "heuristic": HeuristicHeadDetector,
+}
+
+
+def clamp_box(box: Sequence[int], width: int, height: int) -> Box:
+    left, top, right, bottom = box
+    left = max(0, min(width - 1, left))
+    top = max(0, min(height - 1, top))
+    right = max(left + 1, min(width, right))
+    bottom = max(top + 1, min(height, bottom))
+    return left, top, right, bottom
+
+
+def get_detector(head_box: Optional[Sequence[float]] = None, name: Optional[str] = None):
+    if head_box is not None:
+        return ClientBoxDetector(head_box)
+    name = name or settings.HEAD_REGION_DETECTOR
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown head region detector: {name}")
+    return DETECTORS[name]()
+
+
+def pad_box(box: Box, width: int, height: int, padding: float) -> Box:
+    left, top, right, bottom = box
+    pad_x = (right - left) * padding
+    pad_y = (bottom - top) * padding
+    return clamp_box(
+        (round(left - pad_x), round(top - pad_y), round(right + pad_x), round(bottom + pad_y)),
+        width, height,
+    )
+
+
+def crop_head_region(img, detector, padding: Optional[float] = None, max_side: Optional[int] = None):
+    """
+    Returns (region image to send upstream, crop box in original pixels).
+    The region is padded so the model has context and the feather has room.
+    """
+    width, height = img.size
+    box = detector.detect(img) or HeuristicHeadDetector.fallback(width, height)
+    crop_box = pad_box(
+        clamp_box(box, width, height), width, height,
+        settings.HEAD_REGION_PADDING if padding is None else padding,
+    )
+    region = img.crop(crop_box)
+    region.thumbnail((max_side or settings.HEAD_REGION_MAX_SIDE,) * 2)
+    return region, crop_box
+
+
+def composite_region(original, edited, crop_box: Box, feather: Optional[int] = None):
+    """
+    Scales the edited region back to the crop box and blends it into a copy of
+    the original with a feathered edge. Edges that touch the image border are
+    not feathered (there is nothing to blend with).
+    The model may answer with a different aspect ratio than the crop it was sent;
+    such an output is centre-cropped to the box's ratio rather than stretched.
+    """
+    from PIL import Image, ImageDraw, ImageFilter, ImageOps
+
+    left, top, right, bottom = crop_box
+    size = (right - left, bottom - top)
+    edited = ImageOps.fit(edited.convert(original.mode), size, Image.LANCZOS)
+
+    feather = settings.HEAD_REGION_FEATHER if feather is None else feather
+    feather = max(0, min(feather, min(size) // 4))
+    mask = Image.new("L", size, 0)
+    inset = (
+        0 if left == 0 else feather,
+        0 if top == 0 else feather,
+        size[0] - (0 if right == original.width else feather),
+        size[1] - (0 if bottom == original.height else feather),
+    )
+    ImageDraw.Draw(mask).rectangle((inset[0], inset[1], inset[2] - 1, inset[3] - 1), fill=255)
+    if feather:
+        mask = mask.filter(ImageFilter.GaussianBlur(feather / 2))
+
+    result = original.copy()
+    result.paste(edited, (left, top), mask)
+    return result
@@ -0,0 +1,155 @@
+"""
+Process-wide LRU of decoded source images and their encoded upstream payloads.
+
+One consultation runs fitting, time-change, multi-angle, pose and photo-booth
+on the same upload; without this every call re-opens, EXIF-transposes and
+RGB-converts the file (and re-encodes it for the upstream request).
+
+Entries are keyed by file id (basename), content hash and variant
+(transpose / rgb, or the encoded payload of that variant). The content hash
+of a path is memoized by its size + mtime, so a lookup costs one stat() and a
+file replaced under the same name is a new key. The cache is bounded by
+IMAGE_CACHE_MB of pixel memory (width * height * bands) plus payload bytes;
+least recently used entries go first.
+
+Cached images are shared between requests: callers must not modify them in
+place (crop / convert / resize / copy all return new images).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable
+
+from app.core.config import settings
+from app.core.shared_cache import file_digest
+
+MAX_DIGESTS = 4096
+
+
+def decode_image(path: str, transpose: bool = True, rgb: bool = False):
+    """Decodes an image file, optionally EXIF-transposed and converted to RGB."""
+    from PIL import Image, ImageOps
+    img = Image.open(path)
+    img.load()
+    if transpose:
+        img = ImageOps.exif_transpose(img)
+    if rgb and img.mode != "RGB":
+        # Ensure RGB to avoid 500 errors with RGBA PNGs
+        img = img.convert("RGB")
+    return img
+
+
+def _image_bytes(img) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class DecodedImageCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, cost)
+        self._bytes = 0
+        self._digests: OrderedDict = OrderedDict()  # path -> (size, mtime_ns, digest)
+        self.counters: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+            if known is not None and known[:2] == (st.st_size, st.st_mtime_ns):
+                return known[2]
+        digest = file_digest(path)
+        self._remember_digest(path, st, digest)
+        return digest
+
+    def _remember_digest(self, path: str, st: os.stat_result, digest: str):
+        with self._lock:
+            self._digests[path] = (st.st_size, st.st_mtime_ns, digest)
+            self._digests.move_to_end(path)
+            while len(self._digests) > MAX_DIGESTS:
+                self._digests.popitem(last=False)
+
+    def remember_written(self, path: str, data: bytes):
+        """Records the hash of a file we just wrote, so reading it back does not re-hash it."""
+        self._remember_digest(path, os.stat(path), hashlib.sha256(data).hexdigest())
+
+    def _get(self, key, kind: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters[kind]["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters[kind]["hits"] += 1
+            return entry[0]
+
+    def _put(self, key, kind: str, value, cost: int):
+        # One huge image must not flush everything else
+        if cost > self.max_bytes // 2:
+            with self._lock:
+                self.counters[kind]["oversize"] += 1
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, cost)
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                evicted_key, (_, evicted_cost) = self._entries.popitem(last=False)
+                self._bytes -= evicted_cost
+                self.counters[evicted_key[2]]["evictions"] += 1
+
+    def load(self, path: str, transpose: bool = True, rgb: bool = False):
+        """Decoded (and normalized) image of `path`; blocking, call from the CPU pool."""
+        if not settings.IMAGE_CACHE_ENABLED:
+            return decode_image(path, transpose=transpose, rgb=rgb)
+        key = (os.path.basename(path), self.digest(path), "image", transpose, rgb)
+        img = self._get(key, "image")
+        if img is None:
+            img = decode_image(path, transpose=transpose, rgb=rgb)
+            self._put(key, "image", img, _image_bytes(img))
+        return img
+
+    def load_payload(self, path: str, encode: Callable, transpose: bool = True, rgb: bool = False):
+        """`encode(image)` of the decoded image, cached too; `encode` returns an upstream Part."""
+        if not settings.IMAGE_CACHE_ENABLED:
+            return encode(decode_image(path, transpose=transpose, rgb=rgb))
+        key = (os.path.basename(path), self.digest(path), "payload", transpose, rgb)
+        part = self._get(key, "payload")
+        if part is None:
+            part = encode(self.load(path, transpose=transpose, rgb=rgb))
+            self._put(key, "payload", part, len(part.inline_data.data))
+        return part
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {}
+            for kind, counters in self.counters.items():
+                lookups = counters.get("hits", 0) + counters.get("misses", 0)
+                kinds[kind] = {
+                    **counters,
+                    "hit_rate": round(counters.get("hits", 0) / lookups, 3) if lookups else None,
+                }
+            by_kind = defaultdict(lambda: {"entries": 0, "bytes": 0})
+            for key, (_, cost) in self._entries.items():
+                by_kind[key[2]]["entries"] += 1
+                by_kind[key[2]]["bytes"] += cost
+            for kind, usage in by_kind.items():
+                kinds.setdefault(kind, {}).update(usage)
+            return {
+                "enabled": settings.IMAGE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "kinds": kinds,
+            }
+
+
+image_cache = DecodedImageCache(settings.IMAGE_CACHE_MB * 1024 * 1024)
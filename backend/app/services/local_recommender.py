@@ -0,0 +1,177 @@
+"""
+Local style recommender: scores a face analysis against every style with one
+matrix-vector product, no upstream call.
+
+Each style is a row of a precomputed float32 feature matrix:
+    [ face shapes (7) | tags (catalog vocabulary) | prior (1) ]
+and the analysis becomes a query vector over the same columns. Gender and
+"only these ids" restrictions are applied as masks. Used as the "fast"
+recommend mode, as the shortlist for "hybrid" mode and as the fallback when
+the LLM recommendation fails.
+"""
+import threading
+from typing import Iterable, Optional
+
+from app.core.constants import FACE_SHAPE_LABELS
+from app.services.style_catalog import StyleCatalog, style_catalog
+
+FACE_SHAPES = list(FACE_SHAPE_LABELS)
+
+# Catalog tags that recommend a face shape ("둥근얼굴형추천") count as a shape match
+TAG_FACE_SHAPES = {
+    "계란": "oval",
+    "둥근": "round",
+    "각진": "square",
+    "긴얼굴": "long",
+    "다이아몬드": "diamond",
+    "하트": "heart",
+    "역삼각": "heart",
+    "삼각": "triangle",
+}
+ALL_FACE_SHAPES_TAG = "모든얼굴형"
+
+# Analysis values -> tags they favour (matched as substrings of the analysis text)
+ANALYSIS_TAG_HINTS = {
+    "숏": ["짧은머리"],
+    "짧": ["짧은머리"],
+    "롱": ["생머리", "여신머리", "S컬"],
+    "긴 머리": ["생머리", "여신머리"],
+    "미디엄": ["단발", "레이어드"],
+    "곱슬": ["볼륨"],
+    "직모": ["볼륨", "깔끔함"],
+    "이마": ["이마커버"],
+}
+
+# Relative weight of each feature block in the score
+SHAPE_WEIGHT = 3.0
+ALL_SHAPES_WEIGHT = 0.5
+TAG_WEIGHT = 1.0
+PRIOR_TAGS = {"Trendy": 0.1, "New": 0.05, "트렌디": 0.1}
+
+
+def analysis_face_shapes(face_shape: str) -> list[str]:
+    """'둥근형', 'round', '둥근형/계란형 혼합' -> ['round'] / ['round', 'oval']"""
+    text = (face_shape or "").lower()
+    shapes = []
+    for shape, label in FACE_SHAPE_LABELS.items():
+        stem = label[:-1]  # '둥근형' -> '둥근'
+        if shape in text or (stem and stem in text):
+            shapes.append(shape)
+    return shapes
+
+
+class LocalRecommender:
+    def __init__(self, catalog: StyleCatalog = style_catalog):
+        self.catalog = catalog
+        self._catalog_version = None
+        self._lock = threading.Lock()
+        self.styles: list[dict] = []
+        self._row_by_id: dict[str, int] = {}
+        self._tag_columns: dict[str, int] = {}
+        self._matrix = None
+        self._gender_masks: dict[str, object] = {}
+
+    def build(self, styles: list[dict]):
+        """(Re)builds the feature matrix; O(styles x features), done once per catalog version."""
+        import numpy as np
+
+        tags = sorted({tag for s in styles for tag in s.get("tags", [])})
+        tag_columns = {tag: len(FACE_SHAPES) + i for i, tag in enumerate(tags)}
+        prior_column = len(FACE_SHAPES) + len(tags)
+        shape_columns = {shape: i for i, shape in enumerate(FACE_SHAPES)}
+
+        matrix = np.zeros((len(styles), prior_column + 1), dtype=np.float32)
+        for row, style in enumerate(styles):
+            style_tags = style.get("tags", [])
+            for shape in style.get("face_shape_match", []):
+                if shape in shape_columns:
+                    matrix[row, shape_columns[shape]] = SHAPE_WEIGHT
+            for tag in style_tags:
+                matrix[row, tag_columns[tag]] = TAG_WEIGHT
+                if tag == ALL_FACE_SHAPES_TAG:
+                    matrix[row, :len(FACE_SHAPES)] = np.maximum(matrix[row, :len(FACE_SHAPES)], ALL_SHAPES_WEIGHT)
+                for stem, shape in TAG_FACE_SHAPES.items():
+                    if stem in tag and "추천" in tag:
+                        matrix[row, shape_columns[shape]] = SHAPE_WEIGHT
+            matrix[row, prior_column] = sum(PRIOR_TAGS.get(tag, 0.0) for tag in style_tags)
+
+        genders = np.array([s.get("gender", "") for s in styles])
+        self._gender_masks = {"male": genders == "male", "female": genders == "female"}
+        self.styles = styles
+        self._row_by_id = {s["id"]: row for row, s in enumerate(styles)}
+        self._tag_columns = tag_columns
+        self._matrix = matrix
+
+    def _sync(self):
+        styles = self.catalog.get_styles()
+        if self._catalog_version != self.catalog.version:
+            with self._lock:
+                if self._catalog_version != self.catalog.version:
+                    self.build(styles)
+                    self._catalog_version = self.catalog.version
+
+    def query_vector(self, analysis: dict):
+        import numpy as np
+
+        query = np.zeros(self._matrix.shape[1], dtype=np.float32)
+        for shape in analysis_face_shapes(analysis.get("face_shape", "")):
+            query[FACE_SHAPES.index(shape)] = 1.0
+
+        text = " ".join(str(v) for v in analysis.values() if isinstance(v, str))
+        for hint, hinted_tags in ANALYSIS_TAG_HINTS.items():
+            if hint in text:
+                for tag in hinted_tags:
+                    if tag in self._tag_columns:
+                        query[self._tag_columns[tag]] = 1.0
+        # Tags mentioned verbatim in the analysis (e.g. "깔끔함")
+        for tag, column in self._tag_columns.items():
+            if len(tag) > 1 and tag in text:
+                query[column] = 1.0
+        query[-1] = 1.0  # prior
+        return query
+
+    def recommend(self, analysis: dict, k: int = 3, gender_filter: str = "all",
+                  style_ids: Optional[Iterable[str]] = None) -> list[tuple[dict, float]]:
+        """
+        Top-k (style, score) for the analysis, best first. Ties keep catalog order.
+        `style_ids` restricts the candidates (e.g. to an already filtered list).
+        """
+        import numpy as np
+
+        self._sync()
+        if self._matrix is None or not len(self.styles) or k <= 0:
+            return []
+
+        scores = self._matrix @ self.query_vector(analysis)
+        mask = self._gender_masks.get(gender_filter)
+        if style_ids is not None:
+            allowed = np.zeros(len(self.styles), dtype=bool)
+            allowed[[self._row_by_id[i] for i in style_ids if i in self._row_by_id]] = True
+            mask = allowed if mask is None else mask & allowed
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        candidates = int(np.count_nonzero(np.isfinite(scores)))
+        k = min(k, candidates)
+        if k == 0:
+            return []
+        # argpartition is O(n); only the k winners are sorted (stable -> catalog order on ties)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(self.styles[row], float(scores[row])) for row in top]
+
+    def recommend_ids(self, analysis: dict, k: int = 3, gender_filter: str = "all",
+                      style_ids: Optional[Iterable[str]] = None) -> list[str]:
+        return [style["id"] for style, _ in self.recommend(analysis, k, gender_filter, style_ids)]
+
+
+def local_comment(analysis: dict, styles: list[dict]) -> str:
+    shapes = analysis_face_shapes(analysis.get("face_shape", ""))
+    names = ", ".join(s.get("name", s["id"]) for s in styles)
+    if shapes:
+        labels = "/".join(FACE_SHAPE_LABELS[s] for s in shapes)
+        return f"{labels} 얼굴형에 맞춰 고른 스타일입니다: {names}"
+    return f"얼굴 분석 결과를 바탕으로 고른 스타일입니다: {names}"
+
+
+local_recommender = LocalRecommender()
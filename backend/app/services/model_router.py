@@ -0,0 +1,154 @@
+"""
+Adaptive model routing.
+
+Each route ("analysis", "recommendation", "image") has an ordered list of
+candidate models in Settings. Every upstream call records its latency and
+outcome per model; a model whose rolling p95 latency or error rate breaches
+the route's SLO is skipped for ROUTING_COOLDOWN_S, after which it is tried
+again. A session keeps the model it was first routed to (sticky, so one
+consultation is not rendered by two different models) until that model
+breaches.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from app.core.config import settings
+from app.core.worker_pools import percentile
+
+# Upstream operation -> route
+OPERATION_ROUTES = {
+    "analyze_face": "analysis",
+    "recommend_styles_with_llm": "recommendation",
+    "generate_hairstyle": "image",
+    "generate_quick_fitting_hairstyle": "image",
+    "generate_time_change": "image",
+    "generate_multi_angle": "image",
+    "generate_pose": "image",
+}
+
+MAX_STICKY_SESSIONS = 10_000
+
+
+class ModelRouter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # model -> deque of (latency seconds, ok)
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=settings.ROUTING_WINDOW))
+        self._cooldown_until: dict[str, float] = {}
+        self._breaches: dict[str, str] = {}  # model -> last breach reason
+        # (session, route) -> model, least recently used first
+        self._sticky: OrderedDict = OrderedDict()
+        self.decisions: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.counters: dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def candidates(route: str) -> list[str]:
+        return {
+            "analysis": settings.ANALYSIS_MODELS,
+            "recommendation": settings.RECOMMENDATION_MODELS,
+            "image": settings.IMAGE_MODELS,
+        }.get(route, [])
+
+    @staticmethod
+    def slo_latency(route: str) -> float:
+        return settings.ROUTING_SLO_IMAGE_P95_S if route == "image" else settings.ROUTING_SLO_TEXT_P95_S
+
+    def _healthy(self, model: str, now: float) -> bool:
+        return self._cooldown_until.get(model, 0.0) <= now
+
+    def route(self, operation: str, requested: str, session: str) -> str:
+        """Model to call for `operation`. Unrouted operations keep `requested`."""
+        route = OPERATION_ROUTES.get(operation)
+        candidates = self.candidates(route) if route else []
+        if not settings.ROUTING_ENABLED or len(candidates) < 2 or requested not in candidates:
+            return requested
+
+        now = time.monotonic()
+        with self._lock:
+            key = (session, route)
+            sticky = self._sticky.get(key)
+            if sticky in candidates and self._healthy(sticky, now):
+                self._sticky.move_to_end(key)
+                self.decisions[route][sticky] += 1
+                self.counters["sticky_hits"] += 1
+                return sticky
+
+            # First healthy candidate in preference order; if all are cooling
+            # down, the one that recovers soonest
+            healthy = [m for m in candidates if self._healthy(m, now)]
+            model = healthy[0] if healthy else min(candidates, key=lambda m: self._cooldown_until.get(m, 0.0))
+            if model != candidates[0]:
+                self.counters["rerouted"] += 1
+            if sticky is not None:
+                self.counters["sticky_moves"] += 1
+
+            self._sticky[key] = model
+            self._sticky.move_to_end(key)
+            while len(self._sticky) > MAX_STICKY_SESSIONS:
+                self._sticky.popitem(last=False)
+            self.decisions[route][model] += 1
+            return model
+
+    def record(self, operation: str, model: str, seconds: float, ok: bool):
+        """Feeds one call outcome back; may put the model into cooldown."""
+        route = OPERATION_ROUTES.get(operation)
+        if route is None:
+            return
+        with self._lock:
+            samples = self._samples[model]
+            samples.append((seconds, ok))
+            if len(samples) < settings.ROUTING_MIN_SAMPLES or not self._healthy(model, time.monotonic()):
+                return
+
+            p95 = percentile([s for s, _ in samples], 95)
+            error_rate = sum(1 for _, good in samples if not good) / len(samples)
+            reason = None
+            if p95 > self.slo_latency(route):
+                reason = f"p95 {p95:.1f}s > {self.slo_latency(route):.1f}s"
+            elif error_rate > settings.ROUTING_SLO_ERROR_RATE:
+                reason = f"error rate {error_rate:.0%} > {settings.ROUTING_SLO_ERROR_RATE:.0%}"
+            if reason:
+                print(f"Model router: {model} breached SLO ({reason}), cooling down {settings.ROUTING_COOLDOWN_S:.0f}s")
+                self._cooldown_until[model] = time.monotonic() + settings.ROUTING_COOLDOWN_S
+                self._breaches[model] = reason
+                self.counters["breaches"] += 1
+                # Judge the model afresh once it is probed again
+                samples.clear()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for route in ("analysis", "recommendation", "image"):
+                for model in self.candidates(route):
+                    samples = self._samples.get(model) or ()
+                    p50 = percentile([s for s, _ in samples], 50)
+                    p95 = percentile([s for s, _ in samples], 95)
+                    cooldown = max(0.0, self._cooldown_until.get(model, 0.0) - now)
+                    models[model] = {
+                        "samples": len(samples),
+                        "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                        "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                        "error_rate": round(sum(1 for _, ok in samples if not ok) / len(samples), 3) if samples else None,
+                        "healthy": cooldown == 0.0,
+                        "cooldown_remaining_s": round(cooldown, 1),
+                        "last_breach": self._breaches.get(model),
+                    }
+            return {
+                "enabled": settings.ROUTING_ENABLED,
+                "routes": {
+                    route: {
+                        "candidates": self.candidates(route),
+                        "slo_p95_s": self.slo_latency(route),
+                        "decisions": dict(self.decisions.get(route, {})),
+                    }
+                    for route in ("analysis", "recommendation", "image")
+                },
+                "models": models,
+                "sticky_sessions": len(self._sticky),
+                **self.counters,
+            }
+
+
+model_router = ModelRouter()
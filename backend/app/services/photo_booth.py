@@ -0,0 +1,125 @@
+"""
+Photo booth strip (인생세컷) and comparison grid rendering. Pure Pillow, no
+I/O: callers load the images, this lays them out and draws the text.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+CELL_WIDTH = 400
+CELL_HEIGHT = 500
+PADDING = 20
+FOOTER_HEIGHT = 80
+
+# Korean-compatible fonts, first match wins
+FONT_CANDIDATES = [
+    "malgun.ttf",      # Windows 맑은 고딕
+    "malgunbd.ttf",    # Windows 맑은 고딕 Bold
+    "NanumGothic.ttf", # Nanum Gothic
+    "gulim.ttc",       # Windows 굴림
+    "batang.ttc",      # Windows 바탕
+    "C:/Windows/Fonts/malgun.ttf",
+    "C:/Windows/Fonts/NanumGothic.ttf",
+]
+
+
+@lru_cache(maxsize=1)
+def load_fonts():
+    """(title font, date font). Probing the candidates hits the filesystem, so it is done once."""
+    from PIL import ImageFont
+    for font_path in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(font_path, 24), ImageFont.truetype(font_path, 16)
+        except Exception:
+            continue
+    return ImageFont.load_default(), ImageFont.load_default()
+
+
+def fit_to_cell(img, width: int, height: int):
+    """RGB copy of `img` scaled down to fit width x height (aspect kept)."""
+    from PIL import Image
+    img = img.convert('RGB')
+    img.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return img
+
+
+def render_photo_booth(images: list, style_name: str, date_text: Optional[str] = None):
+    """
+    Stacks up to 3 images (None = placeholder cell) into a strip with a branded footer.
+    Returns the canvas as an RGB PIL image.
+    """
+    from PIL import Image, ImageDraw
+
+    total_width = CELL_WIDTH + PADDING * 2
+    total_height = CELL_HEIGHT * 3 + PADDING * 4 + FOOTER_HEIGHT
+
+    canvas = Image.new('RGB', (total_width, total_height), '#FFFFFF')
+    draw = ImageDraw.Draw(canvas)
+
+    y_offset = PADDING
+    for img in images[:3]:
+        if img is None:
+            draw.rectangle([PADDING, y_offset, PADDING + CELL_WIDTH, y_offset + CELL_HEIGHT],
+                           fill='#F0F0F0', outline='#CCCCCC')
+        else:
+            # Resize to fit cell, centered
+            img = fit_to_cell(img, CELL_WIDTH, CELL_HEIGHT)
+            x_pos = PADDING + (CELL_WIDTH - img.width) // 2
+            y_pos = y_offset + (CELL_HEIGHT - img.height) // 2
+            canvas.paste(img, (x_pos, y_pos))
+        y_offset += CELL_HEIGHT + PADDING
+
+    # Footer with branding
+    footer_y = y_offset
+    draw.rectangle([0, footer_y, total_width, total_height], fill='#1a1a2e')
+    title_font, date_font = load_fonts()
+
+    # Title (without emojis for font compatibility)
+    title_text = f"- {style_name} -"
+    title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
+    title_x = (total_width - (title_bbox[2] - title_bbox[0])) // 2
+    draw.text((title_x, footer_y + 15), title_text, fill='white', font=title_font)
+
+    date_text = date_text or datetime.now().strftime("%Y.%m.%d")
+    date_bbox = draw.textbbox((0, 0), date_text, font=date_font)
+    date_x = (total_width - (date_bbox[2] - date_bbox[0])) // 2
+    draw.text((date_x, footer_y + 48), date_text, fill='#888888', font=date_font)
+
+    return canvas
+
+
+GRID_PADDING = 12
+GRID_LABEL_HEIGHT = 36
+
+
+def render_comparison_grid(tiles: list, labels: list[str], columns: int, tile_width: int, tile_height: int):
+    """
+    Lays out pre-fitted tiles (see fit_to_cell; None = placeholder) in a grid,
+    each with its label underneath. Returns the canvas as an RGB PIL image.
+    """
+    from PIL import Image, ImageDraw
+
+    rows = max(1, -(-len(tiles) // columns))
+    cell_height = tile_height + GRID_LABEL_HEIGHT
+    total_width = columns * tile_width + (columns + 1) * GRID_PADDING
+    total_height = rows * cell_height + (rows + 1) * GRID_PADDING
+
+    canvas = Image.new('RGB', (total_width, total_height), '#FFFFFF')
+    draw = ImageDraw.Draw(canvas)
+    title_font, small_font = load_fonts()
+    font = title_font if tile_width >= 300 else small_font
+
+    for index, (tile, label) in enumerate(zip(tiles, labels)):
+        x = GRID_PADDING + (index % columns) * (tile_width + GRID_PADDING)
+        y = GRID_PADDING + (index // columns) * (cell_height + GRID_PADDING)
+        if tile is None:
+            draw.rectangle([x, y, x + tile_width, y + tile_height], fill='#F0F0F0', outline='#CCCCCC')
+        else:
+            canvas.paste(tile, (x + (tile_width - tile.width) // 2, y + (tile_height - tile.height) // 2))
+
+        label_bbox = draw.textbbox((0, 0), label, font=font)
+        label_x = x + (tile_width - (label_bbox[2] - label_bbox[0])) // 2
+        label_y = y + tile_height + (GRID_LABEL_HEIGHT - (label_bbox[3] - label_bbox[1])) // 2
+        draw.text((label_x, label_y), label, fill='#1a1a2e', font=font)
+
+    return canvas
@@ -0,0 +1,144 @@
+"""
+Draft / final generation tiers for /consultant/fitting and /api/generate.
+
+- draft: the source photo is downscaled to DRAFT_MAX_SIDE before it is sent
+  upstream (fewer image tokens, smaller upload) and the result is stored as a
+  DRAFT_MAX_SIDE JPEG under results/drafts/. Meant for browsing many styles.
+- final: full resolution, stored under results/ as before.
+Both tiers send the same prompt with a seed; the seed is returned with every
+result, so a final for the chosen style is rendered from the same seed as its
+draft. Without an explicit seed it is derived from the upload + style, so the
+draft and final of one pair agree even if the client drops it.
+
+Drafts are cached (shared cache) and retained separately from finals: files
+under results/drafts/ older than DRAFT_RETENTION_S are deleted by a
+background sweeper. Per-operation, per-tier latency and payload sizes are
+reported under /api/ops/tiers.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+from app.core.config import settings
+from app.core.worker_pools import io_pool, percentile
+
+QUALITY_TIERS = ("draft", "final")
+DRAFTS_SUBDIR = "drafts"
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DRAFTS_DIR = os.path.join(BACKEND_ROOT, "results", DRAFTS_SUBDIR)
+
+
+def resolve_quality(quality: Optional[str]) -> str:
+    return quality or settings.GENERATION_QUALITY
+
+
+def resolve_seed(seed: Optional[int], *parts) -> int:
+    """The request's seed, or one derived from `parts` (same upload + style -> same seed)."""
+    if seed is not None:
+        return seed
+    digest = hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF
+
+
+def draft_cache_ttl() -> float:
+    # A cached draft URL must not outlive its file
+    return min(settings.DRAFT_CACHE_TTL_S, settings.DRAFT_RETENTION_S)
+
+
+def downscale(img, max_side: int):
+    """Copy of `img` fitting in max_side x max_side (the image itself if it already fits)."""
+    from PIL import Image
+    if max(img.size) <= max_side:
+        return img
+    scaled = img.copy()
+    scaled.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return scaled
+
+
+def encode_draft(image_data: bytes) -> bytes:
+    """Generated image bytes -> DRAFT_MAX_SIDE JPEG."""
+    from PIL import Image
+    with Image.open(io.BytesIO(image_data)) as img:
+        img.draft("RGB", (settings.DRAFT_MAX_SIDE, settings.DRAFT_MAX_SIDE))
+        small = downscale(img.convert("RGB"), settings.DRAFT_MAX_SIDE)
+    buffer = io.BytesIO()
+    small.save(buffer, "JPEG", quality=settings.DRAFT_QUALITY)
+    return buffer.getvalue()
+
+
+class TierStats:
+    """Latency of generations (cache hits excluded) and payload sizes, per operation and tier."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies: dict[tuple, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._totals: dict[tuple, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, operation: str, tier: str, seconds: float, input_bytes: int, output_bytes: int):
+        with self._lock:
+            self._latencies[(operation, tier)].append(seconds)
+            totals = self._totals[(operation, tier)]
+            totals["count"] += 1
+            totals["input_bytes"] += input_bytes
+            totals["output_bytes"] += output_bytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            operations: dict = {}
+            for (operation, tier), totals in self._totals.items():
+                samples = self._latencies[(operation, tier)]
+                p50 = percentile(samples, 50)
+                p95 = percentile(samples, 95)
+                count = totals["count"]
+                operations.setdefault(operation, {})[tier] = {
+                    "count": count,
+                    "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                    "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                    "avg_input_kb": round(totals["input_bytes"] / count / 1024, 1),
+                    "avg_output_kb": round(totals["output_bytes"] / count / 1024, 1),
+                }
+        for tiers in operations.values():
+            draft, final = tiers.get("draft"), tiers.get("final")
+            if draft and final and draft["latency_p50_ms"]:
+                tiers["final_to_draft_p50"] = round(final["latency_p50_ms"] / draft["latency_p50_ms"], 2)
+        return {"default_quality": settings.GENERATION_QUALITY, "operations": operations}
+
+
+tier_stats = TierStats()
+
+
+def prune_drafts(max_age: float) -> int:
+    """Deletes drafts older than `max_age` seconds (and their gallery entries); returns how many."""
+    from app.services.gallery_index import gallery_index
+    if not os.path.isdir(DRAFTS_DIR):
+        return 0
+    cutoff = time.time() - max_age
+    removed = []
+    with os.scandir(DRAFTS_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed.append(f"/results/{DRAFTS_SUBDIR}/{entry.name}")
+            except OSError:
+                pass  # already removed by another worker
+    gallery_index.remove_urls(removed)
+    return len(removed)
+
+
+async def draft_sweeper():
+    """Runs for the life of the app (started from main.lifespan)."""
+    while True:
+        try:
+            removed = await io_pool.run(prune_drafts, settings.DRAFT_RETENTION_S, label="prune_drafts")
+            if removed:
+                print(f"Draft retention: removed {removed} drafts")
+        except Exception as e:
+            print(f"Draft retention error: {e}")
+        await asyncio.sleep(settings.DRAFT_SWEEP_INTERVAL_S)
@@ -16,13 +16,13 @@ BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 UPLOADS_DIR_PATH = os.path.join(BACKEND_ROOT, "uploads")
 
 class FileService:
-    def save_upload(self, file: UploadFile) -> tuple[str, str]:
+    def save_upload(self, file: UploadFile, extension: str = None) -> tuple[str, str]:
         """
         Save uploaded file to disk.
         Returns: (file_id, file_path)
         """
         file_id = str(uuid.uuid4())
-        extension = file.filename.split(".")[-1]
+        extension = extension or file.filename.split(".")[-1]
         filename = f"{file_id}.{extension}"
         
         upload_dir = Path(UPLOADS_DIR_PATH)
@@ -1,12 +1,17 @@
 from app.services.gemini_client import gemini_client
 
 class GenerateService:
-    def generate(self, image_id: str, style: str, gender: str = "person") -> str:
+    async def generate(self, image_id: str, style: str, gender: str = "person",
+                       region_mode: str = None, head_box: list = None,
+                       quality: str = "final", seed: int = None) -> str:
         # 1. Image Generation (Local SD or HF)
         # Pass gender to the image gen client
         try:
             # Refactored to use the unified gemini_client method
-            result = gemini_client.generate_quick_fitting_hairstyle(image_id, style, gender)
+            result = await gemini_client.generate_quick_fitting_hairstyle(
+                image_id, style, gender, region_mode=region_mode, head_box=head_box,
+                quality=quality, seed=seed
+            )
             # image_gen_client returns (id, url)
             if isinstance(result, tuple):
                 return result[1]
@@ -0,0 +1,174 @@
+"""
+Style preview sprite atlases for the style picker.
+
+Per gender and per SPRITE_SIZES cell size, every style preview (image_url
+under /uploads/) is cropped to a square cell and packed into one WebP atlas
+under /results/sprites/. File names carry a content hash, so the atlases are
+served with the immutable cache policy of /results. The /api/styles payload
+gains a "sprites" map ({gender: {size: {url, width, height, cell, columns}}})
+and a "sprite_index" per style: cell i sits at
+(i % columns * cell, i // columns * cell). Styles without a readable preview
+get sprite_index null and keep using image_url.
+
+Atlases are rebuilt in the background whenever the catalog version changes;
+until the new build is ready /api/styles is served without sprites.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.style_catalog import BACKEND_ROOT, StyleCatalog, style_catalog
+
+UPLOADS_DIR = os.path.join(BACKEND_ROOT, "uploads")
+SPRITES_DIR = os.path.join(BACKEND_ROOT, "results", "sprites")
+SPRITES_URL = "/results/sprites"
+GENDERS = ("male", "female")
+
+
+def _load_preview(style: dict, cell: int):
+    """Square, center-cropped preview at `cell` px, or None if there is no readable local image."""
+    from PIL import Image, ImageOps
+    image_url = style.get("image_url", "")
+    if not image_url.startswith("/uploads/"):
+        return None
+    path = os.path.join(UPLOADS_DIR, image_url[len("/uploads/"):])
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (cell, cell))
+            return ImageOps.fit(ImageOps.exif_transpose(img).convert("RGB"), (cell, cell), Image.Resampling.LANCZOS)
+    except Exception as e:
+        print(f"Sprite atlas: skipping preview of {style.get('id')}: {e}")
+        return None
+
+
+def _write_atlas(cells: list, cell: int, columns: int, name: str) -> dict:
+    from PIL import Image
+
+    rows = max(1, math.ceil(len(cells) / columns))
+    atlas = Image.new("RGB", (columns * cell, rows * cell), "#FFFFFF")
+    for i, img in enumerate(cells):
+        atlas.paste(img.resize((cell, cell), Image.Resampling.LANCZOS) if img.width != cell else img,
+                    ((i % columns) * cell, (i // columns) * cell))
+
+    buffer = io.BytesIO()
+    atlas.save(buffer, "WEBP", quality=settings.SPRITE_QUALITY, method=4)
+    data = buffer.getvalue()
+    filename = f"{name}_{hashlib.sha1(data).hexdigest()[:12]}.webp"
+    path = os.path.join(SPRITES_DIR, filename)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return {
+        "url": f"{SPRITES_URL}/{filename}",
+        "width": atlas.width,
+        "height": atlas.height,
+        "cell": cell,
+        "columns": columns,
+    }
+
+
+def build_atlases(styles: list[dict], sizes: list[int]) -> tuple[dict, dict[str, Optional[int]]]:
+    """-> (sprites map, {style id: sprite index or None})"""
+    os.makedirs(SPRITES_DIR, exist_ok=True)
+    largest = max(sizes)
+    sprites: dict = {}
+    indexes: dict[str, Optional[int]] = {}
+    for gender in GENDERS:
+        cells = []
+        for style in (s for s in styles if s.get("gender") == gender):
+            # Decoded once at the largest cell size, scaled down for the others
+            preview = _load_preview(style, largest)
+            indexes[style["id"]] = len(cells) if preview is not None else None
+            if preview is not None:
+                cells.append(preview)
+        if not cells:
+            continue
+        columns = math.ceil(math.sqrt(len(cells)))
+        sprites[gender] = {
+            str(size): _write_atlas(cells, size, columns, f"styles_{gender}_{size}")
+            for size in sorted(sizes)
+        }
+    return sprites, indexes
+
+
+class SpriteAtlasService:
+    def __init__(self, catalog: StyleCatalog = style_catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._built_version = None
+        self._building_version = None
+        self._thread: Optional[threading.Thread] = None
+        self._payload: Optional[bytes] = None
+        self._files: set[str] = set()
+        self.last_build_seconds = None
+
+    def _build(self, version: int, styles: list[dict]):
+        start = time.perf_counter()
+        try:
+            sprites, indexes = build_atlases(styles, settings.SPRITE_SIZES)
+            payload = {
+                gender: [
+                    {"name": s["name"], "image_url": s.get("image_url", ""), "sprite_index": indexes.get(s["id"])}
+                    for s in styles if s.get("gender") == gender
+                ]
+                for gender in GENDERS
+            }
+            payload["sprites"] = sprites
+            files = {os.path.basename(a["url"]) for by_size in sprites.values() for a in by_size.values()}
+            with self._lock:
+                # Keep the previous build's files for clients still holding the old payload
+                stale = set(os.listdir(SPRITES_DIR)) - files - self._files
+                self._files = files
+                self._payload = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                self._built_version = version
+            for filename in stale:
+                try:
+                    os.remove(os.path.join(SPRITES_DIR, filename))
+                except OSError:
+                    pass
+            self.last_build_seconds = round(time.perf_counter() - start, 3)
+            print(f"Sprite atlases built for catalog v{version} in {self.last_build_seconds}s")
+        except Exception as e:
+            print(f"Sprite atlas build failed: {e}")
+            with self._lock:
+                # Serve without sprites for this version instead of retrying on every request
+                self._payload = None
+                self._built_version = version
+        finally:
+            with self._lock:
+                if self._building_version == version:
+                    self._building_version = None
+
+    def sync(self, wait: bool = False):
+        """Starts a rebuild if the catalog changed since the last build."""
+        styles = self.catalog.get_styles()
+        version = self.catalog.version
+        with self._lock:
+            if version not in (self._built_version, self._building_version):
+                self._building_version = version
+                self._thread = threading.Thread(
+                    target=self._build, args=(version, styles), name="sprite-atlas", daemon=True
+                )
+                self._thread.start()
+            thread = self._thread
+        if wait and thread is not None:
+            thread.join()
+
+    def styles_payload(self) -> bytes:
+        """/api/styles body: with sprites when the atlases match the current catalog."""
+        self.sync()
+        with self._lock:
+            if self._payload is not None and self._built_version == self.catalog.version:
+                return self._payload
+        return self.catalog.styles_payload()
+
+
+sprite_atlas = SpriteAtlasService()
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from app.services.catalog_compiler import compile_catalog, load_artifact, source_signature
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(BACKEND_ROOT, "app", "data")
+STYLES_JSON_PATH = os.path.join(DATA_DIR, "styles.json")
+# Built by validate_json.py (gitignored); see services/catalog_compiler
+COMPILED_CATALOG_PATH = os.path.join(DATA_DIR, "styles.compiled.pickle")
+
+# How often (seconds) styles.json is stat()ed for changes
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+class StyleCatalog:
+    """
+    In-memory view of styles.json.
+    The file is re-read only when its mtime/size changes; every reload bumps
+    `version` so derived indexes know when to resync. A compiled artifact
+    matching the current file is loaded instead of parsing the JSON.
+    """
+
+    def __init__(self, path: str = STYLES_JSON_PATH, compiled_path: Optional[str] = COMPILED_CATALOG_PATH):
+        self.path = path
+        self.compiled_path = compiled_path
+        self.version = 0
+        self.loaded_from = None  # "artifact" | "json"
+        self._styles: list[dict] = []
+        self._by_id: dict[str, dict] = {}
+        self._by_name: dict[str, dict] = {}
+        self._styles_payload = b""
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.version and now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if self.version and now - self._last_check < RELOAD_CHECK_INTERVAL:
+                return
+            self._last_check = now
+            try:
+                signature = source_signature(self.path)
+            except OSError as e:
+                if not self.version:
+                    raise
+                print(f"Error: cannot stat {self.path}: {e}")
+                return
+            if signature == self._signature:
+                return
+            compiled = load_artifact(self.compiled_path, signature) if self.compiled_path else None
+            loaded_from = "artifact"
+            if compiled is None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        compiled = compile_catalog(json.load(f))
+                except ValueError as e:
+                    # Keep serving the last good catalog while the file is being edited
+                    if not self.version:
+                        raise
+                    print(f"Error reloading {self.path}: {e}")
+                    return
+                loaded_from = "json"
+            self._styles = compiled["styles"]
+            self._by_id = compiled["by_id"]
+            self._by_name = compiled["by_name"]
+            self._styles_payload = compiled["styles_payload"]
+            self.loaded_from = loaded_from
+            self._signature = signature
+            self.version += 1
+
+    def get_styles(self) -> list[dict]:
+        self._refresh()
+        return self._styles
+
+    def get_by_id(self, style_id: str) -> Optional[dict]:
+        self._refresh()
+        return self._by_id.get(style_id)
+
+    def get_by_name(self, name: str) -> Optional[dict]:
+        self._refresh()
+        return self._by_name.get(name)
+
+    def styles_payload(self) -> bytes:
+        """Serialized /api/styles response ({"male": [...], "female": [...]})."""
+        self._refresh()
+        return self._styles_payload
+
+
+style_catalog = StyleCatalog()
@@ -0,0 +1,230 @@
+import bisect
+import hashlib
+import json
+import math
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+from app.core.constants import FACE_SHAPE_LABELS
+from app.services.style_catalog import StyleCatalog, style_catalog
+
+# Upper bound on sorted-term entries scanned per autocomplete call
+AUTOCOMPLETE_SCAN_LIMIT = 500
+
+# Minimum fraction of query grams a style must contain to be returned
+MIN_COVERAGE = 0.5
+
+# Query grams found in more than this fraction of styles carry little ranking
+# signal; they are not scored when the query has more selective grams
+COMMON_GRAM_FRACTION = 0.5
+
+# Field weights used for ranking
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "tags": 3.0,
+    "face_shape_match": 2.0,
+    "description": 1.0,
+}
+
+_SEPARATORS = re.compile(r"[\s\-_/.,·()'\"!?]+")
+
+
+def compact(text: str) -> str:
+    """Lowercase, NFC-normalize and drop separators ('시스루 댄디 컷' -> '시스루댄디컷')."""
+    return _SEPARATORS.sub("", unicodedata.normalize("NFC", text or "").lower())
+
+
+def ngrams(text: str) -> list[str]:
+    """
+    Korean-friendly tokens: syllable unigrams plus bigrams over the compacted text.
+    Spacing in Korean is inconsistent ('댄디컷' vs '댄디 컷'), so grams are built
+    across word boundaries rather than per word.
+    """
+    chars = compact(text)
+    return list(chars) + [chars[i:i + 2] for i in range(len(chars) - 1)]
+
+
+def query_grams(text: str) -> set[str]:
+    """
+    Grams a query is scored on: its bigrams, or the syllable itself for a
+    one-syllable query. Unigrams such as '컷' or '펌' occur in nearly every
+    style, so scoring them would cost O(catalog) per query for no ranking signal.
+    """
+    chars = compact(text)
+    if len(chars) < 2:
+        return set(chars)
+    return {chars[i:i + 2] for i in range(len(chars) - 1)}
+
+
+def _style_fields(style: dict) -> dict[str, list[str]]:
+    shapes = style.get("face_shape_match", [])
+    return {
+        "name": [style.get("name", "")],
+        "tags": list(style.get("tags", [])),
+        "face_shape_match": list(shapes) + [FACE_SHAPE_LABELS.get(s, "") for s in shapes],
+        "description": [style.get("description", "")],
+    }
+
+
+def _fingerprint(style: dict) -> str:
+    payload = json.dumps(_style_fields(style) | {"gender": style.get("gender")}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class StyleSearchIndex:
+    """
+    Inverted n-gram index over the style catalog plus a sorted term list for
+    prefix autocomplete. Synced incrementally against the catalog version:
+    only added/changed/removed styles are (re)indexed. Queries read the index
+    under the same lock, so a catalog reload never changes it mid-query.
+    """
+
+    def __init__(self, catalog: StyleCatalog = style_catalog):
+        self.catalog = catalog
+        self.catalog_version = None
+        self.postings: dict[str, dict[str, float]] = {}   # gram -> {style_id: weight}
+        self.doc_grams: dict[str, dict[str, float]] = {}  # style_id -> {gram: weight}
+        self.fingerprints: dict[str, str] = {}
+        self.styles: dict[str, dict] = {}
+        self.terms: list[tuple[str, int, str, str]] = []  # (compact term, priority, display, style_id)
+        self._lock = threading.Lock()
+
+    # --- Indexing ---
+
+    def sync(self):
+        styles = self.catalog.get_styles()
+        if self.catalog_version == self.catalog.version:
+            return
+        with self._lock:
+            if self.catalog_version == self.catalog.version:
+                return
+            current = {s["id"]: s for s in styles}
+            for style_id in list(self.fingerprints):
+                if style_id not in current:
+                    self._remove(style_id)
+            for style_id, style in current.items():
+                fingerprint = _fingerprint(style)
+                if self.fingerprints.get(style_id) == fingerprint:
+                    self.styles[style_id] = style
+                    continue
+                if style_id in self.fingerprints:
+                    self._remove(style_id)
+                self._add(style_id, style, fingerprint)
+            self.catalog_version = self.catalog.version
+
+    def _add(self, style_id: str, style: dict, fingerprint: str):
+        grams: dict[str, float] = {}
+        for field, values in _style_fields(style).items():
+            weight = FIELD_WEIGHTS[field]
+            for value in values:
+                for gram in ngrams(value):
+                    grams[gram] = grams.get(gram, 0.0) + weight
+        for gram, weight in grams.items():
+            self.postings.setdefault(gram, {})[style_id] = weight
+        self.doc_grams[style_id] = grams
+        self.fingerprints[style_id] = fingerprint
+        self.styles[style_id] = style
+
+        for term in self._terms_for(style_id, style):
+            bisect.insort(self.terms, term)
+
+    def _remove(self, style_id: str):
+        for gram in self.doc_grams.pop(style_id, {}):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.pop(style_id, None)
+                if not posting:
+                    del self.postings[gram]
+        style = self.styles.pop(style_id, None)
+        self.fingerprints.pop(style_id, None)
+        if style is not None:
+            for term in self._terms_for(style_id, style):
+                pos = bisect.bisect_left(self.terms, term)
+                if pos < len(self.terms) and self.terms[pos] == term:
+                    del self.terms[pos]
+
+    @staticmethod
+    def _terms_for(style_id: str, style: dict) -> list[tuple[str, int, str, str]]:
+        terms = [(compact(style.get("name", "")), 0, style.get("name", ""), style_id)]
+        terms += [(compact(tag), 1, tag, style_id) for tag in style.get("tags", [])]
+        return [t for t in terms if t[0]]
+
+    # --- Queries ---
+
+    def search(self, query: str, gender: Optional[str] = None, limit: int = 20) -> list[dict]:
+        self.sync()
+        grams = query_grams(query)
+        if not grams:
+            return []
+
+        with self._lock:
+            total = max(1, len(self.styles))
+            postings = {gram: self.postings[gram] for gram in grams if gram in self.postings}
+            selective = {gram: p for gram, p in postings.items() if len(p) <= COMMON_GRAM_FRACTION * total}
+            # Skipping common grams keeps a query from walking most of the catalog;
+            # coverage is then measured against the grams that are scored
+            scored = selective or postings
+            query_size = len(grams) - (len(postings) - len(scored))
+            scores: dict[str, float] = {}
+            matched: dict[str, int] = {}
+            for gram, posting in scored.items():
+                idf = math.log(1.0 + total / len(posting))
+                for style_id, weight in posting.items():
+                    scores[style_id] = scores.get(style_id, 0.0) + weight * idf
+                    matched[style_id] = matched.get(style_id, 0) + 1
+
+            results = []
+            for style_id, score in scores.items():
+                style = self.styles[style_id]
+                if gender and style.get("gender") != gender:
+                    continue
+                # Favour styles covering more of the query, then exact-name hits
+                coverage = matched[style_id] / query_size
+                if coverage < MIN_COVERAGE:
+                    continue
+                score *= coverage * coverage
+                if compact(style.get("name", "")) == compact(query):
+                    score *= 2.0
+                results.append((score, style_id))
+
+            results.sort(key=lambda r: (-r[0], r[1]))
+            return [
+                {
+                    "id": style_id,
+                    "name": self.styles[style_id].get("name"),
+                    "gender": self.styles[style_id].get("gender"),
+                    "image_url": self.styles[style_id].get("image_url", ""),
+                    "score": round(score, 4),
+                }
+                for score, style_id in results[:limit]
+            ]
+
+    def autocomplete(self, prefix: str, gender: Optional[str] = None, limit: int = 10) -> list[dict]:
+        self.sync()
+        key = compact(prefix)
+        if not key:
+            return []
+
+        suggestions: dict[str, tuple[int, str, str]] = {}
+        with self._lock:
+            pos = bisect.bisect_left(self.terms, (key,))
+            end = min(len(self.terms), pos + AUTOCOMPLETE_SCAN_LIMIT)
+            while pos < end and self.terms[pos][0].startswith(key):
+                term, priority, display, style_id = self.terms[pos]
+                pos += 1
+                if gender and self.styles[style_id].get("gender") != gender:
+                    continue
+                best = suggestions.get(display)
+                if best is None or priority < best[0]:
+                    suggestions[display] = (priority, style_id, "name" if priority == 0 else "tag")
+
+        ranked = sorted(suggestions.items(), key=lambda s: (s[1][0], len(s[0]), s[0]))
+        return [
+            {"text": display, "type": kind, "style_id": style_id if kind == "name" else None}
+            for display, (_, style_id, kind) in ranked[:limit]
+        ]
+
+
+style_search_service = StyleSearchIndex()
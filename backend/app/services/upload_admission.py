@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from app.core.config import settings
+from app.core.constants import ALLOWED_EXTENSIONS
+
+# Leading bytes -> (Pillow format, canonical extension)
+MAGIC_NUMBERS = {
+    b"\xff\xd8\xff": ("JPEG", "jpg"),
+    b"\x89PNG\r\n\x1a\n": ("PNG", "png"),
+}
+FORMAT_EXTENSIONS = {"JPEG": {"jpg", "jpeg"}, "PNG": {"png"}}
+HEADER_BYTES = 16
+# Pillow's verify() is a no-op for JPEG; a missing end-of-image marker near
+# the end of the file catches truncated uploads instead
+JPEG_EOI = b"\xff\xd9"
+JPEG_TAIL_BYTES = 4096
+
+
+class UploadRejected(Exception):
+    def __init__(self, reason: str, message: str, status_code: int = 422, **details):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+        self.status_code = status_code
+        self.details = details
+
+    def to_detail(self) -> dict:
+        return {"error": "upload_rejected", "reason": self.reason, "message": self.message, **self.details}
+
+
+@dataclass
+class AdmittedImage:
+    extension: str
+    format: str
+    width: int
+    height: int
+    size_bytes: int
+
+
+class UploadAdmission:
+    """
+    Cheap checks on an uploaded file before it is saved or sent anywhere:
+    extension, byte size, magic number, Pillow header + verify (no pixel
+    decode), pixel limit, minimum side and aspect ratio.
+    A rejection costs a few ms instead of an upstream round trip.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected: dict[str, int] = defaultdict(int)
+        self.upstream_calls_saved = 0
+        self._check_seconds = 0.0
+
+    def admit(self, file: BinaryIO, filename: Optional[str], upstream_calls: int = 1) -> AdmittedImage:
+        """
+        Raises UploadRejected, or returns what was learned from the header.
+        `upstream_calls` is what accepting this upload would have led to.
+        The file position is rewound either way.
+        """
+        started = time.perf_counter()
+        try:
+            admitted = self._check(file, filename)
+        except UploadRejected as e:
+            with self._lock:
+                self.rejected[e.reason] += 1
+                self.upstream_calls_saved += upstream_calls
+                self._check_seconds += time.perf_counter() - started
+            print(f"Debug: Upload rejected ({e.reason}): {e.message}")
+            raise
+        finally:
+            file.seek(0)
+        with self._lock:
+            self.admitted += 1
+            self._check_seconds += time.perf_counter() - started
+        return admitted
+
+    def _check(self, file: BinaryIO, filename: Optional[str]) -> AdmittedImage:
+        extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            raise UploadRejected(
+                "unsupported_extension", f"Only {', '.join(sorted(ALLOWED_EXTENSIONS))} files are accepted.",
+                status_code=415, extension=extension,
+            )
+
+        file.seek(0, os.SEEK_END)
+        size_bytes = file.tell()
+        file.seek(0)
+        if size_bytes == 0:
+            raise UploadRejected("empty_file", "The uploaded file is empty.", status_code=400)
+        if size_bytes > settings.UPLOAD_MAX_BYTES:
+            raise UploadRejected(
+                "file_too_large", "The uploaded file is too large.",
+                status_code=413, size_bytes=size_bytes, limit=settings.UPLOAD_MAX_BYTES,
+            )
+
+        header = file.read(HEADER_BYTES)
+        file.seek(0)
+        detected = next((fmt for magic, fmt in MAGIC_NUMBERS.items() if header.startswith(magic)), None)
+        if detected is None:
+            raise UploadRejected("not_an_image", "The file is not a JPEG or PNG image.", status_code=415)
+        image_format, canonical_extension = detected
+
+        if image_format == "JPEG":
+            file.seek(max(0, size_bytes - JPEG_TAIL_BYTES))
+            tail = file.read()
+            file.seek(0)
+            if JPEG_EOI not in tail:
+                raise UploadRejected("corrupt_image", "The image could not be read: truncated JPEG")
+
+        from PIL import Image
+        try:
+            # open() only parses the header; verify() checks structure without decoding pixels
+            with Image.open(file) as img:
+                width, height = img.size
+                if width * height > settings.UPLOAD_MAX_PIXELS:
+                    raise UploadRejected(
+                        "too_many_pixels", "The image resolution is too high.",
+                        status_code=413, width=width, height=height, limit=settings.UPLOAD_MAX_PIXELS,
+                    )
+                img.verify()
+        except UploadRejected:
+            raise
+        except Image.DecompressionBombError:
+            raise UploadRejected("too_many_pixels", "The image resolution is too high.", status_code=413,
+                                 limit=settings.UPLOAD_MAX_PIXELS)
+        except Exception as e:
+            raise UploadRejected("corrupt_image", f"The image could not be read: {e}")
+
+        if min(width, height) < settings.UPLOAD_MIN_SIDE:
+            raise UploadRejected(
+                "image_too_small", "The image is too small to analyze.",
+                width=width, height=height, min_side=settings.UPLOAD_MIN_SIDE,
+            )
+        aspect = max(width, height) / min(width, height)
+        if aspect > settings.UPLOAD_MAX_ASPECT_RATIO:
+            raise UploadRejected(
+                "bad_aspect_ratio", "The image is too wide or too tall for a portrait.",
+                width=width, height=height, max_aspect_ratio=settings.UPLOAD_MAX_ASPECT_RATIO,
+            )
+
+        # Keep the client's extension unless it lies about the format
+        if extension not in FORMAT_EXTENSIONS[image_format]:
+            extension = canonical_extension
+        return AdmittedImage(extension, image_format, width, height, size_bytes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            checked = self.admitted + sum(self.rejected.values())
+            return {
+                "checked": checked,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "upstream_calls_saved": self.upstream_calls_saved,
+                "avg_check_ms": round(self._check_seconds / checked * 1000, 3) if checked else None,
+            }
+
+
+upload_admission = UploadAdmission()
@@ -0,0 +1,180 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from app.core.config import settings
+from app.core.request_context import current_session
+from app.core.worker_pools import percentile
+
+# Operation -> scheduling class. Unknown operations are treated as interactive.
+OPERATION_CLASSES = {
+    "analyze_face": "interactive",
+    "recommend_styles_with_llm": "interactive",
+    "generate_hairstyle": "interactive",
+    "generate_quick_fitting_hairstyle": "interactive",
+    "generate_time_change": "bulk",
+    "generate_multi_angle": "bulk",
+    "generate_pose": "bulk",
+}
+
+
+class _Ticket:
+    __slots__ = ("flow", "op_class", "future", "enqueued_at", "cancelled")
+
+    def __init__(self, flow, op_class, future):
+        self.flow = flow
+        self.op_class = op_class
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+
+class UpstreamScheduler:
+    """
+    Weighted fair queuing of upstream model calls.
+
+    Each (session, class) pair is a flow. A request gets the start tag
+    max(V, last finish of its flow) and the finish tag start + 1/weight;
+    free slots go to the smallest finish tag and V advances to the start tag
+    being served. A session with 36 queued bulk variants therefore only gets
+    its fair share, and an interactive fitting (higher weight) from another
+    session is served next instead of behind them.
+    """
+
+    def __init__(self, capacity: int, weights: dict[str, float]):
+        self.capacity = capacity
+        self.weights = weights
+        self.in_flight = 0
+        self._virtual_time = 0.0
+        self._flow_finish: dict[tuple, float] = {}
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._queued = 0
+        self._queued_by_class: dict[str, int] = defaultdict(int)
+        self._queued_by_session: dict[str, int] = defaultdict(int)
+        self._wait_samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+        self._dispatched: dict[str, int] = defaultdict(int)
+        self._started_at = time.monotonic()
+        self._busy_slot_seconds = 0.0
+        self._last_change = time.monotonic()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def _tags(self, flow: tuple, op_class: str) -> tuple[float, float]:
+        weight = self.weights.get(op_class, 1.0)
+        start = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+        finish = start + 1.0 / weight
+        self._flow_finish[flow] = finish
+        if len(self._flow_finish) > 10000:
+            # Flows at or behind virtual time carry no credit; forget them
+            self._flow_finish = {f: t for f, t in self._flow_finish.items() if t > self._virtual_time}
+        return start, finish
+
+    def _account_busy(self):
+        now = time.monotonic()
+        self._busy_slot_seconds += self.in_flight * (now - self._last_change)
+        self._last_change = now
+
+    def _grant(self, ticket: _Ticket, start: float):
+        self._account_busy()
+        self.in_flight += 1
+        self._virtual_time = max(self._virtual_time, start)
+        self._wait_samples[ticket.op_class].append(time.monotonic() - ticket.enqueued_at)
+        self._dispatched[ticket.op_class] += 1
+
+    async def acquire(self, operation: str, session: Optional[str] = None) -> _Ticket:
+        op_class = OPERATION_CLASSES.get(operation, "interactive")
+        session = session or current_session()
+        flow = (session, op_class)
+        start, finish = self._tags(flow, op_class)
+        ticket = _Ticket(flow, op_class, None)
+
+        if self.in_flight < self.capacity and not self._queued:
+            self._grant(ticket, start)
+            return ticket
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), start, ticket))
+        self._queued += 1
+        self._queued_by_class[op_class] += 1
+        self._queued_by_session[session] += 1
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.release(ticket)
+            else:
+                ticket.cancelled = True
+                self._dequeued(ticket)
+            raise
+        return ticket
+
+    def _dequeued(self, ticket: _Ticket):
+        self._queued -= 1
+        self._queued_by_class[ticket.op_class] -= 1
+        session = ticket.flow[0]
+        self._queued_by_session[session] -= 1
+        if self._queued_by_session[session] <= 0:
+            del self._queued_by_session[session]
+
+    def release(self, ticket: _Ticket):
+        self._account_busy()
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.in_flight < self.capacity and self._heap:
+            _, _, start, ticket = heapq.heappop(self._heap)
+            if ticket.cancelled:
+                continue
+            self._dequeued(ticket)
+            self._grant(ticket, start)
+            ticket.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, operation: str, timeout: Optional[float] = None):
+        """Holds one upstream slot for the duration of the block."""
+        ticket = await asyncio.wait_for(self.acquire(operation), timeout)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        self._account_busy()
+        elapsed = max(1e-9, time.monotonic() - self._started_at)
+        waits = {}
+        for op_class, samples in self._wait_samples.items():
+            p50 = percentile(samples, 50)
+            p95 = percentile(samples, 95)
+            waits[op_class] = {
+                "dispatched": self._dispatched[op_class],
+                "wait_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "wait_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+        busiest = sorted(self._queued_by_session.items(), key=lambda kv: -kv[1])[:10]
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "utilization": round(self._busy_slot_seconds / (elapsed * self.capacity), 4),
+            "queued_by_class": {k: v for k, v in self._queued_by_class.items() if v > 0},
+            "queued_by_session": dict(busiest),
+            "wait": waits,
+        }
+
+
+upstream_scheduler = UpstreamScheduler(
+    capacity=settings.UPSTREAM_MAX_CONCURRENCY,
+    weights={
+        "interactive": settings.SCHEDULER_INTERACTIVE_WEIGHT,
+        "bulk": settings.SCHEDULER_BULK_WEIGHT,
+    },
+)
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from app.core.config import settings
+
+# Usage is kept in fixed-width time buckets; quotas look at the last 60s
+BUCKET_SECONDS = 10
+QUOTA_WINDOW_SECONDS = 60
+
+# Per-bucket counters
+CALLS, PROMPT_TOKENS, CANDIDATE_TOKENS, IMAGES, IMAGE_BYTES, ERRORS = range(6)
+FIELDS = ("calls", "prompt_tokens", "candidate_tokens", "images", "image_bytes", "errors")
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, metric: str, limit: int, used: int, retry_after: int):
+        super().__init__(f"Quota exceeded: {used}/{limit} {metric} per minute")
+        self.metric = metric
+        self.limit = limit
+        self.used = used
+        self.retry_after = retry_after
+
+
+def extract_usage(response) -> tuple[int, int, int, int]:
+    """(prompt tokens, candidate tokens, images, image bytes) from a generate_content response."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = (getattr(usage, "prompt_token_count", None) or 0) if usage else 0
+    candidate_tokens = (getattr(usage, "candidates_token_count", None) or 0) if usage else 0
+
+    images = 0
+    image_bytes = 0
+    for candidate in getattr(response, "candidates", None) or []:
+        content = getattr(candidate, "content", None)
+        for part in (getattr(content, "parts", None) or []):
+            inline_data = getattr(part, "inline_data", None)
+            if inline_data and inline_data.data:
+                images += 1
+                image_bytes += len(inline_data.data)
+    return prompt_tokens, candidate_tokens, images, image_bytes
+
+
+class UsageTracker:
+    """
+    Rolling per-client / per-operation accounting of upstream usage
+    (calls, token counts from usage_metadata, images and image bytes),
+    plus per-minute quota checks against the same counters.
+    """
+
+    def __init__(self, window_minutes: int = 60):
+        self.window_buckets = max(1, window_minutes * 60 // BUCKET_SECONDS)
+        # bucket -> (client, operation) -> counters
+        self._buckets: dict[int, dict[tuple[str, str], list[int]]] = defaultdict(dict)
+        # bucket -> client -> counters (summed over operations, for cheap quota checks)
+        self._client_buckets: dict[int, dict[str, list[int]]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(now: Optional[float] = None) -> int:
+        return int((now if now is not None else time.time()) // BUCKET_SECONDS)
+
+    def _prune(self, current: int):
+        oldest = current - self.window_buckets
+        for bucket in [b for b in self._buckets if b <= oldest]:
+            del self._buckets[bucket]
+            self._client_buckets.pop(bucket, None)
+
+    def record(self, client_key: str, operation: str, prompt_tokens: int = 0, candidate_tokens: int = 0,
+               images: int = 0, image_bytes: int = 0, error: bool = False):
+        bucket = self._bucket()
+        delta = (1, prompt_tokens, candidate_tokens, images, image_bytes, 1 if error else 0)
+        with self._lock:
+            for counters in (
+                self._buckets[bucket].setdefault((client_key, operation), [0] * len(FIELDS)),
+                self._client_buckets[bucket].setdefault(client_key, [0] * len(FIELDS)),
+            ):
+                for i, value in enumerate(delta):
+                    counters[i] += value
+            if len(self._buckets) > self.window_buckets + 1:
+                self._prune(bucket)
+
+    def _recent_client_usage(self, client_key: str) -> list[int]:
+        current = self._bucket()
+        totals = [0] * len(FIELDS)
+        for bucket in range(current - QUOTA_WINDOW_SECONDS // BUCKET_SECONDS + 1, current + 1):
+            counters = self._client_buckets.get(bucket, {}).get(client_key)
+            if counters:
+                for i, value in enumerate(counters):
+                    totals[i] += value
+        return totals
+
+    def check_quota(self, client_key: str):
+        """Raises QuotaExceeded if the client used up any per-minute quota. O(window buckets)."""
+        limits = (
+            ("calls", settings.QUOTA_CALLS_PER_MINUTE, CALLS),
+            ("tokens", settings.QUOTA_TOKENS_PER_MINUTE, None),
+            ("images", settings.QUOTA_IMAGES_PER_MINUTE, IMAGES),
+        )
+        if not any(limit > 0 for _, limit, _ in limits):
+            return
+
+        usage = self._recent_client_usage(client_key)
+        for metric, limit, index in limits:
+            if limit <= 0:
+                continue
+            used = usage[PROMPT_TOKENS] + usage[CANDIDATE_TOKENS] if index is None else usage[index]
+            if used >= limit:
+                # The oldest bucket in the window is the first to expire
+                retry_after = BUCKET_SECONDS - int(time.time()) % BUCKET_SECONDS
+                raise QuotaExceeded(metric, limit, used, retry_after)
+
+    def snapshot(self, client_key: Optional[str] = None, minutes: Optional[int] = None) -> dict:
+        current = self._bucket()
+        span = self.window_buckets if minutes is None else max(1, minutes * 60 // BUCKET_SECONDS)
+        per_client: dict[str, dict[str, dict[str, int]]] = {}
+        with self._lock:
+            for bucket, entries in self._buckets.items():
+                if bucket <= current - span:
+                    continue
+                for (client, operation), counters in entries.items():
+                    if client_key is not None and client != client_key:
+                        continue
+                    ops = per_client.setdefault(client, {})
+                    totals = ops.setdefault(operation, dict.fromkeys(FIELDS, 0))
+                    for name, value in zip(FIELDS, counters):
+                        totals[name] += value
+
+        for ops in per_client.values():
+            ops["total"] = {name: sum(op[name] for op in ops.values()) for name in FIELDS}
+        return {"window_minutes": span * BUCKET_SECONDS // 60, "clients": per_client}
+
+
+usage_tracker = UsageTracker(window_minutes=settings.USAGE_WINDOW_MINUTES)
@@ -0,0 +1,66 @@
+"""
+Style catalog load benchmark: styles.json parse + index/payload build vs the
+compiled artifact (synthetic catalogs built from styles.json).
+
+Usage (from backend root):
+    python benchmarks/bench_catalog_load.py --sizes 37 1000 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.catalog_compiler import compile_catalog, source_signature, write_artifact
+from app.services.style_catalog import STYLES_JSON_PATH, StyleCatalog
+
+
+def make_styles(n: int, seed_styles: list[dict]) -> list[dict]:
+    styles = []
+    for i in range(n):
+        base = seed_styles[i % len(seed_styles)]
+        prefix = base["id"].split("_")[0]
+        styles.append({**base, "id": f"{prefix}_{i:05d}", "name": f"{base['name']} {i}"})
+    return styles
+
+
+def time_load(source: str, compiled_path, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        catalog = StyleCatalog(source, compiled_path=compiled_path)
+        start = time.perf_counter()
+        catalog.get_styles()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[37, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(STYLES_JSON_PATH, "r", encoding="utf-8") as f:
+        seed_styles = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="bench_catalog_") as tmp:
+        for size in args.sizes:
+            source = os.path.join(tmp, f"styles_{size}.json")
+            artifact = os.path.join(tmp, f"styles_{size}.compiled.pickle")
+            styles = make_styles(size, seed_styles)
+            with open(source, "w", encoding="utf-8") as f:
+                json.dump(styles, f, ensure_ascii=False, indent=2)
+            write_artifact(artifact, compile_catalog(styles), source_signature(source))
+
+            json_ms = time_load(source, None, args.repeat)
+            artifact_ms = time_load(source, artifact, args.repeat)
+            print(f"{size:6d} styles: json {json_ms:8.2f}ms  artifact {artifact_ms:8.2f}ms  "
+                  f"({json_ms / artifact_ms:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
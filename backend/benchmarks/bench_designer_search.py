@@ -0,0 +1,78 @@
+"""
+Designer search benchmark (synthetic catalog).
+
+Usage (from backend root):
+    python benchmarks/bench_designer_search.py --designers 100000 --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.designer_service import DesignerIndex
+from app.services.style_catalog import STYLES_JSON_PATH
+
+# Seoul bounding box
+LAT_RANGE = (37.41, 37.70)
+LON_RANGE = (126.76, 127.18)
+
+
+def make_designers(n: int, specialties: list[str], rng: random.Random) -> list[dict]:
+    return [
+        {
+            "id": f"d_{i:06d}",
+            "name": f"Designer {i}",
+            "location": {"lat": rng.uniform(*LAT_RANGE), "lon": rng.uniform(*LON_RANGE)},
+            "specialty": rng.sample(specialties, 2),
+        }
+        for i in range(n)
+    ]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--designers", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(STYLES_JSON_PATH, "r", encoding="utf-8") as f:
+        styles = json.load(f)
+    specialties = [s["prompt_modifier"].split(".")[0].replace("Korean ", "") for s in styles]
+
+    designers = make_designers(args.designers, specialties, rng)
+
+    start = time.perf_counter()
+    index = DesignerIndex(designers, styles)
+    build_s = time.perf_counter() - start
+    print(f"Built index over {len(designers)} designers in {build_s:.2f}s "
+          f"({len(index.specialty_trees)} specialty trees)")
+
+    style_ids = list(index.styles_by_id)
+    queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE), rng.choice(style_ids)) for _ in range(args.queries)]
+
+    for label, use_style in (("nearest (no filter)", False), ("nearest by style", True)):
+        timings = []
+        for lat, lon, style_id in queries:
+            start = time.perf_counter()
+            specialties_for_style = index.resolve_specialties(style_id=style_id) if use_style else None
+            index.nearest(lat, lon, k=args.k, specialties=specialties_for_style)
+            timings.append((time.perf_counter() - start) * 1e6)
+        print(f"{label:22s} k={args.k}: p50={statistics.median(timings):7.1f}us "
+              f"p99={percentile(timings, 99):7.1f}us max={max(timings):7.1f}us")
+
+
+if __name__ == "__main__":
+    main()
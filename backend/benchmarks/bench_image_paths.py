@@ -0,0 +1,360 @@
+"""
+Microbenchmarks for the local Pillow work (fully offline, uses ../test-data).
+
+Each (operation, resolution) case runs in its own subprocess so its peak
+memory can be measured: Pillow allocates image memory outside tracemalloc's
+view, so the reported memory is peak RSS growth during the first run (Linux
+VmHWM, reset through /proc/self/clear_refs; ru_maxrss elsewhere) after a small
+warm-up. Time is the best of --repeat runs (the least sensitive to other load
+on the machine). Cases call the app's own code paths (image cache,
+GeminiClient, photo booth, head region, guards).
+
+Usage (from backend root):
+    python benchmarks/bench_image_paths.py                    # report against the baseline
+    python benchmarks/bench_image_paths.py --check            # ... and fail on regressions
+    python benchmarks/bench_image_paths.py --update-baseline  # record a new baseline
+    python benchmarks/bench_image_paths.py --only photo_booth --sizes 1024
+
+The baseline stores a calibration time (a fixed Pillow workload) next to the
+cases; baseline times are scaled by this machine's calibration / the
+baseline's before comparing, so a baseline recorded elsewhere still applies
+(--no-calibrate compares raw times). Small cases stay noisy on shared or
+single-core machines, so failing is opt-in: with --check, exit status 1
+means a case regressed past the thresholds.
+"""
+import argparse
+import ctypes
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(BACKEND_ROOT), "test-data")
+BASELINE_PATH = os.path.join(BACKEND_ROOT, "benchmarks", "baselines", "image_paths.json")
+
+DEFAULT_SIZES = (512, 1024, 2048)  # long side in pixels
+WARMUP_SIZE = 384  # large enough to pass admission / output validation
+
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA_MS = 1.0
+MIN_MEMORY_DELTA_KB = 2048
+
+CALIBRATION_KEY = "_calibration"
+CALIBRATION_SIDE = 1024
+
+
+def fixture_path(fixture_dir: str, size: int, index: int = 0) -> str:
+    return os.path.join(fixture_dir, f"{size}_{index}.jpg")
+
+
+def make_fixtures(fixture_dir: str, sizes) -> None:
+    """Resizes the bundled portraits to each long-side size (EXIF kept, so transpose has work)."""
+    from PIL import Image
+    sources = sorted(f for f in os.listdir(TEST_DATA_DIR) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    for size in (WARMUP_SIZE, *sizes):
+        for index, name in enumerate(sources[:3]):
+            with Image.open(os.path.join(TEST_DATA_DIR, name)) as img:
+                exif = img.info.get("exif")
+                scale = size / max(img.size)
+                resized = img.convert("RGB").resize(
+                    (max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS
+                )
+                resized.save(fixture_path(fixture_dir, size, index), "JPEG", quality=90, **({"exif": exif} if exif else {}))
+
+
+# === Operations =========================================================
+# setup(fixture_dir, size) -> state; run(state) does the measured work once.
+
+def _load(path):
+    from app.services.image_cache import decode_image
+    return decode_image(path, transpose=True, rgb=True)
+
+
+def _encode_png(img) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def setup_path(fixture_dir, size):
+    return fixture_path(fixture_dir, size)
+
+
+def run_decode_transpose_rgb(path):
+    # GeminiClient._load_image on a cold image cache: open + exif_transpose + RGB,
+    # as in analyze / fitting / variants (the content hash is memoized after warm-up)
+    from app.services.gemini_client import GeminiClient
+    from app.services.image_cache import image_cache
+    image_cache.clear()
+    GeminiClient._load_image(path, transpose=True, rgb=True)
+
+
+def setup_image(fixture_dir, size):
+    return _load(fixture_path(fixture_dir, size))
+
+
+def run_thumbnail(img):
+    from PIL import Image
+    img.copy().thumbnail((400, 500), Image.Resampling.LANCZOS)
+
+
+def setup_photo_booth(fixture_dir, size):
+    return [_load(fixture_path(fixture_dir, size, i)) for i in range(3)]
+
+
+def run_photo_booth(images):
+    from app.services.photo_booth import render_photo_booth
+    render_photo_booth(images, "Benchmark Cut", date_text="2024.01.01")
+
+
+def setup_write(fixture_dir, size):
+    from app.services import gemini_client
+    # Results land in the fixture directory, not backend/results
+    gemini_client.RESULTS_DIR = fixture_dir
+    return _encode_png(_load(fixture_path(fixture_dir, size)))
+
+
+def run_result_write(data):
+    # GeminiClient._save_result: write + content hash for the image cache, as for every generated result
+    from app.services.gemini_client import RESULTS_DIR, GeminiClient
+    GeminiClient._save_result(data, f"result_{os.getpid()}.png")
+    os.remove(os.path.join(RESULTS_DIR, f"result_{os.getpid()}.png"))
+
+
+def setup_head_composite(fixture_dir, size):
+    from app.services.head_region import HeuristicHeadDetector, crop_head_region
+    img = _load(fixture_path(fixture_dir, size))
+    region, crop_box = crop_head_region(img, HeuristicHeadDetector())
+    return img, region, crop_box
+
+
+def run_head_composite(state):
+    from app.services.head_region import composite_region
+    img, region, crop_box = state
+    composite_region(img, region, crop_box)
+
+
+def setup_validate_output(fixture_dir, size):
+    return _encode_png(_load(fixture_path(fixture_dir, size)))
+
+
+def run_validate_output(data):
+    from app.services.generation_guard import validate_image_bytes
+    validate_image_bytes(data)
+
+
+def setup_upload_admission(fixture_dir, size):
+    with open(fixture_path(fixture_dir, size), "rb") as f:
+        return f.read()
+
+
+def run_upload_admission(data):
+    from app.services.upload_admission import upload_admission
+    upload_admission.admit(io.BytesIO(data), "portrait.jpg", upstream_calls=0)
+
+
+OPERATIONS = {
+    "decode_transpose_rgb": (setup_path, run_decode_transpose_rgb),
+    "thumbnail": (setup_image, run_thumbnail),
+    "photo_booth": (setup_photo_booth, run_photo_booth),
+    "result_write": (setup_write, run_result_write),
+    "head_composite": (setup_head_composite, run_head_composite),
+    "validate_output": (setup_validate_output, run_validate_output),
+    "upload_admission": (setup_upload_admission, run_upload_admission),
+}
+
+
+def calibrate(repeat: int = 7) -> float:
+    """
+    Best time (ms) of a fixed Pillow workload (resize, PNG and JPEG encode,
+    JPEG decode of a synthetic image): the machine-speed yardstick baseline
+    times are scaled by.
+    """
+    from PIL import Image
+    source = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((CALIBRATION_SIDE, CALIBRATION_SIDE)),
+        Image.radial_gradient("L").resize((CALIBRATION_SIDE, CALIBRATION_SIDE)),
+        Image.effect_noise((CALIBRATION_SIDE, CALIBRATION_SIDE), 48).convert("L"),
+    ])
+
+    def workload():
+        source.resize((CALIBRATION_SIDE // 2, CALIBRATION_SIDE // 2), Image.Resampling.LANCZOS)
+        source.save(io.BytesIO(), "PNG")
+        jpeg = io.BytesIO()
+        source.save(jpeg, "JPEG", quality=90)
+        jpeg.seek(0)
+        Image.open(jpeg).load()
+
+    workload()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 3)
+
+
+def _status_kb(field: str):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> int:
+    """Returns the current RSS (KiB) and, where supported, resets the peak to it."""
+    from PIL import Image
+    Image.core.set_blocks_max(0)  # no Pillow block cache: freed images leave RSS
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    current = _status_kb("VmRSS")
+    return current if current is not None else peak_rss_kb()
+
+
+def peak_rss_kb() -> int:
+    peak = _status_kb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_worker(operation: str, size: int, fixture_dir: str, repeat: int) -> dict:
+    setup, run = OPERATIONS[operation]
+    # Warm-up on a small input pulls in lazy imports / codecs before measuring memory
+    run(setup(fixture_dir, WARMUP_SIZE))
+
+    state = setup(fixture_dir, size)
+    baseline_kb = reset_peak_rss()
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run(state)
+        timings.append((time.perf_counter() - start) * 1000)
+        if i == 0:
+            peak_kb = max(0, peak_rss_kb() - baseline_kb)
+    return {
+        "time_ms": round(min(timings), 3),
+        "peak_memory_kb": peak_kb,
+    }
+
+
+def measure(operation: str, size: int, fixture_dir: str, repeat: int) -> dict:
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", operation, str(size), fixture_dir, str(repeat)],
+        capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"{operation}@{size} failed:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, max_time_regression: float, max_memory_regression: float,
+            time_scale: float = 1.0) -> list[str]:
+    """`time_scale` converts baseline times to this machine's speed (memory is not scaled)."""
+    failures = []
+    for case, current in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        expected_ms = base["time_ms"] * time_scale
+        if (current["time_ms"] > expected_ms * (1 + max_time_regression)
+                and current["time_ms"] - expected_ms > MIN_TIME_DELTA_MS):
+            failures.append(f"{case}: time {expected_ms:.1f}ms (baseline {base['time_ms']:.1f}ms x {time_scale:.2f})"
+                            f" -> {current['time_ms']:.1f}ms")
+        if (current["peak_memory_kb"] > base["peak_memory_kb"] * (1 + max_memory_regression)
+                and current["peak_memory_kb"] - base["peak_memory_kb"] > MIN_MEMORY_DELTA_KB):
+            failures.append(f"{case}: peak memory {base['peak_memory_kb']}KB -> {current['peak_memory_kb']}KB")
+    return failures
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        operation, size, fixture_dir, repeat = sys.argv[2], int(sys.argv[3]), sys.argv[4], int(sys.argv[5])
+        print(json.dumps(run_worker(operation, size, fixture_dir, repeat)))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--only", nargs="+", choices=sorted(OPERATIONS), default=sorted(OPERATIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--max-time-regression", type=float, default=0.50, help="allowed fraction, e.g. 0.5 = +50%%")
+    parser.add_argument("--max-memory-regression", type=float, default=0.20)
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on regressions")
+    parser.add_argument("--no-calibrate", action="store_true", help="compare raw times, without machine scaling")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    calibration_ms = calibrate()
+    print(f"{'calibration':28s} {calibration_ms:9.2f}ms")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_images_") as fixture_dir:
+        make_fixtures(fixture_dir, args.sizes)
+        for operation in args.only:
+            for size in args.sizes:
+                case = f"{operation}@{size}"
+                results[case] = measure(operation, size, fixture_dir, args.repeat)
+                print(f"{case:28s} {results[case]['time_ms']:9.2f}ms  {results[case]['peak_memory_kb'] / 1024:8.1f}MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        baseline[CALIBRATION_KEY] = {"time_ms": calibration_ms}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    time_scale = 1.0
+    if not args.no_calibrate and CALIBRATION_KEY in baseline:
+        time_scale = calibration_ms / baseline[CALIBRATION_KEY]["time_ms"]
+        print(f"\nMachine speed vs baseline: x{time_scale:.2f} (baseline times scaled by this)")
+    failures = compare(results, baseline, args.max_time_regression, args.max_memory_regression, time_scale)
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        if args.check:
+            sys.exit(1)
+        return
+    print(f"\nNo regressions against baseline ({len(set(results) & set(baseline))} cases compared)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Local style recommender benchmark (synthetic catalog built from styles.json).
+
+Usage (from backend root):
+    python benchmarks/bench_recommender.py --styles 10000 --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.constants import FACE_SHAPE_LABELS
+from app.services.local_recommender import LocalRecommender
+from app.services.style_catalog import STYLES_JSON_PATH
+
+HAIR_LENGTHS = ["숏", "미디엄", "롱"]
+HAIR_TEXTURES = ["직모", "곱슬", "반곱슬"]
+
+
+def make_styles(n: int, seed_styles: list[dict], rng: random.Random) -> list[dict]:
+    tags = sorted({tag for s in seed_styles for tag in s["tags"]})
+    styles = []
+    for i in range(n):
+        base = seed_styles[i % len(seed_styles)]
+        styles.append({
+            **base,
+            "id": f"{base['id']}_{i:05d}",
+            "tags": rng.sample(tags, min(len(tags), rng.randint(2, 5))),
+            "face_shape_match": rng.sample(list(FACE_SHAPE_LABELS), rng.randint(1, 3)),
+        })
+    return styles
+
+
+def make_analysis(rng: random.Random) -> dict:
+    return {
+        "face_shape": rng.choice(list(FACE_SHAPE_LABELS.values())),
+        "skin_tone": "웜톤",
+        "hair_length": rng.choice(HAIR_LENGTHS),
+        "hair_texture": rng.choice(HAIR_TEXTURES),
+        "hair_color": "흑갈색",
+        "feature_summary": "이마가 넓고 턱선이 부드러움",
+    }
+
+
+class StaticCatalog:
+    """Stands in for StyleCatalog so the recommender indexes the synthetic styles."""
+    version = 1
+
+    def __init__(self, styles: list[dict]):
+        self.styles = styles
+
+    def get_styles(self) -> list[dict]:
+        return self.styles
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--styles", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(STYLES_JSON_PATH, "r", encoding="utf-8") as f:
+        seed_styles = json.load(f)
+    styles = make_styles(args.styles, seed_styles, rng)
+
+    recommender = LocalRecommender(StaticCatalog(styles))
+    start = time.perf_counter()
+    recommender._sync()
+    build_s = time.perf_counter() - start
+    print(f"Built {recommender._matrix.shape[0]}x{recommender._matrix.shape[1]} matrix in {build_s * 1000:.1f}ms")
+
+    analyses = [make_analysis(rng) for _ in range(args.queries)]
+    shortlist = [s["id"] for s in rng.sample(styles, min(len(styles), 500))]
+    cases = (
+        ("all styles", {}),
+        ("gender filter", {"gender_filter": "female"}),
+        ("500-id restriction", {"style_ids": shortlist}),
+    )
+    for label, kwargs in cases:
+        timings = []
+        for analysis in analyses:
+            start = time.perf_counter()
+            recommender.recommend(analysis, k=args.k, **kwargs)
+            timings.append((time.perf_counter() - start) * 1e6)
+        print(f"{label:20s} k={args.k}: p50={statistics.median(timings):7.1f}us "
+              f"p99={percentile(timings, 99):7.1f}us max={max(timings):7.1f}us")
+
+
+if __name__ == "__main__":
+    main()
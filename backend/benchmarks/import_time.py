@@ -0,0 +1,74 @@
+"""
+Import-time budget for `app.main` (cold start).
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters and fails
+when the median exceeds the budget or a lazily-loaded heavy module is pulled in
+at import time.
+
+Usage (from backend root):
+    python benchmarks/import_time.py --budget-ms 800 --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported on first use, never by `import app.main`
+LAZY_MODULES = ("google.genai", "PIL.Image")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_once() -> tuple[float, dict[str, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import app.main failed:\n{proc.stderr[-2000:]}")
+
+    cumulative: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative.get("app.main", 0) / 1000.0, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 800)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = []
+    cumulative = {}
+    for _ in range(args.runs):
+        elapsed_ms, cumulative = measure_once()
+        samples.append(elapsed_ms)
+
+    median_ms = statistics.median(samples)
+    print(f"import app.main: median {median_ms:.0f}ms over {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    print("Slowest app modules (cumulative):")
+    app_modules = sorted(((us, name) for name, us in cumulative.items() if name.startswith("app.")), reverse=True)
+    for us, name in app_modules[:args.top]:
+        print(f"  {us / 1000.0:8.1f}ms  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in cumulative]
+    if eager:
+        print(f"FAIL: lazily-loaded modules imported eagerly: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import time {median_ms:.0f}ms exceeds budget {args.budget_ms:.0f}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
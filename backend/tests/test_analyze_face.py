@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.core.deadlines import DeadlineExceeded
+from app.core.shared_cache import SharedCache
+from app.services import gemini_client
+from app.services.gemini_client import GeminiClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(gemini_client, "shared_cache", SharedCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024))
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"not really a jpeg")
+    client = GeminiClient()
+    client.photo = str(photo)
+    return client
+
+
+def _failing_upstream(error: Exception):
+    async def upstream(image_path, image=None):
+        raise error
+    return upstream
+
+
+def test_deadline_propagates(client, monkeypatch):
+    monkeypatch.setattr(client, "_analyze_face_upstream", _failing_upstream(DeadlineExceeded("analysis ran out of time")))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(client.analyze_face(client.photo))
+
+
+def test_other_errors_fall_back_unless_disabled(client, monkeypatch):
+    monkeypatch.setattr(client, "_analyze_face_upstream", _failing_upstream(RuntimeError("bad response")))
+    assert asyncio.run(client.analyze_face(client.photo))["face_shape"] == "Unknown"
+    with pytest.raises(RuntimeError):
+        asyncio.run(client.analyze_face(client.photo, fallback=False))
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore
+
+PATH = "/api/consultant/fitting"
+
+
+def _scope(key: str) -> dict:
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": PATH,
+        "query_string": b"",
+        "headers": [(b"idempotency-key", key.encode()), (b"content-type", b"application/json")],
+    }
+
+
+def _stub_app(statuses: list[int], calls: list[int]):
+    """Answers each call with the next status of `statuses`."""
+    async def app(scope, receive, send):
+        await receive()
+        status = statuses[len(calls)]
+        calls.append(status)
+        body = json.dumps({"status": status}).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def _post(middleware, key: str) -> tuple[int, dict]:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"style": "a"}', "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(_scope(key), receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+def test_quota_rejection_is_not_replayed():
+    calls: list[int] = []
+    middleware = IdempotencyMiddleware(_stub_app([429, 200], calls), store=IdempotencyStore())
+
+    async def scenario():
+        first, _ = await _post(middleware, "retry-after-quota")
+        retry, headers = await _post(middleware, "retry-after-quota")
+        return first, retry, headers
+
+    first, retry, headers = asyncio.run(scenario())
+    assert first == 429
+    assert retry == 200
+    assert b"idempotent-replayed" not in headers
+    assert calls == [429, 200]
+
+
+def test_success_is_replayed():
+    calls: list[int] = []
+    middleware = IdempotencyMiddleware(_stub_app([200, 200], calls), store=IdempotencyStore())
+
+    async def scenario():
+        await _post(middleware, "done")
+        return await _post(middleware, "done")
+
+    retry, headers = asyncio.run(scenario())
+    assert retry == 200
+    assert headers[b"idempotent-replayed"] == b"true"
+    assert calls == [200]
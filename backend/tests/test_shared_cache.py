@@ -0,0 +1,45 @@
+import asyncio
+
+from app.core.shared_cache import SharedCache, connect_wal
+
+
+def _compute(calls: list):
+    async def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+    return compute
+
+
+def test_unusable_store_computes_directly():
+    cache = SharedCache("/proc/nonexistent/shared_cache.sqlite3", max_bytes=1024 * 1024)
+    calls: list = []
+
+    async def scenario():
+        first = await cache.get_or_compute("analysis:k", _compute(calls), ttl=60)
+        second = await cache.get_or_compute("analysis:k", _compute(calls), ttl=60)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"value": 1}
+    assert second == {"value": 2}
+    assert cache.unusable is not None
+    assert "error" in cache.stats()
+
+
+def test_usable_store_caches(tmp_path):
+    cache = SharedCache(str(tmp_path / "shared_cache.sqlite3"), max_bytes=1024 * 1024)
+    calls: list = []
+
+    async def scenario():
+        first = await cache.get_or_compute("analysis:k", _compute(calls), ttl=60)
+        second = await cache.get_or_compute("analysis:k", _compute(calls), ttl=60)
+        return first, second
+
+    assert asyncio.run(scenario()) == ({"value": 1}, {"value": 1})
+    assert cache.unusable is None
+
+
+def test_connect_bare_filename(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    connect_wal("shared_cache.sqlite3", "CREATE TABLE IF NOT EXISTS t (x)").close()
+    assert (tmp_path / "shared_cache.sqlite3").exists()
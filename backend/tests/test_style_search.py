@@ -0,0 +1,35 @@
+from app.services.style_search_service import StyleSearchIndex
+
+
+class _Catalog:
+    version = 1
+
+    def __init__(self, styles: list):
+        self.styles = styles
+
+    def get_styles(self) -> list:
+        return self.styles
+
+
+def _catalog() -> _Catalog:
+    styles = [
+        {"id": f"m{i}", "name": f"댄디컷 {i}", "gender": "male", "tags": [], "face_shape_match": [], "description": ""}
+        for i in range(1200)
+    ]
+    styles.append({"id": "f0", "name": "댄디 단발", "gender": "female", "tags": [], "face_shape_match": [], "description": ""})
+    return _Catalog(styles)
+
+
+def test_gender_filter_sees_every_posting():
+    index = StyleSearchIndex(_catalog())
+    assert [r["id"] for r in index.search("댄디", gender="female")] == ["f0"]
+
+
+def test_common_gram_returns_every_match():
+    index = StyleSearchIndex(_catalog())
+    assert len(index.search("댄디", limit=2000)) == 1201
+
+
+def test_common_grams_skipped_for_selective_query():
+    index = StyleSearchIndex(_catalog())
+    assert [r["id"] for r in index.search("댄디 단발")][0] == "f0"
@@ -1,30 +1,82 @@
+"""
+Validates app/data/styles.json and compiles it into the fast-load artifact
+(app/data/styles.compiled.pickle) the server loads at startup.
+
+Usage (from backend root):
+    python validate_json.py                  # validate + compile
+    python validate_json.py --check          # validate only
+    python validate_json.py --strict-images  # missing preview images are errors
+
+Exit status 1 on validation errors (no artifact is written).
+"""
+import argparse
 import json
 import os
 import sys
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_ROOT)
+
+from app.services.catalog_compiler import compile_catalog, source_signature, validate_styles, write_artifact
+from app.services.style_catalog import COMPILED_CATALOG_PATH, STYLES_JSON_PATH
+
+UPLOADS_DIR = os.path.join(BACKEND_ROOT, "uploads")
+
 
-# Path assumed relative to where we run it (backend root)
-file_path = "app/data/styles.json"
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=STYLES_JSON_PATH)
+    parser.add_argument("--output", default=COMPILED_CATALOG_PATH)
+    parser.add_argument("--check", action="store_true", help="validate only, do not write the artifact")
+    parser.add_argument("--strict-images", action="store_true", help="treat missing image_url files as errors")
+    args = parser.parse_args()
 
-print(f"Checking {file_path}...")
+    file_path = args.source
+    print(f"Checking {file_path}...")
 
-if not os.path.exists(file_path):
-    print(f"ERROR: File not found at {os.path.abspath(file_path)}")
-    sys.exit(1)
+    if not os.path.exists(file_path):
+        print(f"ERROR: File not found at {os.path.abspath(file_path)}")
+        sys.exit(1)
 
-try:
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Signature first: if the file changes while we compile, the artifact is stale, not wrong
+    signature = source_signature(file_path)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        print(f"ERROR: JSON Decode Error at line {e.lineno}, column {e.colno}:")
+        print(e.msg)
+        sys.exit(1)
     print("SUCCESS: JSON is valid.")
+
+    errors, warnings = validate_styles(data, uploads_dir=UPLOADS_DIR)
+    if args.strict_images:
+        errors += [w for w in warnings if "image not found" in w]
+        warnings = [w for w in warnings if "image not found" not in w]
+    for warning in warnings:
+        print(f"WARNING: {warning}")
+    for error in errors:
+        print(f"ERROR: {error}")
+    if errors:
+        print(f"FAILED: {len(errors)} error(s)")
+        sys.exit(1)
+
     print(f"Loaded {len(data)} styles.")
-    
     # Check male/female count
     males = [s for s in data if s.get('gender') == 'male']
     females = [s for s in data if s.get('gender') == 'female']
     print(f"Male styles: {len(males)}")
     print(f"Female styles: {len(females)}")
 
-except json.JSONDecodeError as e:
-    print(f"ERROR: JSON Decode Error at line {e.lineno}, column {e.colno}:")
-    print(e.msg)
-except Exception as e:
-    print(f"ERROR: {e}")
+    if args.check:
+        return
+
+    start = time.perf_counter()
+    write_artifact(args.output, compile_catalog(data), signature)
+    print(f"Compiled {args.output} ({os.path.getsize(args.output)} bytes, "
+          f"{(time.perf_counter() - start) * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()